@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+"""
+Comandos de la interfaz de línea de comandos del comparador.
+
+No importa PyQt: puede ejecutarse en cron, contenedores de CI o servidores
+sin entorno gráfico.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+# Códigos de salida, al estilo de diff(1)
+EXIT_IDENTICAL = 0
+EXIT_DIFFERENCES = 1
+EXIT_ERROR = 2
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+def add_connection_arguments(parser, suffix, label, with_schema=True):
+    """Añade al parser los parámetros de conexión de uno de los esquemas."""
+    group = parser.add_argument_group(f"Conexión {suffix} ({label})")
+    group.add_argument(f"--host{suffix}", default="localhost", help="Host del servidor PostgreSQL")
+    group.add_argument(f"--port{suffix}", type=int, default=5432, help="Puerto del servidor PostgreSQL")
+    group.add_argument(f"--dbname{suffix}", required=True, help="Base de datos")
+    group.add_argument(f"--user{suffix}", required=True, help="Usuario")
+    group.add_argument(f"--password{suffix}", default=os.environ.get('PGPASSWORD', ''),
+                       help="Contraseña (por defecto la variable de entorno PGPASSWORD)")
+    if with_schema:
+        group.add_argument(f"--schema{suffix}", required=True, help="Esquema a comparar")
+    return group
+
+def connection_params(args, suffix, schema=None):
+    """Construye el diccionario de parámetros de conexión que espera el motor."""
+    return {
+        'host': getattr(args, f"host{suffix}"),
+        'port': getattr(args, f"port{suffix}"),
+        'dbname': getattr(args, f"dbname{suffix}"),
+        'user': getattr(args, f"user{suffix}"),
+        'password': getattr(args, f"password{suffix}"),
+        'schema': schema or getattr(args, f"schema{suffix}"),
+        'normalize_schemas': True
+    }
+
+def add_history_argument(parser):
+    """Añade al parser la ubicación del historial de comparaciones."""
+    from core.history import DEFAULT_HISTORY_PATH
+
+    parser.add_argument("--history-file", default=DEFAULT_HISTORY_PATH,
+                        help=f"Archivo del historial (por defecto: {DEFAULT_HISTORY_PATH})")
+
+def add_journal_arguments(parser):
+    """Añade al parser las opciones del diario de las comparaciones por lotes."""
+    from core.db_connector import DEFAULT_RETRIES
+    from core.journal import DEFAULT_JOURNAL_PATH
+
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH,
+                        help=("Archivo donde se guarda cada grupo de objetos comparado "
+                              f"(por defecto: {DEFAULT_JOURNAL_PATH})"))
+    parser.add_argument("--resume", action="store_true",
+                        help=("Reutilizar los grupos ya comparados de una ejecución anterior con los "
+                              "mismos esquemas y comparar sólo los que faltan"))
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=("Reintentos de cada comparación ante errores transitorios de conexión "
+                              f"(por defecto: {DEFAULT_RETRIES})"))
+
+def build_parser():
+    """Construye el parser de argumentos de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        prog="schema_comparator",
+        description="Comparador de Esquemas PostgreSQL (línea de comandos)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Mostrar el log de la comparación en stderr")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMANDO")
+    subparsers.required = True
+
+    compare = subparsers.add_parser(
+        "compare", help="Comparar dos esquemas",
+        description=("Compara dos esquemas. Código de salida: 0 si son idénticos, "
+                     "1 si hay diferencias y 2 si se produjo un error."))
+    add_connection_arguments(compare, "1", "origen")
+    add_connection_arguments(compare, "2", "destino")
+    compare.add_argument("-f", "--format", choices=["text", "json", "csv"], default="text",
+                         help="Formato de salida (por defecto: text)")
+    compare.add_argument("-o", "--output", help="Archivo de salida (por defecto: stdout)")
+    compare.add_argument("--differences-only", action="store_true",
+                         help="No incluir los objetos idénticos en la salida (sólo se cuentan)")
+    compare.add_argument("--fingerprint", action="store_true",
+                         help=("Comparar primero la huella de los esquemas y analizar sólo los tipos "
+                               "de objeto que difieren (los idénticos sólo se cuentan)"))
+    compare.add_argument("-j", "--jobs", type=int, default=1,
+                         help=("Conexiones por esquema para extraer el catálogo en paralelo, todas "
+                               "sobre la misma instantánea (por defecto: 1)"))
+    compare.add_argument("--throttle", type=float, metavar="SEGUNDOS",
+                         help=("Extraer el catálogo por lotes paginados que se adaptan para que "
+                               "cada consulta tarde como máximo SEGUNDOS (para servidores en producción)"))
+    compare.add_argument("--itersize", type=int, metavar="FILAS",
+                         help=("Leer el catálogo con cursores del servidor en bloques de FILAS filas, "
+                               "normalizando las definiciones a medida que llegan"))
+    compare.add_argument("--statement-timeout", type=float, metavar="SEGUNDOS",
+                         help="Tiempo máximo de cada consulta en el servidor")
+    compare.add_argument("--auto", action="store_true",
+                         help=("Elegir según el tamaño de los catálogos si se usa la huella (con "
+                               "--differences-only), la extracción en paralelo y la lectura en bloques"))
+    compare.add_argument("--watch", type=int, metavar="SEGUNDOS",
+                         help=("Tras la comparación, consultar cada SEGUNDOS si cambió el catálogo de ambos esquemas, "
+                               "volver a comparar sólo los grupos de objetos que cambian y mostrar los "
+                               "cambios hasta Ctrl-C"))
+    compare.add_argument("--no-history", action="store_true",
+                         help="No guardar la comparación en el historial")
+    add_history_argument(compare)
+    compare.set_defaults(func=command_compare)
+
+    cluster = subparsers.add_parser(
+        "cluster", help="Agrupar tenants por sus desviaciones respecto a una referencia",
+        description=("Compara cada tenant con el esquema de referencia y agrupa los tenants que "
+                     "comparten las mismas desviaciones. Código de salida: 0 si ningún tenant se "
+                     "desvía, 1 si alguno lo hace y 2 si se produjo un error."))
+    add_connection_arguments(cluster, "1", "referencia")
+    tenants = add_connection_arguments(cluster, "2", "tenants", with_schema=False)
+    tenant_schemas = tenants.add_mutually_exclusive_group(required=True)
+    tenant_schemas.add_argument("--schemas", nargs="+", metavar="ESQUEMA",
+                                help="Esquemas de los tenants")
+    tenant_schemas.add_argument("--schema-like", metavar="PATRÓN",
+                                help="Patrón LIKE de los esquemas de los tenants (por ejemplo emp%%pro)")
+    cluster.add_argument("--threshold", type=float, default=0.8,
+                         help=("Similitud mínima (0-1) para agrupar tenants con desviaciones casi "
+                               "iguales; 1 agrupa sólo desviaciones idénticas (por defecto: 0.8)"))
+    cluster.add_argument("--statement-timeout", type=float, metavar="SEGUNDOS",
+                         help="Tiempo máximo de cada consulta en el servidor")
+    cluster.add_argument("-f", "--format", choices=["text", "json"], default="text",
+                         help="Formato de salida (por defecto: text)")
+    add_journal_arguments(cluster)
+    cluster.set_defaults(func=command_cluster)
+
+    fleet = subparsers.add_parser(
+        "fleet", help="Comparar un esquema de referencia con muchos servidores",
+        description=("Compara el esquema de referencia con cada servidor de un inventario JSON, "
+                     "consultando varios servidores en paralelo. Código de salida: 0 si todos son "
+                     "idénticos, 1 si alguno difiere y 2 si alguno no se pudo comparar."))
+    add_connection_arguments(fleet, "1", "referencia")
+    fleet.add_argument("-i", "--inventory", required=True,
+                       help="Inventario JSON de servidores (ver README)")
+    fleet.add_argument("-j", "--max-workers", type=int, default=8,
+                       help="Servidores consultados a la vez (por defecto: 8)")
+    fleet.add_argument("--timeout", type=float, default=30,
+                       help="Segundos de espera para conectar con cada servidor (por defecto: 30)")
+    fleet.add_argument("--statement-timeout", type=float, default=30, metavar="SEGUNDOS",
+                       help="Tiempo máximo de cada consulta en un servidor (por defecto: 30)")
+    fleet.add_argument("-f", "--format", choices=["text", "json"], default="text",
+                       help="Formato de salida (por defecto: text)")
+    add_journal_arguments(fleet)
+    fleet.set_defaults(func=command_fleet)
+
+    history = subparsers.add_parser(
+        "history", help="Consultar el historial de comparaciones",
+        description="Consulta las comparaciones guardadas sin conectarse a PostgreSQL.")
+    history_commands = history.add_subparsers(dest="history_command", metavar="ACCIÓN")
+    history_commands.required = True
+
+    history_list = history_commands.add_parser("list", help="Listar las últimas comparaciones")
+    history_list.add_argument("-n", "--limit", type=int, default=20,
+                              help="Cantidad de comparaciones a mostrar (por defecto: 20)")
+    add_history_argument(history_list)
+    history_list.set_defaults(func=command_history_list)
+
+    history_delta = history_commands.add_parser(
+        "delta", help="Comparar dos ejecuciones guardadas",
+        description=("Muestra los objetos cuyo resultado cambió entre dos ejecuciones. "
+                     "Código de salida: 0 si no hay cambios, 1 si los hay y 2 si se produjo un error."))
+    history_delta.add_argument("run_a", type=int, help="Identificador de la ejecución anterior")
+    history_delta.add_argument("run_b", type=int, help="Identificador de la ejecución posterior")
+    history_delta.add_argument("-f", "--format", choices=["text", "json"], default="text",
+                               help="Formato de salida (por defecto: text)")
+    add_history_argument(history_delta)
+    history_delta.set_defaults(func=command_history_delta)
+
+    return parser
+
+def write_text(results, summary, stream):
+    """Escribe las diferencias y el resumen en formato de texto legible."""
+    for result in results:
+        if result['estado'] != 'IDÉNTICO':
+            stream.write(f"{result['estado']}\t{result['tipo']}\t{result['objeto']}\t{result['detalle']}\n")
+    stream.write(f"Total: {summary['total']}, Idénticos: {summary['identicos']}, "
+                 f"Con diferencias: {summary['diferentes']}, "
+                 f"Solo en origen: {summary['solo_esquema1']}, "
+                 f"Solo en destino: {summary['solo_esquema2']}\n")
+
+def write_output(args, results, summary):
+    """Escribe los resultados en el formato y destino solicitados."""
+    from utils.export_utils import dump_csv, dump_json
+
+    writers = {
+        'text': lambda stream: write_text(results, summary, stream),
+        'json': lambda stream: dump_json(results, stream),
+        'csv': lambda stream: dump_csv(results, stream)
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            writers[args.format](f)
+    else:
+        writers[args.format](sys.stdout)
+        if args.format == 'json':
+            sys.stdout.write("\n")
+
+def command_compare(args):
+    """Ejecuta el comando compare y devuelve el código de salida."""
+    from core.comparison_engine import ComparisonEngine
+    from core.result_store import ResultStore
+    from core.results import summarize_results
+
+    from core.db_connector import with_timeouts
+
+    engine = ComparisonEngine(with_timeouts(connection_params(args, "1"), statement_timeout=args.statement_timeout),
+                              with_timeouts(connection_params(args, "2"), statement_timeout=args.statement_timeout),
+                              differences_only=args.differences_only,
+                              fingerprint=args.fingerprint,
+                              extraction_workers=args.jobs,
+                              throttle_latency=args.throttle,
+                              itersize=args.itersize,
+                              auto_plan=args.auto)
+    # Los resultados se guardan en disco para no depender de la memoria disponible
+    store = ResultStore()
+    try:
+        started_at = datetime.now()
+        compared = []
+
+        def on_results(results):
+            compared.append(results)
+            finished_at = datetime.now()
+            write_output(args, results, summarize_results(results, engine.omitted_identical))
+            sys.stdout.flush()
+            if not args.no_history:
+                record_history(args, engine, results, started_at, finished_at)
+
+        if args.watch:
+            from core.watch import SchemaWatcher
+
+            def on_change(results, subtrees, changes):
+                changed_at = datetime.now()
+                for change in changes:
+                    sys.stdout.write(f"{changed_at:%H:%M:%S}\t{change['cambio']}\t{change['tipo']}\t"
+                                     f"{change['objeto']}\t{change['estado_anterior'] or '-'} -> "
+                                     f"{change['estado_actual'] or '-'}\n")
+                sys.stdout.flush()
+                # El archivo de salida y el historial reflejan siempre la última comparación
+                if args.output:
+                    write_output(args, results, summarize_results(results, engine.omitted_identical))
+                if not args.no_history:
+                    record_history(args, engine, results, changed_at, datetime.now())
+
+            try:
+                SchemaWatcher(engine, args.watch).run(store, on_results=on_results, on_change=on_change)
+            except KeyboardInterrupt:
+                # Ctrl-C detiene la vigilancia; el resultado es el estado de la última comparación
+                if not compared:
+                    raise
+        else:
+            on_results(engine.run(store=store))
+        summary = summarize_results(store, engine.omitted_identical)
+    finally:
+        store.close()
+
+    if summary['total'] - summary['identicos'] > 0:
+        return EXIT_DIFFERENCES
+    return EXIT_IDENTICAL
+
+def tenant_schemas(args, reference):
+    """Devuelve los esquemas de los tenants a agrupar, sin el de referencia."""
+    if args.schemas:
+        return [schema for schema in args.schemas if schema != reference['schema']]
+
+    from core.db_connector import connect_db
+
+    conn = connect_db(connection_params(args, "2", schema=args.schema_like))
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT schema_name FROM information_schema.schemata
+            WHERE schema_name LIKE %s ORDER BY schema_name
+        """, (args.schema_like,))
+        schemas = [row[0] for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+    same_database = all(reference[key] == getattr(args, f"{key}2") for key in ('host', 'port', 'dbname'))
+    return [schema for schema in schemas if not (same_database and schema == reference['schema'])]
+
+def command_cluster(args):
+    """Ejecuta el comando cluster y devuelve el código de salida."""
+    from core.comparison_engine import ComparisonEngine
+    from core.db_connector import with_timeouts
+    from core.drift_clustering import cluster_drift, drift_signature
+    from core.journal import BatchJournal, batch_key
+    from core.schema_normalizer import SchemaNormalizer
+
+    reference = with_timeouts(connection_params(args, "1"), statement_timeout=args.statement_timeout)
+    schemas = tenant_schemas(args, reference)
+    journal = BatchJournal(batch_key("cluster", reference, f"{args.host2}:{args.port2}/{args.dbname2}"),
+                           args.journal, resume=args.resume)
+    signatures = {}
+    try:
+        for schema in schemas:
+            tenant = with_timeouts(connection_params(args, "2", schema=schema),
+                                   statement_timeout=args.statement_timeout)
+
+            # Basta con las diferencias y los hashes de las definiciones
+            def make_engine(subtrees):
+                return ComparisonEngine(reference, tenant, lazy_definitions=True, differences_only=True,
+                                        fingerprint=True, subtrees=subtrees)
+            try:
+                results, _ = journal.compare(schema, make_engine, retries=args.retries)
+            except Exception as e:
+                logger.error(f"No se pudo comparar el esquema '{schema}': {str(e)}. Los esquemas ya "
+                             f"comparados quedan en {args.journal}; se reutilizan con --resume")
+                return EXIT_ERROR
+            normalizer = SchemaNormalizer(reference['schema'], schema)
+            signatures[schema] = drift_signature(results, normalizer, reference['schema'], schema)
+    finally:
+        journal.close()
+
+    clusters = cluster_drift(signatures, threshold=args.threshold)
+
+    if args.format == 'json':
+        json.dump(clusters, sys.stdout, ensure_ascii=False, indent=4)
+        sys.stdout.write("\n")
+    else:
+        for i, cluster in enumerate(clusters, 1):
+            sys.stdout.write(f"Grupo {i}: {len(cluster['miembros'])} esquemas: {', '.join(cluster['miembros'])}\n")
+            if not cluster['desviaciones'] and not cluster['variantes']:
+                sys.stdout.write("    Sin desviaciones respecto a la referencia\n")
+            for description in cluster['desviaciones']:
+                sys.stdout.write(f"    {description}\n")
+            for description in cluster['variantes']:
+                sys.stdout.write(f"    (algunos) {description}\n")
+
+    if any(signature for signature in signatures.values()):
+        return EXIT_DIFFERENCES
+    return EXIT_IDENTICAL
+
+def command_fleet(args):
+    """Ejecuta el comando fleet y devuelve el código de salida."""
+    from core.fleet import FleetComparison, load_inventory
+    from core.journal import BatchJournal, batch_key
+
+    def on_host_done(report):
+        if report['error'] is None:
+            logger.info(f"{report['name']} comparado en {report['duration']:.1f} s")
+
+    reference = connection_params(args, "1")
+    journal = BatchJournal(batch_key("fleet", reference, os.path.abspath(args.inventory)),
+                           args.journal, resume=args.resume)
+    try:
+        comparison = FleetComparison(reference, load_inventory(args.inventory),
+                                     max_workers=args.max_workers, timeout=args.timeout,
+                                     statement_timeout=args.statement_timeout, journal=journal, retries=args.retries)
+        reports = comparison.run(on_host_done=on_host_done)
+    finally:
+        journal.close()
+
+    if args.format == 'json':
+        json.dump([{
+            'servidor': report['name'],
+            'error': report['error'],
+            'duracion': round(report['duration'], 3),
+            'resumen': report['summary'],
+            'diferencias': [result.to_dict() for result in report['results'] or ()]
+        } for report in reports], sys.stdout, ensure_ascii=False, indent=4)
+        sys.stdout.write("\n")
+    else:
+        for report in reports:
+            if report['error'] is not None:
+                # Los mensajes de psycopg2 ocupan varias líneas
+                sys.stdout.write(f"{report['name']}: ERROR: {' '.join(report['error'].split())}\n")
+                continue
+            summary = report['summary']
+            sys.stdout.write(f"{report['name']}: Total: {summary['total']}, Idénticos: {summary['identicos']}, "
+                             f"Con diferencias: {summary['diferentes']}, "
+                             f"Solo en origen: {summary['solo_esquema1']}, "
+                             f"Solo en destino: {summary['solo_esquema2']} ({report['duration']:.1f} s)\n")
+            for result in report['results']:
+                sys.stdout.write(f"    {result['estado']}\t{result['tipo']}\t{result['objeto']}\t{result['detalle']}\n")
+
+    if any(report['error'] is not None for report in reports):
+        return EXIT_ERROR
+    if any(report['summary']['total'] > report['summary']['identicos'] for report in reports):
+        return EXIT_DIFFERENCES
+    return EXIT_IDENTICAL
+
+def record_history(args, engine, results, started_at, finished_at):
+    """Guarda la comparación en el historial."""
+    from core.history import ComparisonHistory
+
+    history = ComparisonHistory(args.history_file)
+    try:
+        run_id = history.record_run(engine.conn_params1, engine.conn_params2, results,
+                                    started_at, finished_at,
+                                    omitted_identical=engine.omitted_identical,
+                                    differences_only=engine.differences_only)
+        logger.info(f"Comparación guardada en {args.history_file} (ejecución {run_id})")
+    finally:
+        history.close()
+
+def command_history_list(args):
+    """Lista las últimas comparaciones del historial."""
+    from core.history import ComparisonHistory
+
+    history = ComparisonHistory(args.history_file)
+    try:
+        for run in history.runs(args.limit):
+            sys.stdout.write(f"{run['id']}\t{run['started_at']}\t"
+                             f"{run['dbname1']}.{run['schema1']} -> {run['dbname2']}.{run['schema2']}\t"
+                             f"Total: {run['total']}, Idénticos: {run['identicos']}, "
+                             f"Con diferencias: {run['diferentes']}, "
+                             f"Solo en origen: {run['solo_esquema1']}, "
+                             f"Solo en destino: {run['solo_esquema2']}\n")
+    finally:
+        history.close()
+    return EXIT_IDENTICAL
+
+def command_history_delta(args):
+    """Muestra los cambios entre dos ejecuciones del historial."""
+    from core.history import ComparisonHistory
+
+    history = ComparisonHistory(args.history_file)
+    try:
+        delta = history.delta(args.run_a, args.run_b)
+    finally:
+        history.close()
+
+    if args.format == 'json':
+        json.dump(delta, sys.stdout, ensure_ascii=False, indent=4)
+        sys.stdout.write("\n")
+    else:
+        for change in delta:
+            sys.stdout.write(f"{change['cambio']}\t{change['tipo']}\t{change['objeto']}\t"
+                             f"{change['estado_anterior'] or '-'} -> {change['estado_actual'] or '-'}\n")
+        sys.stdout.write(f"Cambios: {len(delta)}\n")
+
+    return EXIT_DIFFERENCES if delta else EXIT_IDENTICAL
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # El log va a stderr para no mezclarse con la salida de resultados
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+
+    try:
+        return args.func(args)
+    except Exception as e:
+        logger.error(f"Error en la comparación: {str(e)}")
+        return EXIT_ERROR
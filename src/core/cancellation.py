@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Cancelación cooperativa de una comparación en curso.
+
+La interfaz cancela la comparación desde su hilo mientras el motor trabaja en
+el del worker. CancellationToken marca la cancelación, que el motor comprueba
+entre bloque y bloque (filas leídas, catálogos normalizados, grupos de objetos
+comparados), y además cancela en el servidor las consultas en curso de las
+conexiones registradas, para no esperar a que termine una consulta larga.
+"""
+
+import logging
+import threading
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+class ComparisonCancelled(Exception):
+    """La comparación se canceló antes de terminar."""
+
+    def __init__(self, results=None):
+        """
+        Args:
+            results: Resultados obtenidos hasta la cancelación (lista o
+                ResultStore), o None si se canceló antes de comparar
+        """
+        super().__init__("La comparación se canceló")
+        self.results = results
+
+class CancellationToken:
+    """Marca de cancelación compartida por el hilo que cancela y el que compara."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """Indica si se pidió la cancelación."""
+        return self.event.is_set()
+
+    def register(self, conn):
+        """Registra una conexión cuyas consultas en curso se cancelan con cancel()."""
+        with self.lock:
+            self.connections = [c for c in self.connections if not c.closed]
+            self.connections.append(conn)
+
+    def cancel(self):
+        """Pide la cancelación y cancela las consultas en curso de las conexiones registradas."""
+        self.event.set()
+        with self.lock:
+            connections = [conn for conn in self.connections if not conn.closed]
+        for conn in connections:
+            try:
+                conn.cancel()
+            except Exception as e:
+                # La conexión pudo cerrarse mientras tanto
+                logger.debug(f"No se pudo cancelar la consulta en curso: {str(e)}")
+
+    def check(self, results=None):
+        """
+        Lanza ComparisonCancelled si se pidió la cancelación.
+
+        Args:
+            results: Resultados obtenidos hasta el momento, para la excepción
+        """
+        if self.event.is_set():
+            raise ComparisonCancelled(results)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Capacidades del servidor PostgreSQL que determinan qué consultas del catálogo usar.
+
+Las capacidades se averiguan con una sola consulta la primera vez que se
+conecta a cada versión del servidor y se guardan en memoria: las conexiones
+siguientes a la misma versión (las de la extracción en paralelo, las de
+DefinitionLoader o las de los servidores de una flota) no repiten la
+consulta. Así las variantes de cada consulta se eligen de antemano, sin
+ejecutar una consulta para ver si falla.
+"""
+
+import logging
+import threading
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Tablas del catálogo cuyas columnas se averiguan
+PROBED_TABLES = ('pg_class', 'pg_index', 'pg_proc', 'pg_constraint')
+
+# Funciones del servidor que usan las consultas del catálogo
+PROBED_FUNCTIONS = ('pg_get_functiondef', 'pg_get_viewdef', 'pg_get_indexdef',
+                    'pg_export_snapshot', 'oidvectortypes')
+
+# Versión (server_version_num) desde la que existe cada código de relkind
+RELKIND_VERSIONS = {
+    'r': 0, 'i': 0, 'S': 0, 'v': 0, 'c': 0, 't': 0,
+    'f': 90100,   # tablas foráneas
+    'm': 90300,   # vistas materializadas
+    'p': 100000,  # tablas particionadas
+    'I': 110000   # índices particionados
+}
+
+# Códigos de relkind de índices y vistas; los que una versión no tiene no
+# coinciden con ninguna fila, así que la lista completa sirve en cualquier servidor
+INDEX_RELKINDS = ('i', 'I')
+VIEW_RELKINDS = ('v', 'm')
+
+# Columnas de la consulta de capacidades, para poder incluirlas en otras
+# consultas (ver core.preflight): columnas, funciones y si existe regnamespace
+CAPABILITIES_COLUMNS = """
+        (SELECT array_agg(c.relname || '.' || a.attname)
+         FROM pg_catalog.pg_attribute a
+         JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+         JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+         WHERE n.nspname = 'pg_catalog' AND c.relname = ANY(%(probed_tables)s)
+         AND a.attnum > 0 AND NOT a.attisdropped),
+        (SELECT array_agg(DISTINCT p.proname::text)
+         FROM pg_catalog.pg_proc p
+         JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+         WHERE n.nspname = 'pg_catalog' AND p.proname = ANY(%(probed_functions)s)),
+        EXISTS(SELECT 1 FROM pg_catalog.pg_type t
+               JOIN pg_catalog.pg_namespace n ON n.oid = t.typnamespace
+               WHERE n.nspname = 'pg_catalog' AND t.typname = 'regnamespace')
+"""
+
+CAPABILITIES_QUERY = f"SELECT {CAPABILITIES_COLUMNS}"
+
+# Parámetros de CAPABILITIES_COLUMNS
+CAPABILITIES_PARAMS = {'probed_tables': list(PROBED_TABLES), 'probed_functions': list(PROBED_FUNCTIONS)}
+
+# Capacidades por server_version_num
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+class ServerCapabilities:
+    """Columnas del catálogo, funciones y códigos de relkind disponibles en una versión del servidor."""
+
+    def __init__(self, version, columns, functions, regnamespace):
+        """
+        Args:
+            version: server_version_num del servidor (por ejemplo 160002)
+            columns: Columnas disponibles, como 'tabla.columna'
+            functions: Funciones de PROBED_FUNCTIONS disponibles
+            regnamespace: Si existe el tipo regnamespace
+        """
+        self.version = version
+        self.columns = frozenset(columns)
+        self.functions = frozenset(functions)
+        self.regnamespace = regnamespace
+        self.relkinds = frozenset(kind for kind, since in RELKIND_VERSIONS.items() if version >= since)
+
+    def has_column(self, table, column):
+        """Indica si la tabla del catálogo tiene la columna."""
+        return f"{table}.{column}" in self.columns
+
+    def has_function(self, name):
+        """Indica si el servidor tiene la función."""
+        return name in self.functions
+
+    @property
+    def index_relkinds(self):
+        """Códigos de relkind de los índices (incluidos los de tablas particionadas)."""
+        return [kind for kind in INDEX_RELKINDS if kind in self.relkinds]
+
+    @property
+    def view_relkinds(self):
+        """Códigos de relkind de las vistas (incluidas las materializadas)."""
+        return [kind for kind in VIEW_RELKINDS if kind in self.relkinds]
+
+    def namespace_oid(self, parameter='%s'):
+        """Expresión SQL con el OID del esquema cuyo nombre es parameter."""
+        if self.regnamespace:
+            return f"quote_ident({parameter})::regnamespace"
+        return f"(SELECT oid FROM pg_catalog.pg_namespace WHERE nspname = {parameter})"
+
+    def __repr__(self):
+        return (f"ServerCapabilities(version={self.version}, relkinds={''.join(sorted(self.relkinds))}, "
+                f"functions={sorted(self.functions)})")
+
+def cached_capabilities(version):
+    """Devuelve las capacidades ya averiguadas de una versión del servidor, o None."""
+    with _profiles_lock:
+        return _profiles.get(version)
+
+def register_capabilities(version, columns, functions, regnamespace):
+    """Guarda las capacidades de una versión leídas con CAPABILITIES_COLUMNS y las devuelve."""
+    profile = ServerCapabilities(version, columns or [], functions or [], regnamespace)
+    logger.info(f"Capacidades de PostgreSQL {version} detectadas: {profile}")
+    with _profiles_lock:
+        return _profiles.setdefault(version, profile)
+
+def server_capabilities(conn):
+    """
+    Devuelve las capacidades del servidor de una conexión.
+
+    Sólo la primera conexión a cada versión del servidor ejecuta
+    CAPABILITIES_QUERY; las demás reciben el perfil guardado.
+    """
+    profile = cached_capabilities(conn.server_version)
+    if profile is not None:
+        return profile
+
+    cur = conn.cursor()
+    cur.execute(CAPABILITIES_QUERY, CAPABILITIES_PARAMS)
+    return register_capabilities(conn.server_version, *cur.fetchone())
@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción del catálogo de un esquema PostgreSQL.
+
+El catálogo es un diccionario de datos planos (sin conexiones ni objetos Qt),
+de modo que puede guardarse, enviarse a otro proceso o compararse más tarde.
+
+ParallelCatalogExtractor reparte las secciones entre varias conexiones que
+comparten una instantánea exportada (pg_export_snapshot), para que la
+extracción en paralelo sea tan consistente como la de una sola transacción.
+
+En streaming, las secciones de STREAMED_SECTIONS no se guardan en el
+catálogo: quedan como SectionStream y se leen del servidor, ordenadas por
+clave, mientras SchemaDiffer las compara.
+"""
+
+import itertools
+import queue
+import re
+import traceback
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
+from core.cancellation import ComparisonCancelled
+from core.capabilities import server_capabilities
+from core.object_types import OBJECT_TYPES, SECTION_TYPES
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Secciones que componen un catálogo, una por tipo del registro, en orden de extracción
+CATALOG_SECTIONS = tuple(object_type.section for object_type in OBJECT_TYPES)
+
+# Grupos de secciones que se comparan juntas (ver SchemaDiffer.diff_subtree):
+# cada uno corresponde a un subárbol de la huella del esquema
+CATALOG_SUBTREES = {subtree: tuple(object_type.section for object_type in OBJECT_TYPES
+                                   if object_type.subtree == subtree)
+                    for subtree in dict.fromkeys(object_type.subtree for object_type in OBJECT_TYPES)}
+
+# Secciones independientes (sin hijos ni padre) que en streaming se comparan a
+# medida que llegan del servidor, en lugar de guardarse en el catálogo
+STREAMED_SECTIONS = ('functions', 'views', 'indexes')
+
+# Números de los cursores del servidor, únicos aunque varios extractores
+# compartan una conexión
+_cursor_ids = itertools.count(1)
+
+def catalog_sections(subtrees=None):
+    """
+    Secciones de los tipos del registro que pertenecen a los grupos de
+    CATALOG_SUBTREES indicados (None para todas), en orden de extracción.
+    """
+    return [object_type.section for object_type in OBJECT_TYPES
+            if subtrees is None or object_type.subtree in subtrees]
+
+def export_snapshot(conn):
+    """
+    Exporta la instantánea de una transacción REPEATABLE READ de solo lectura.
+
+    La conexión termina la transacción en curso (la de la comprobación previa)
+    y pasa a REPEATABLE READ sólo en ese momento, cuando la instantánea se va
+    a usar. La transacción nueva queda abierta: la instantánea sólo puede
+    importarse desde otras conexiones (SET TRANSACTION SNAPSHOT) mientras
+    conn no la termine.
+
+    Returns:
+        Identificador de la instantánea
+    """
+    conn.rollback()
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    cur = conn.cursor()
+    cur.execute("SELECT pg_export_snapshot()")
+    return cur.fetchone()[0]
+
+def _records(cur, rows):
+    """Filas de un cursor como diccionarios {columna: valor}."""
+    names = [column.name for column in cur.description]
+    return (dict(zip(names, row)) for row in rows)
+
+class SectionStream:
+    """
+    Sección del catálogo que no se guarda en memoria.
+
+    Cada recorrido lee la sección del servidor (con CatalogExtractor.iter_objects)
+    y genera pares (clave, objeto) en orden de clave, que
+    merge_join compara a medida que llegan. La conexión del extractor debe
+    seguir abierta hasta terminar la comparación, y un error al leerla la
+    interrumpe.
+    """
+
+    def __init__(self, extractor, section):
+        self.extractor = extractor
+        self.section = section
+
+    def __iter__(self):
+        return self.extractor.iter_objects(SECTION_TYPES[self.section])
+
+class CatalogExtractor:
+    """Obtiene de una conexión todos los objetos de un esquema."""
+
+    def __init__(self, conn, schema, log_callback=None, lazy_definitions=False, snapshot=None,
+                 throttle=None, itersize=None, normalizer=None, capabilities=None, row_callback=None,
+                 cancellation=None):
+        """
+        Args:
+            conn: Conexión psycopg2 abierta
+            schema: Nombre del esquema a extraer
+            log_callback: Función opcional que recibe (mensaje, nivel)
+            lazy_definitions: Si es True no se obtienen las definiciones completas
+                (pg_get_functiondef, pg_get_viewdef); se cargan después con
+                DefinitionLoader sólo para los objetos que se consulten
+            snapshot: Instantánea exportada con export_snapshot() que la conexión
+                debe importar antes de leer el catálogo
+            throttle: AdaptiveThrottle opcional; las consultas se paginan por su
+                clave de orden en lotes del tamaño que indique (ver _fetch)
+            itersize: Si se indica, las consultas se leen con cursores del
+                servidor (con nombre) en bloques de itersize filas en lugar de
+                materializar todo el resultado con fetchall()
+            normalizer: SchemaNormalizer opcional; las definiciones se reducen a
+                su hash normalizado a medida que llegan, y el texto sólo se
+                guarda si los resultados lo incluyen (ver _object)
+            capabilities: ServerCapabilities del servidor; si no se indica se
+                obtiene con server_capabilities() en la primera consulta
+            row_callback: Función opcional que recibe la cantidad de filas de
+                cada bloque leído del servidor, para informar el avance por objeto
+            cancellation: CancellationToken opcional; una vez cancelado no se
+                extraen más secciones y la consulta cancelada no se toma como
+                una sección fallida
+        """
+        self.conn = conn
+        self.schema = schema
+        self.log_callback = log_callback
+        self.lazy_definitions = lazy_definitions
+        self.snapshot = snapshot
+        self.throttle = throttle
+        self.itersize = itersize
+        self.normalizer = normalizer
+        self._capabilities = capabilities
+        self.row_callback = row_callback
+        self.cancellation = cancellation
+        if snapshot:
+            self.begin_snapshot()
+
+    @property
+    def capabilities(self):
+        """Capacidades del servidor, que deciden qué variante de cada consulta se usa."""
+        if self._capabilities is None:
+            self._capabilities = server_capabilities(self.conn)
+        return self._capabilities
+
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def extract(self, progress_callback=None, subtrees=None, streamed=()):
+        """
+        Extrae el catálogo completo del esquema.
+
+        Una sección que no se pueda obtener queda como None y se omite en la
+        comparación, igual que antes se omitía el tipo de objeto que fallaba.
+        Si se pierde la conexión, en cambio, el error se propaga.
+
+        Args:
+            progress_callback: Función opcional que recibe (secciones_completadas, total)
+            subtrees: Grupos de CATALOG_SUBTREES a extraer, o None para todos
+            streamed: Secciones de STREAMED_SECTIONS que no se extraen: quedan
+                como SectionStream y se leen al compararlas
+
+        Returns:
+            Diccionario con el nombre del esquema y una entrada por sección
+        """
+        catalog = {'schema': self.schema}
+        # Cada sección se lee con la consulta masiva de su tipo del registro
+        sections = catalog_sections(subtrees)
+        for i, section in enumerate(sections):
+            if section in streamed:
+                catalog[section] = SectionStream(self, section)
+            else:
+                catalog[section] = self.extract_section(section)
+            if progress_callback:
+                progress_callback(i + 1, len(sections))
+        return catalog
+
+    def extract_section(self, section):
+        """Extrae una sección del catálogo, o devuelve None si la consulta falla."""
+        if self.cancellation is not None:
+            self.cancellation.check()
+        try:
+            return self.read_section(SECTION_TYPES[section])
+        except ComparisonCancelled:
+            raise
+        except Exception as e:
+            if self.cancellation is not None and self.cancellation.cancelled:
+                raise ComparisonCancelled() from e
+            # Sin conexión tampoco se pueden extraer las demás secciones
+            if self.conn.closed:
+                raise
+            self.log(f"Error al extraer {section} del esquema '{self.schema}': {str(e)}", logging.ERROR)
+            self.log(f"Detalles del error:\n{traceback.format_exc()}", logging.DEBUG)
+            # Una consulta fallida aborta la transacción; descartarla para seguir extrayendo
+            self.conn.rollback()
+            if self.snapshot:
+                self.begin_snapshot()
+            return None
+
+    def begin_snapshot(self):
+        """Inicia en la conexión una transacción de solo lectura con la instantánea exportada."""
+        self.conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        cur = self.conn.cursor()
+        cur.execute("SET TRANSACTION SNAPSHOT %s", (self.snapshot,))
+
+    def _query(self, query, params):
+        """
+        Ejecuta una consulta y genera sus filas, en streaming si hay itersize.
+
+        Yields:
+            Filas como diccionarios {columna: valor}
+        """
+        if not self.itersize:
+            cur = self.conn.cursor()
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            self._rows_read(len(rows))
+            yield from _records(cur, rows)
+            return
+
+        # Cursor del servidor: las filas llegan en bloques de itersize
+        cur = self.conn.cursor(name=f"schema_comparator_{next(_cursor_ids)}")
+        cur.itersize = self.itersize
+        try:
+            cur.execute(query, params)
+            while True:
+                block = cur.fetchmany(self.itersize)
+                if not block:
+                    break
+                self._rows_read(len(block))
+                yield from _records(cur, block)
+        finally:
+            cur.close()
+
+    def _rows_read(self, count):
+        """Informa las filas leídas del servidor."""
+        if self.row_callback and count:
+            self.row_callback(count)
+
+    def _fetch(self, query, params, order, computed=None):
+        """
+        Ejecuta una consulta del catálogo en orden de clave y genera sus filas.
+
+        Las expresiones de computed (las definiciones, como pg_get_functiondef)
+        se calculan en una consulta exterior sobre las filas ya ordenadas, de
+        modo que con throttle sólo se evalúan para las filas de cada lote. Con
+        throttle la consulta se pagina por su clave de orden (keyset): cada
+        lote continúa tras la última fila del anterior y sus filas se generan
+        en cuanto llega, en el mismo orden que sin throttle.
+
+        Args:
+            query: Consulta con parámetros con nombre y sin ORDER BY
+            params: Diccionario de parámetros de la consulta
+            order: Columnas de query que ordenan las filas e identifican cada
+                una; las de texto deben llevar COLLATE "C" en query
+            computed: Diccionario opcional {columna: expresión SQL sobre las
+                columnas de query, calificadas con page}
+
+        Yields:
+            Filas como diccionarios con las columnas de query y las de computed
+        """
+        order_by = ', '.join(f'"{column}"' for column in order)
+        columns = ''.join(f', {expression} AS "{name}"' for name, expression in (computed or {}).items())
+
+        def page_query(keyset='', limit=''):
+            return f"""
+                SELECT page.*{columns}
+                FROM (SELECT * FROM ({query}) AS section {keyset} ORDER BY {order_by} {limit}) AS page
+                ORDER BY {order_by}
+            """
+
+        if self.throttle is None:
+            yield from self._query(page_query(), params)
+            return
+
+        # Paginación por clave: cada lote continúa tras la última fila del anterior
+        keyset = f"WHERE ({order_by}) > ({', '.join(f'%(after_{i})s' for i in range(len(order)))})"
+        cur = self.conn.cursor()
+        after = None
+        while True:
+            with self.throttle.batch() as batch_size:
+                if after is None:
+                    cur.execute(page_query(limit='LIMIT %(limit)s'), dict(params, limit=batch_size))
+                else:
+                    cur.execute(page_query(keyset, 'LIMIT %(limit)s'), dict(params, limit=batch_size, **after))
+                page = cur.fetchall()
+            self._rows_read(len(page))
+            yield from _records(cur, page)
+            if len(page) < batch_size:
+                return
+            last = dict(zip((column.name for column in cur.description), page[-1]))
+            after = {f"after_{i}": last[column] for i, column in enumerate(order)}
+
+    def _computed(self, object_type):
+        """
+        Expresiones SQL de las columnas calculadas de un tipo; las que dependen
+        de una función del servidor son NULL en modo de carga diferida o si el
+        servidor no la tiene.
+        """
+        computed = {}
+        for name, (expression, function) in object_type.computed.items():
+            if function and (self.lazy_definitions or not self.capabilities.has_function(function)):
+                expression = "NULL"
+            computed[name] = expression
+        return computed
+
+    def query_params(self, name=None):
+        """Parámetros de las consultas del registro."""
+        return {'schema': self.schema, 'name': name,
+                'view_relkinds': self.capabilities.view_relkinds,
+                'index_relkinds': self.capabilities.index_relkinds}
+
+    def query_fragments(self):
+        """Fragmentos de las consultas del registro que dependen del servidor."""
+        # Desde PostgreSQL 11 los agregados se reconocen por prokind y antes
+        # por su fila en pg_aggregate
+        if self.capabilities.has_column('pg_proc', 'prokind'):
+            not_aggregate, aggregates = "p.prokind <> 'a'", ""
+        else:
+            not_aggregate = "ag.aggfnoid IS NULL"
+            aggregates = "LEFT JOIN pg_catalog.pg_aggregate ag ON ag.aggfnoid = p.oid"
+        return {'not_aggregate': not_aggregate, 'aggregates': aggregates,
+                'namespace': self.capabilities.namespace_oid('%(schema)s')}
+
+    def _unqualify(self, text):
+        """Quita de un texto las referencias al propio esquema ('esquema.tipo' -> 'tipo')."""
+        return re.sub(rf'(?<![\w$."])(?:{re.escape(self.schema)}|"{re.escape(self.schema)}")\.', '', text)
+
+    def read_section(self, object_type, name=None):
+        """
+        Obtener en una sola consulta los objetos de un tipo del registro.
+
+        Args:
+            object_type: ObjectType a extraer
+            name: Nombre opcional para obtener sólo ese objeto, en los tipos
+                cuya consulta lo admite (funciones, por el nombre de sus
+                sobrecargas, y vistas)
+
+        Returns:
+            Diccionario {clave: objeto}, o {padre: {clave: objeto}} si el tipo
+            es anidado
+        """
+        if object_type.nested:
+            objects = {}
+            for row in self._rows(object_type, name):
+                objects.setdefault(object_type.parent(row), {})[object_type.key(row)] = \
+                    self._object(object_type, row)
+            count = sum(len(children) for children in objects.values())
+        else:
+            objects = dict(self.iter_objects(object_type, name))
+            count = len(objects)
+        self.log(f"{object_type.agree('Obtenid')} {count} {object_type.noun} del esquema '{self.schema}'")
+        return objects
+
+    def iter_objects(self, object_type, name=None):
+        """
+        Genera los objetos de un tipo no anidado como pares (clave, objeto) en orden de clave.
+
+        Las filas llegan ordenadas por las columnas de object_type.order; sólo
+        las que comparten la primera de ellas se ordenan por clave en memoria.
+
+        Args:
+            object_type, name: Ver read_section
+        """
+        rows = self._rows(object_type, name)
+        for _, run in itertools.groupby(rows, key=itemgetter(object_type.order[0])):
+            yield from sorted(((object_type.key(row), self._object(object_type, row)) for row in run),
+                              key=itemgetter(0))
+
+    def _rows(self, object_type, name):
+        """Filas de la consulta de un tipo, sin el propio esquema en sus columnas unqualified."""
+        rows = self._fetch(object_type.query.format(**self.query_fragments()), self.query_params(name),
+                           object_type.order, self._computed(object_type))
+        for row in rows:
+            for column in object_type.unqualified:
+                row[column] = self._unqualify(row[column])
+            yield row
+
+    def _object(self, object_type, row):
+        """
+        Objeto de una fila. Con normalizer la definición se reduce a su hash
+        normalizado y su texto sólo se guarda si es la definición completa
+        que muestran los resultados (vistas e índices) y no hay carga diferida.
+        """
+        obj = {field: row[field] for field in object_type.fields}
+        if object_type.definition:
+            definition = row[object_type.definition]
+            if self.normalizer is not None:
+                obj['normalized_hash'] = self.normalizer.definition_hash(definition, self.schema)
+            if self.normalizer is None or (object_type.definition_field == 'definition'
+                                           and not self.lazy_definitions):
+                obj['definition'] = definition
+        return obj
+
+
+class ParallelCatalogExtractor:
+    """
+    Extrae las secciones del catálogo en paralelo con varias conexiones.
+
+    Todas las conexiones importan la misma instantánea exportada, de modo que
+    las secciones leídas en paralelo ven el mismo estado del catálogo aunque
+    se ejecute DDL durante la extracción.
+    """
+
+    def __init__(self, connect, schema, snapshot, workers=4, log_callback=None, lazy_definitions=False,
+                 throttle=None, itersize=None, normalizer=None, row_callback=None, cancellation=None,
+                 conn=None):
+        """
+        Args:
+            connect: Función sin argumentos que abre una conexión nueva al servidor
+            schema: Nombre del esquema a extraer
+            snapshot: Instantánea exportada con export_snapshot()
+            workers: Cantidad de conexiones en paralelo
+            log_callback: Función opcional que recibe (mensaje, nivel)
+            lazy_definitions, throttle, itersize, normalizer, row_callback,
+                cancellation: Ver CatalogExtractor
+            conn: Conexión que exportó la instantánea, de la que se leen las
+                secciones en streaming (ver extract)
+        """
+        self.connect = connect
+        self.schema = schema
+        self.snapshot = snapshot
+        self.workers = workers
+        self.log_callback = log_callback
+        self.lazy_definitions = lazy_definitions
+        self.throttle = throttle
+        self.itersize = itersize
+        self.normalizer = normalizer
+        self.row_callback = row_callback
+        self.cancellation = cancellation
+        self.conn = conn
+
+    def extractor(self, conn, snapshot=None):
+        """Crea un CatalogExtractor con las opciones de este extractor."""
+        return CatalogExtractor(conn, self.schema, log_callback=self.log_callback,
+                                lazy_definitions=self.lazy_definitions,
+                                snapshot=snapshot, throttle=self.throttle,
+                                itersize=self.itersize, normalizer=self.normalizer,
+                                row_callback=self.row_callback,
+                                cancellation=self.cancellation)
+
+    def extract(self, progress_callback=None, subtrees=None, streamed=()):
+        """
+        Extrae el catálogo del esquema (ver CatalogExtractor.extract).
+
+        Las secciones de streamed se leen al compararlas de conn, que ya está
+        en la transacción de la instantánea.
+        """
+        sections = [section for section in catalog_sections(subtrees) if section not in streamed]
+        extractors = queue.Queue()
+        connections = []
+        try:
+            for _ in range(min(self.workers, len(sections))):
+                conn = self.connect()
+                connections.append(conn)
+                extractors.put(self.extractor(conn, self.snapshot))
+
+            def extract_section(section):
+                # Cada conexión extrae una sola sección a la vez
+                extractor = extractors.get()
+                try:
+                    return extractor.extract_section(section)
+                finally:
+                    extractors.put(extractor)
+
+            extracted = {}
+            with ThreadPoolExecutor(max_workers=max(1, len(connections))) as pool:
+                futures = {pool.submit(extract_section, section): section for section in sections}
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        extracted[futures[future]] = future.result()
+                        if progress_callback:
+                            progress_callback(done, len(sections))
+                except BaseException:
+                    # Si una sección falla (o se cancela) no se empiezan las pendientes
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            for conn in connections:
+                conn.close()
+
+        catalog = {'schema': self.schema}
+        reader = self.extractor(self.conn) if streamed else None
+        for section in catalog_sections(subtrees):
+            catalog[section] = SectionStream(reader, section) if section in streamed else extracted[section]
+        return catalog
@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de comparación de esquemas PostgreSQL independiente de la interfaz gráfica.
+
+La comparación se divide en tres etapas reutilizables por separado:
+extracción (CatalogExtractor), normalización (SchemaNormalizer) y
+comparación (SchemaDiffer). La interfaz (ComparisonWorker) y la línea de
+comandos utilizan el motor a través de callbacks de progreso y de log.
+
+La comparación se puede cancelar desde otro hilo con cancel(); run() lanza
+entonces ComparisonCancelled con los resultados obtenidos hasta el momento.
+"""
+
+import logging
+from core.cancellation import CancellationToken, ComparisonCancelled
+from core.schema_normalizer import SchemaNormalizer
+from core.capabilities import server_capabilities
+from core.catalog_extractor import (CATALOG_SUBTREES, STREAMED_SECTIONS, CatalogExtractor,
+                                    ParallelCatalogExtractor, SectionStream, export_snapshot)
+from core.schema_differ import SchemaDiffer
+from core.definition_loader import DefinitionLoader
+from core.db_connector import connect_db
+from core.fingerprint import SchemaFingerprint
+from core.planner import DEFINITION_SECTIONS, ExecutionPlanner
+from core.preflight import Preflight, versions_compatible
+from core.progress import ProgressTracker
+from core.throttle import AdaptiveThrottle
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+class ComparisonEngine:
+    """Ejecuta la comparación de esquemas sin depender de PyQt."""
+    
+    def __init__(self, conn_params1, conn_params2, progress_callback=None, log_callback=None,
+                 lazy_definitions=False, differences_only=False, fingerprint=False,
+                 extraction_workers=1, throttle_latency=None, itersize=None, auto_plan=False,
+                 eta_callback=None, results_callback=None, subtrees=None):
+        """
+        Inicializa el motor de comparación.
+        
+        Args:
+            conn_params1: Parámetros de conexión del primer esquema
+            conn_params2: Parámetros de conexión del segundo esquema
+            progress_callback: Función opcional que recibe el porcentaje de avance
+            log_callback: Función opcional que recibe (mensaje, nivel)
+            lazy_definitions: Si es True los resultados no incluyen las definiciones
+                completas; se obtienen después con definition_loader()
+            differences_only: Si es True no se generan resultados para los objetos
+                idénticos; sólo se cuentan en omitted_identical
+            fingerprint: Si es True se compara primero la huella de ambos esquemas
+                y sólo se extraen y comparan los tipos de objeto que difieren; los
+                objetos de los tipos idénticos se cuentan en omitted_identical
+            extraction_workers: Conexiones por esquema para extraer el catálogo en
+                paralelo; con más de una, todas leen la instantánea exportada por
+                la conexión principal
+            throttle_latency: Si se indica, cada sección del catálogo se extrae por
+                lotes paginados por su clave de orden cuyo tamaño y concurrencia se
+                adaptan para que cada lote tarde como máximo estos segundos (ver
+                AdaptiveThrottle)
+            itersize: Si se indica, el catálogo se lee con cursores del servidor en
+                bloques de itersize filas y cada definición se normaliza y se reduce
+                a su hash a medida que llega; run() además compara las funciones,
+                vistas e índices mientras los lee, sin guardarlos
+            auto_plan: Si es True, ExecutionPlanner puede activar la huella, la
+                extracción en paralelo y la lectura en streaming según el tamaño
+                de los catálogos, además de las que se pidan con las demás opciones
+            eta_callback: Función opcional que recibe los segundos restantes estimados
+            results_callback: Función opcional que recibe (grupo, resultados) en
+                cuanto se compara cada grupo de CATALOG_SUBTREES, ya guardados en
+                el ResultStore si se usa uno; omitted_identical está al día. Los
+                grupos que la huella confirma idénticos se notifican sin resultados
+            subtrees: Grupos de CATALOG_SUBTREES a comparar, o None para todos;
+                la huella puede reducirlos todavía más
+        """
+        self.conn_params1 = conn_params1
+        self.conn_params2 = conn_params2
+        self.progress_callback = progress_callback
+        self.log_callback = log_callback
+        self.lazy_definitions = lazy_definitions
+        self.differences_only = differences_only
+        self.fingerprint = fingerprint
+        self.extraction_workers = extraction_workers
+        self.throttle_latency = throttle_latency
+        self.itersize = itersize
+        self.auto_plan = auto_plan
+        self.results_callback = results_callback
+        # Cancelación pedida desde otro hilo (ver cancel)
+        self.cancellation = CancellationToken()
+        # Avance por objetos procesados, planificado tras la comprobación previa
+        self.tracker = ProgressTracker(progress_callback, eta_callback)
+        # Objetos idénticos por tipo omitidos de los resultados de la última comparación
+        self.omitted_identical = {}
+        # Grupos de CATALOG_SUBTREES pedidos y los que se comparan (None para todos)
+        self.requested_subtrees = subtrees
+        self.subtrees = subtrees
+        # Objetos idénticos omitidos por grupo: los de los grupos que la huella
+        # confirmó idénticos y, en modo sólo diferencias, los que sólo se contaron
+        self.omitted_by_subtree = {}
+        # Grupos comparados con alguna sección que no se pudo extraer
+        self.incomplete_subtrees = set()
+        # Conexiones abiertas por extract_catalogs
+        self.connections = []
+
+        # Inicializar el normalizador de esquemas
+        self.normalizer = SchemaNormalizer(conn_params1['schema'], conn_params2['schema'])
+        
+        # Log de inicialización
+        self.log(f"Inicializado normalizador de esquemas para '{conn_params1['schema']}' y '{conn_params2['schema']}'", 
+                 logging.INFO)
+    
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+    
+    def progress(self, value):
+        """Notifica el porcentaje de avance de la comparación."""
+        if self.progress_callback:
+            self.progress_callback(value)
+    
+    def cancel(self):
+        """
+        Cancela la comparación en curso; se puede llamar desde cualquier hilo.
+        
+        Las consultas en curso se cancelan en el servidor y el resto del
+        trabajo se detiene en el siguiente bloque.
+        """
+        self.log("Cancelando la comparación...", logging.WARNING)
+        self.cancellation.cancel()
+    
+    def run(self, store=None):
+        """
+        Ejecuta la comparación completa: extracción, normalización y comparación.
+        
+        Args:
+            store: ResultStore opcional donde guardar los resultados
+            
+        Returns:
+            Lista de resultados de la comparación, o store si se indicó
+            
+        Raises:
+            ComparisonCancelled: Si se llamó a cancel(); incluye los resultados
+                obtenidos hasta ese momento
+            Exception: Si no es posible conectar o los esquemas no existen
+        """
+        try:
+            catalog1, catalog2 = self.extract_catalogs(stream=True)
+            try:
+                results = self.compare_catalogs(catalog1, catalog2, store)
+            finally:
+                self.close_connections()
+        except ComparisonCancelled as e:
+            if e.results is not None:
+                raise
+            self.log("Comparación cancelada durante la extracción", logging.WARNING)
+            raise ComparisonCancelled(store) from e
+        except Exception as e:
+            # Una consulta cancelada en el servidor falla con su propio error
+            if self.cancellation.cancelled:
+                self.log("Comparación cancelada durante la extracción", logging.WARNING)
+                raise ComparisonCancelled(store) from e
+            raise
+        
+        self.log(f"Comparación completada. Se encontraron {len(results)} diferencias.")
+        self.progress(100)
+        return results
+    
+    def extract_catalogs(self, stream=False):
+        """
+        Conecta a ambas bases de datos y extrae los catálogos de los esquemas.
+        
+        Las conexiones se cierran al terminar, también si la extracción falla
+        o se cancela, salvo que algún catálogo tenga secciones en streaming:
+        esas se leen al compararlas y close_connections() cierra las
+        conexiones después.
+        
+        Args:
+            stream: Si es True, al leer en streaming las secciones de
+                STREAMED_SECTIONS quedan como SectionStream (ver extract)
+        
+        Returns:
+            Tupla (catalog1, catalog2)
+        """
+        self.connections = []
+        streamed = False
+        try:
+            # Conexión a las bases de datos
+            self.log("Iniciando conexión a la primera base de datos...")
+            self.progress(5)
+            conn1 = self.connect_db(self.conn_params1)
+            self.connections.append(conn1)
+            self.log(f"Conexión establecida a {self.conn_params1['dbname']} en {self.conn_params1['host']}")
+            
+            self.progress(10)
+            self.log("Iniciando conexión a la segunda base de datos...")
+            conn2 = self.connect_db(self.conn_params2)
+            self.connections.append(conn2)
+            self.log(f"Conexión establecida a {self.conn_params2['dbname']} en {self.conn_params2['host']}")
+            
+            self.progress(15)
+            catalogs = self._extract_catalogs(conn1, conn2, stream)
+            streamed = any(isinstance(objects, SectionStream)
+                           for catalog in catalogs for objects in catalog.values())
+            return catalogs
+        finally:
+            # El resto de la comparación no necesita la base de datos
+            if not streamed:
+                self.close_connections()
+    
+    def close_connections(self):
+        """Cierra las conexiones abiertas por extract_catalogs."""
+        opened = [conn for conn in self.connections if not conn.closed]
+        for conn in opened:
+            conn.close()
+        self.connections = []
+        if opened:
+            self.log("Conexiones cerradas correctamente")
+    
+    def _extract_catalogs(self, conn1, conn2, stream=False):
+        """Comprobación previa, plan y extracción de ambos esquemas con las conexiones abiertas."""
+        # Versión, existencia del esquema, tamaño del catálogo y huella: una consulta por conexión
+        preflight1, preflight2 = self.preflight(conn1, conn2)
+        
+        # Estrategia según el tamaño de los catálogos
+        planner = ExecutionPlanner(self.extraction_workers, fingerprint=self.fingerprint, itersize=self.itersize,
+                                   auto=self.auto_plan, differences_only=self.differences_only,
+                                   log_callback=self.log_callback)
+        
+        # Con la huella, sólo se extraen y comparan los tipos de objeto que difieren
+        self.subtrees = self.requested_subtrees
+        self.omitted_by_subtree = {}
+        if planner.use_fingerprint(preflight1, preflight2):
+            fingerprint1 = preflight1.fingerprint or SchemaFingerprint.compute(
+                conn1, preflight1.schema, preflight1.capabilities)
+            fingerprint2 = preflight2.fingerprint or SchemaFingerprint.compute(
+                conn2, preflight2.schema, preflight2.capabilities)
+            self.subtrees = self.compare_fingerprints(fingerprint1, fingerprint2)
+            # Los grupos idénticos ya están comparados
+            self.omitted_identical = self._omitted_identical()
+            if self.results_callback:
+                for subtree in self.omitted_by_subtree:
+                    self.results_callback(subtree, [])
+        
+        workers1 = planner.workers(preflight1, self.subtrees)
+        workers2 = planner.workers(preflight2, self.subtrees)
+        itersize = planner.batch_size(preflight1, preflight2, self.subtrees)
+        # Sólo las conexiones que extraen en paralelo pasan a REPEATABLE READ
+        snapshot1 = self.export_snapshot(conn1) if workers1 > 1 else None
+        snapshot2 = self.export_snapshot(conn2) if workers2 > 1 else None
+        
+        # El avance se mide en objetos procesados de cada fase
+        self.tracker.plan(planner.progress_phases(preflight1, preflight2, self.subtrees))
+        
+        # Extraer los catálogos de ambos esquemas
+        self.cancellation.check()
+        self.log("Extrayendo objetos del primer esquema...")
+        catalog1 = self.extract(conn1, self.conn_params1['schema'], phase='extract1',
+                                conn_params=self.conn_params1, snapshot=snapshot1, workers=workers1,
+                                itersize=itersize, stream=stream)
+        self.log("Extrayendo objetos del segundo esquema...")
+        catalog2 = self.extract(conn2, self.conn_params2['schema'], phase='extract2',
+                                conn_params=self.conn_params2, snapshot=snapshot2, workers=workers2,
+                                itersize=itersize, stream=stream)
+        return catalog1, catalog2
+    
+    def extract(self, conn, schema, phase=None, conn_params=None, snapshot=None, workers=None, itersize=None,
+                stream=False):
+        """
+        Extrae el catálogo de un esquema.
+        
+        Args:
+            conn: Conexión abierta a la base de datos
+            schema: Nombre del esquema
+            phase: Fase del avance (ver ProgressTracker) a la que suman las filas leídas
+            conn_params: Parámetros para abrir las conexiones de la extracción en paralelo
+            snapshot: Instantánea exportada por conn; si se indica junto con
+                conn_params, las secciones se extraen en paralelo
+            workers: Conexiones de la extracción en paralelo (por defecto
+                extraction_workers)
+            itersize: Tamaño de bloque de la lectura en streaming (por defecto
+                el de la opción itersize)
+            stream: Si es True y se lee en streaming, las secciones
+                de STREAMED_SECTIONS no se extraen: quedan como SectionStream
+                que se leen de conn, en orden de clave, al compararlas
+            
+        Returns:
+            Catálogo del esquema (ver CatalogExtractor.extract)
+        """
+        def on_rows(count):
+            # Entre bloque y bloque se comprueba si se canceló la comparación
+            self.cancellation.check()
+            if phase:
+                self.tracker.advance(phase, count)
+        
+        # En streaming las definiciones se normalizan a medida que llegan
+        itersize = itersize or self.itersize
+        streaming = {'itersize': itersize, 'normalizer': self.normalizer if itersize else None}
+        
+        workers = workers or self.extraction_workers
+        
+        # Un regulador por servidor, compartido por todas sus conexiones
+        throttle = None
+        if self.throttle_latency:
+            throttle = AdaptiveThrottle(self.throttle_latency,
+                                        max_concurrency=workers if snapshot else 1)
+        
+        if snapshot and conn_params:
+            extractor = ParallelCatalogExtractor(lambda: self.connect_db(conn_params), schema, snapshot,
+                                                 workers=workers,
+                                                 log_callback=self.log_callback,
+                                                 lazy_definitions=self.lazy_definitions,
+                                                 throttle=throttle, row_callback=on_rows,
+                                                 cancellation=self.cancellation, conn=conn, **streaming)
+        else:
+            extractor = CatalogExtractor(conn, schema, log_callback=self.log_callback,
+                                         lazy_definitions=self.lazy_definitions,
+                                         throttle=throttle, row_callback=on_rows,
+                                         cancellation=self.cancellation, **streaming)
+        # Las secciones en streaming se comparan mientras se leen, sin guardarlas
+        streamed = STREAMED_SECTIONS if stream and itersize else ()
+        catalog = extractor.extract(subtrees=self.subtrees, streamed=streamed)
+        if phase:
+            self.tracker.finish(phase)
+        return catalog
+    
+    def export_snapshot(self, conn):
+        """
+        Exporta la instantánea de la conexión para la extracción en paralelo.
+        
+        Returns:
+            Identificador de la instantánea, o None si el servidor no permite
+            exportarla (la extracción se hace entonces con una sola conexión)
+        """
+        if not server_capabilities(conn).has_function('pg_export_snapshot'):
+            self.log("El servidor no permite exportar instantáneas; se extraerá con una sola conexión",
+                     logging.WARNING)
+            return None
+        try:
+            snapshot = export_snapshot(conn)
+            self.log(f"Instantánea {snapshot} exportada para la extracción en paralelo")
+            return snapshot
+        except Exception as e:
+            self.log(f"No se pudo exportar la instantánea; se extraerá con una sola conexión: {str(e)}",
+                     logging.WARNING)
+            conn.rollback()
+            conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+            return None
+    
+    def preflight(self, conn1, conn2):
+        """
+        Comprueba ambas conexiones con una consulta cada una (ver Preflight).
+        
+        Returns:
+            Tupla (preflight1, preflight2)
+            
+        Raises:
+            Exception: Si alguno de los esquemas no existe o no es accesible
+        """
+        preflights = []
+        for n, (conn, params, ordinal) in enumerate(((conn1, self.conn_params1, 'primera'),
+                                                     (conn2, self.conn_params2, 'segunda')), 1):
+            info = Preflight.run(conn, params['schema'], fingerprint=self.fingerprint)
+            self.log(f"PostgreSQL versión {n}: {info.version}")
+            if not info.schema_exists:
+                error_msg = (f"El esquema '{params['schema']}' no existe en la {ordinal} base de datos "
+                             f"o el usuario no tiene permiso USAGE sobre él")
+                self.log(error_msg, logging.ERROR)
+                raise Exception(error_msg)
+            preflights.append(info)
+        
+        preflight1, preflight2 = preflights
+        if not versions_compatible(preflight1.version_num, preflight2.version_num):
+            self.log(f"Advertencia: Las versiones de PostgreSQL difieren significativamente "
+                     f"({preflight1.version} vs {preflight2.version}). Pueden ocurrir errores de compatibilidad.",
+                     logging.WARNING)
+        self.log(f"Esquemas verificados: '{preflight1.schema}' ({preflight1.total_objects()} objetos) y "
+                 f"'{preflight2.schema}' ({preflight2.total_objects()} objetos) existen")
+        return preflight1, preflight2
+    
+    def compare_fingerprints(self, fingerprint1, fingerprint2):
+        """
+        Compara la huella de ambos esquemas.
+        
+        Returns:
+            Lista de los grupos pedidos (ver requested_subtrees) cuyo hash
+            difiere (vacía si son idénticos en ambos esquemas)
+        """
+        subtrees = [subtree for subtree in fingerprint1.differing_subtrees(fingerprint2)
+                    if self.requested_subtrees is None or subtree in self.requested_subtrees]
+        
+        # Los objetos de los grupos con el mismo hash son idénticos en ambos esquemas
+        for subtree, counts in fingerprint1.counts.items():
+            if subtree not in subtrees and (self.requested_subtrees is None
+                                            or subtree in self.requested_subtrees):
+                self.omitted_by_subtree[subtree] = dict(counts)
+        
+        if subtrees:
+            self.log(f"Las huellas de los esquemas difieren en: {', '.join(subtrees)}")
+        else:
+            self.log(f"Los esquemas tienen la misma huella ({fingerprint1.root}): son idénticos")
+        return subtrees
+    
+    def normalize(self, catalog):
+        """Añade al catálogo las definiciones sin referencias a esquemas."""
+        return self.normalizer.normalize_catalog(catalog)
+    
+    def diff(self, catalog1, catalog2, store=None):
+        """
+        Compara dos catálogos normalizados.
+        
+        Con un ResultStore los resultados de cada tipo de objeto se guardan en
+        disco en cuanto se generan y se devuelve el propio store; si no, se
+        devuelve la lista de resultados.
+        """
+        differ = SchemaDiffer(self.normalizer, log_callback=self.log_callback,
+                              lazy_definitions=self.lazy_definitions,
+                              differences_only=self.differences_only,
+                              progress_callback=lambda subtree, count: self.tracker.advance(
+                                  f"diff_{subtree}", count))
+        results = [] if store is None else store
+        # Un grupo con una sección que no se pudo extraer se compara sin ella
+        self.incomplete_subtrees = {
+            subtree for subtree, sections in CATALOG_SUBTREES.items()
+            if (self.subtrees is None or subtree in self.subtrees)
+            and any(catalog.get(section) is None for catalog in (catalog1, catalog2) for section in sections)}
+        self.omitted_identical = self._omitted_identical()
+        counted = {}
+        for subtree, section_results in differ.diff_sections(catalog1, catalog2, self.subtrees):
+            if store is None:
+                results.extend(section_results)
+            else:
+                store.add_many(section_results, subtree)
+            if self.differences_only:
+                self.omitted_by_subtree[subtree] = {tipo: count - counted.get(tipo, 0)
+                                                    for tipo, count in differ.identical_counts.items()
+                                                    if count > counted.get(tipo, 0)}
+                counted = dict(differ.identical_counts)
+            self.omitted_identical = self._omitted_identical()
+            self.tracker.finish(f"diff_{subtree}")
+            if self.results_callback:
+                self.results_callback(subtree, section_results)
+            # Los grupos ya comparados quedan como resultados parciales
+            if self.cancellation.cancelled:
+                self.log(f"Comparación cancelada: {len(results)} resultados parciales", logging.WARNING)
+                self.cancellation.check(results)
+        
+        return results
+    
+    def update_omitted(self, subtree, counts):
+        """Reemplaza los objetos idénticos omitidos de un grupo comparado de nuevo (ver SchemaWatcher)."""
+        self.omitted_by_subtree[subtree] = counts
+        self.omitted_identical = self._omitted_identical()
+    
+    def _omitted_identical(self):
+        """Objetos idénticos omitidos hasta el momento, por tipo, sumando los de todos los grupos."""
+        omitted = {}
+        for counts in self.omitted_by_subtree.values():
+            for tipo, count in counts.items():
+                omitted[tipo] = omitted.get(tipo, 0) + count
+        return omitted
+    
+    def definition_loader(self):
+        """Crea un DefinitionLoader para completar las definiciones de los resultados."""
+        return DefinitionLoader(self.conn_params1, self.conn_params2, self.normalizer,
+                                log_callback=self.log_callback)
+    
+    def compare_catalogs(self, catalog1, catalog2, store=None, reference_normalized=False):
+        """
+        Normaliza y compara dos catálogos ya extraídos, sin acceder a la base de datos.
+        
+        Args:
+            catalog1: Catálogo del primer esquema
+            catalog2: Catálogo del segundo esquema
+            store: ResultStore opcional donde guardar los resultados
+            reference_normalized: Si es True catalog1 ya está normalizado para
+                estos esquemas (ver SchemaNormalizer.normalized_copy) y se
+                compara sin modificarlo, de modo que varias comparaciones pueden
+                compartirlo
+            
+        Returns:
+            Lista de resultados de la comparación, o store si se indicó
+        """
+        self.log("Normalizando definiciones...")
+        for catalog in (catalog2,) if reference_normalized else (catalog1, catalog2):
+            self.cancellation.check(store)
+            self.normalize(catalog)
+            self.tracker.advance('normalize', sum(len(catalog[section]) for section in DEFINITION_SECTIONS
+                                                  if isinstance(catalog.get(section), dict)))
+        self.tracker.finish('normalize')
+        
+        self.log("Comparando objetos...")
+        return self.diff(catalog1, catalog2, store)
+    
+    def connect_db(self, params):
+        """Conecta a la base de datos (ver db_connector.connect_db)"""
+        self.cancellation.check()
+        conn = connect_db(params, log=self.log)
+        # Sus consultas en curso se cancelan en el servidor con cancel()
+        self.cancellation.register(conn)
+        return conn
@@ -3,18 +3,46 @@
 Funciones para la conexión a bases de datos PostgreSQL.
 """
 
+import time
 import psycopg2
 import logging
+from psycopg2.extensions import QueryCanceledError
 
 # Obtener logger
 logger = logging.getLogger('SchemaComparator')
 
-def connect_db(params):
+# Nombre con el que las sesiones aparecen en pg_stat_activity
+APPLICATION_NAME = 'schema_comparator'
+
+# Reintentos ante errores transitorios y espera antes del primero (se duplica en cada uno)
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 2.0
+
+def with_timeouts(params, connect_timeout=None, statement_timeout=None):
+    """
+    Devuelve una copia de los parámetros de conexión con tiempos de espera.
+
+    Args:
+        params: Parámetros de conexión
+        connect_timeout: Segundos de espera para establecer la conexión
+        statement_timeout: Segundos que puede durar cada consulta en el servidor
+    """
+    params = dict(params)
+    if connect_timeout:
+        params.setdefault('connect_timeout', int(connect_timeout))
+    if statement_timeout:
+        params.setdefault('options', f"-c statement_timeout={int(statement_timeout * 1000)}")
+    return params
+
+def connect_db(params, log=None):
     """
     Conecta a la base de datos PostgreSQL con manejo de errores mejorado.
     
     Args:
-        params: Diccionario con parámetros de conexión (host, port, dbname, user, password)
+        params: Diccionario con parámetros de conexión (host, port, dbname, user, password
+            y, opcionalmente, connect_timeout, options y application_name)
+        log: Función opcional (mensaje, nivel) que registra los errores; por
+            defecto se registran en el logger
         
     Returns:
         Conexión a la base de datos
@@ -28,54 +56,67 @@ def connect_db(params):
             port=params['port'],
             dbname=params['dbname'],
             user=params['user'],
-            password=params['password']
+            password=params['password'],
+            # Opcionales: tiempo de espera de la conexión y opciones del servidor
+            connect_timeout=params.get('connect_timeout'),
+            options=params.get('options'),
+            application_name=params.get('application_name', APPLICATION_NAME)
         )
     except psycopg2.OperationalError as e:
         error_msg = f"Error de conexión a {params['dbname']} en {params['host']}: {str(e)}"
-        logger.error(error_msg)
-        raise Exception(error_msg)
+        if log:
+            log(error_msg, logging.ERROR)
+        else:
+            logger.error(error_msg)
+        raise Exception(error_msg) from e
     except Exception as e:
         error_msg = f"Error inesperado al conectar a {params['dbname']}: {str(e)}"
-        logger.error(error_msg)
-        raise Exception(error_msg)
+        if log:
+            log(error_msg, logging.ERROR)
+        else:
+            logger.error(error_msg)
+        raise Exception(error_msg) from e
 
-def verify_postgres_versions(conn1, conn2):
+def is_transient(error):
     """
-    Verificar versiones de PostgreSQL para asegurar compatibilidad.
-    
+    Indica si un error se debe a una conexión perdida o rechazada, que puede
+    no repetirse al reintentar.
+
+    Las consultas canceladas (statement_timeout o cancelación) no son
+    transitorias aunque psycopg2 las informe como OperationalError.
+    """
+    while error is not None:
+        if isinstance(error, psycopg2.OperationalError) and not isinstance(error, QueryCanceledError):
+            return True
+        error = error.__cause__
+    return False
+
+def retry_transient(operation, retries=DEFAULT_RETRIES, backoff=RETRY_BACKOFF, log=None):
+    """
+    Ejecuta una operación y la reintenta si falla por un error transitorio.
+
     Args:
-        conn1: Conexión a la primera base de datos
-        conn2: Conexión a la segunda base de datos
-        
+        operation: Función sin argumentos; cada intento la vuelve a llamar
+            completa, así que debe abrir sus propias conexiones
+        retries: Reintentos como máximo
+        backoff: Segundos de espera antes del primer reintento; se duplican
+            en cada uno
+        log: Función opcional (mensaje, nivel) que registra los reintentos
+
     Returns:
-        Tupla con las versiones detectadas
+        Lo que devuelva la operación
     """
-    try:
-        cur1 = conn1.cursor()
-        cur1.execute("SELECT version()")
-        version1 = cur1.fetchone()[0]
-        
-        cur2 = conn2.cursor()
-        cur2.execute("SELECT version()")
-        version2 = cur2.fetchone()[0]
-        
-        # Extraer números de versión (como 12.4, 13.1, etc.)
-        import re
-        pg_version1 = re.search(r'PostgreSQL (\d+\.\d+)', version1).group(1)
-        pg_version2 = re.search(r'PostgreSQL (\d+\.\d+)', version2).group(1)
-        
-        logger.info(f"PostgreSQL versión 1: {pg_version1}")
-        logger.info(f"PostgreSQL versión 2: {pg_version2}")
-        
-        # Verificar compatibilidad de versiones
-        major_version1 = int(pg_version1.split('.')[0])
-        major_version2 = int(pg_version2.split('.')[0])
-        
-        if abs(major_version1 - major_version2) > 1:
-            logger.warning(f"Advertencia: Las versiones de PostgreSQL difieren significativamente ({pg_version1} vs {pg_version2}). Pueden ocurrir errores de compatibilidad.")
-        
-        return (pg_version1, pg_version2)
-        
-    except Exception as e:
-        logger.warning(f"Error al verificar versiones de PostgreSQL: {str(e)}")
-        return (None, None)
\ No newline at end of file
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = backoff * 2 ** attempt
+            message = (f"Error transitorio ({' '.join(str(e).split())}); "
+                       f"reintento {attempt + 1} de {retries} en {delay:.0f} s")
+            if log:
+                log(message, logging.WARNING)
+            else:
+                logger.warning(message)
+            time.sleep(delay)
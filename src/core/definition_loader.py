@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Carga diferida de las definiciones de los objetos comparados.
+
+Cuando la comparación se ejecuta con lazy_definitions los resultados sólo
+guardan el hash de cada definición. DefinitionLoader obtiene el texto
+completo de la base de datos y lo normaliza la primera vez que se consulta
+el detalle de un objeto; el resultado queda completado y las consultas
+siguientes no vuelven a acceder a la base de datos.
+"""
+
+import logging
+from core.catalog_extractor import CatalogExtractor
+from core.db_connector import connect_db
+from core.object_types import FUNCTIONS, VIEWS
+from core.results import NOT_EXISTS
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+class DefinitionLoader:
+    """Completa bajo demanda las definiciones de los resultados de una comparación."""
+
+    def __init__(self, conn_params1, conn_params2, normalizer, log_callback=None):
+        """
+        Args:
+            conn_params1: Parámetros de conexión del primer esquema
+            conn_params2: Parámetros de conexión del segundo esquema
+            normalizer: SchemaNormalizer usado en la comparación
+            log_callback: Función opcional que recibe (mensaje, nivel)
+        """
+        self.conn_params = (conn_params1, conn_params2)
+        self.normalizer = normalizer
+        self.log_callback = log_callback
+        # Las conexiones se abren en la primera consulta y se reutilizan
+        self.connections = [None, None]
+
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def load(self, result):
+        """
+        Completa las definiciones completas y normalizadas de un resultado.
+
+        Args:
+            result: ComparisonResult de una función, vista o índice
+
+        Returns:
+            El mismo resultado, con esquema1_full, esquema2_full y las
+            definiciones normalizadas cargadas
+        """
+        if result.has_definitions() or result.tipo not in ('FUNCIÓN', 'VISTA', 'ÍNDICE'):
+            return result
+
+        definitions = []
+        for side in (0, 1):
+            schema = self.conn_params[side]['schema']
+            summary = result.esquema1 if side == 0 else result.esquema2
+            expected_hash = result.esquema1_hash if side == 0 else result.esquema2_hash
+
+            if summary == NOT_EXISTS:
+                definitions.append((NOT_EXISTS, NOT_EXISTS))
+                continue
+
+            if result.tipo == 'ÍNDICE':
+                # La definición del índice ya es el texto mostrado en el resultado
+                full = definition = summary
+            else:
+                full, definition = self.fetch(side, result.tipo, result.objeto)
+
+            if full is None:
+                self.log(f"No se encontró la definición de {result.objeto} en el esquema '{schema}'",
+                         logging.WARNING)
+                full = definition = NOT_EXISTS
+            elif expected_hash and self.normalizer.definition_hash(definition, schema) != expected_hash:
+                self.log(f"La definición de {result.objeto} en el esquema '{schema}' cambió "
+                         f"después de la comparación", logging.WARNING)
+
+            normalized = full if full == NOT_EXISTS else self.normalizer.normalize_definition(full, schema)
+            definitions.append((full, normalized))
+
+        (result.esquema1_full, result.esquema1_normalized), \
+            (result.esquema2_full, result.esquema2_normalized) = definitions
+        return result
+
+    def fetch(self, side, tipo, objeto):
+        """
+        Obtiene de la base de datos la definición de una función o vista.
+
+        Returns:
+            Tupla (definición completa, definición comparada), o (None, None)
+            si el objeto ya no existe
+        """
+        params = self.conn_params[side]
+        if self.connections[side] is None:
+            self.connections[side] = connect_db(params)
+        conn = self.connections[side]
+
+        extractor = CatalogExtractor(conn, params['schema'], log_callback=self.log_callback)
+        # Las funciones se leen por nombre, con todas sus sobrecargas
+        object_type, name = (FUNCTIONS, objeto.split('(')[0]) if tipo == 'FUNCIÓN' else (VIEWS, objeto)
+        try:
+            objects = extractor.read_section(object_type, name=name)
+        finally:
+            # No dejar una transacción abierta mientras el usuario revisa los resultados
+            conn.rollback()
+
+        obj = objects.get(objeto)
+        if obj is None:
+            return None, None
+        return obj[object_type.definition_field], obj['definition']
+
+    def close(self):
+        """Cierra las conexiones abiertas por el cargador."""
+        for i, conn in enumerate(self.connections):
+            if conn is not None:
+                conn.close()
+                self.connections[i] = None
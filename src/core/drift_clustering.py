@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Agrupación de esquemas (tenants) según sus desviaciones respecto a una referencia.
+
+Cada tenant se resume en una firma: el conjunto de sus desviaciones, donde
+cada desviación se identifica por el tipo, el objeto, el estado y las
+definiciones normalizadas con SchemaNormalizer (sin nombres de esquema), de
+modo que la misma desviación produce el mismo elemento en todos los tenants.
+
+Los tenants con la misma firma forman un grupo exacto. Los grupos con firmas
+casi iguales se unen con MinHash y LSH: sólo se comparan los pares que caen
+en el mismo bucket de alguna banda, así que el coste crece casi linealmente
+con la cantidad de tenants.
+"""
+
+import hashlib
+import random
+from core.results import IDENTICAL
+
+# Primo de Mersenne 2^61 - 1 para las funciones hash de MinHash
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def _token_hash(text):
+    """Entero de 32 bits estable (independiente de PYTHONHASHSEED) para un texto."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=4).digest(), 'big')
+
+def drift_signature(results, normalizer, schema1, schema2):
+    """
+    Construye la firma de desviaciones de un tenant.
+
+    Args:
+        results: Resultados de la comparación entre la referencia y el tenant
+        normalizer: SchemaNormalizer de esa comparación
+        schema1: Esquema de referencia
+        schema2: Esquema del tenant
+
+    Returns:
+        Diccionario {desviación: descripción} con una entrada por resultado no idéntico
+    """
+    signature = {}
+    for result in results:
+        if result['estado'] == IDENTICAL:
+            continue
+        side1 = result.get('esquema1_hash') or normalizer.normalize_definition(result['esquema1'], schema1)
+        side2 = result.get('esquema2_hash') or normalizer.normalize_definition(result['esquema2'], schema2)
+        drift = '\x1f'.join((result['tipo'], result['objeto'], result['estado'], side1, side2))
+        signature[drift] = f"{result['estado']}\t{result['tipo']}\t{result['objeto']}\t{result['detalle']}"
+    return signature
+
+class MinHasher:
+    """Calcula firmas MinHash de conjuntos de textos."""
+
+    def __init__(self, num_perm=64, seed=1):
+        """
+        Args:
+            num_perm: Cantidad de funciones hash (longitud de la firma)
+            seed: Semilla de las funciones hash, para firmas reproducibles
+        """
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                             for _ in range(num_perm)]
+
+    def signature(self, tokens):
+        """Devuelve la firma MinHash (tupla de num_perm enteros) de un conjunto de textos."""
+        hashes = [_token_hash(token) for token in tokens]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+                     for a, b in self.permutations)
+
+def _jaccard(set1, set2):
+    """Similitud de Jaccard exacta de dos conjuntos."""
+    if not set1 and not set2:
+        return 1.0
+    return len(set1 & set2) / len(set1 | set2)
+
+def cluster_drift(signatures, threshold=0.8, num_perm=64, bands=16):
+    """
+    Agrupa tenants con desviaciones idénticas o casi idénticas.
+
+    Args:
+        signatures: Diccionario {tenant: firma de drift_signature}
+        threshold: Similitud de Jaccard mínima para unir dos grupos (1.0 = sólo idénticos)
+        num_perm: Longitud de las firmas MinHash
+        bands: Bandas de LSH (num_perm debe ser múltiplo)
+
+    Returns:
+        Lista de grupos, del más numeroso al menos numeroso, cada uno con
+        'miembros' (tenants), 'desviaciones' (descripciones comunes a todos los
+        miembros) y 'variantes' (descripciones presentes sólo en algunos)
+    """
+    # 1. Grupos exactos: tenants con el mismo conjunto de desviaciones
+    exact = {}
+    for tenant, signature in signatures.items():
+        exact.setdefault(frozenset(signature), []).append(tenant)
+    keys = list(exact)
+
+    # 2. LSH sobre las firmas MinHash de cada grupo exacto
+    parent = list(range(len(keys)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if threshold < 1.0 and len(keys) > 1:
+        hasher = MinHasher(num_perm)
+        rows = num_perm // bands
+        buckets = {}
+        for i, key in enumerate(keys):
+            minhash = hasher.signature(key)
+            for band in range(bands):
+                bucket = (band, minhash[band * rows:(band + 1) * rows])
+                buckets.setdefault(bucket, []).append(i)
+
+        # Verificar con la similitud exacta cada par de candidatos de un bucket
+        # antes de unirlos; un par que comparte varias bandas se verifica una vez
+        verified = set()
+        for candidates in buckets.values():
+            for n, first in enumerate(candidates):
+                for other in candidates[n + 1:]:
+                    if find(first) == find(other) or (first, other) in verified:
+                        continue
+                    verified.add((first, other))
+                    if _jaccard(keys[first], keys[other]) >= threshold:
+                        parent[find(other)] = find(first)
+
+    # 3. Construir el informe de cada grupo
+    groups = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(find(i), []).append(i)
+
+    clusters = []
+    for indexes in groups.values():
+        members = sorted(tenant for i in indexes for tenant in exact[keys[i]])
+        common = frozenset.intersection(*(keys[i] for i in indexes))
+        variants = frozenset.union(*(keys[i] for i in indexes)) - common
+        descriptions = {}
+        for tenant in members:
+            descriptions.update(signatures[tenant])
+        clusters.append({
+            'miembros': members,
+            'desviaciones': sorted(descriptions[drift] for drift in common),
+            'variantes': sorted(descriptions[drift] for drift in variants)
+        })
+    clusters.sort(key=lambda cluster: (-len(cluster['miembros']), cluster['miembros']))
+    return clusters
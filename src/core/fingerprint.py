@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Huella jerárquica (árbol de Merkle) de un esquema PostgreSQL.
+
+El servidor calcula un hash por objeto con los mismos datos que compara
+SchemaDiffer y los agrega por tipo de objeto en una sola consulta; aquí se
+combinan en un hash por subárbol (tabla, función, vista, constraint, índice)
+y un hash raíz. Si las raíces coinciden los esquemas son idénticos; si no,
+sólo hace falta extraer y comparar los subárboles cuyo hash difiere.
+
+Las referencias al propio esquema se sustituyen en el servidor, de modo que
+dos definiciones con la misma huella también son iguales para
+SchemaNormalizer. Lo contrario no siempre ocurre (el normalizador reconoce
+más referencias), pero en ese caso el subárbol simplemente se compara completo.
+"""
+
+import hashlib
+import logging
+from core.catalog_extractor import CATALOG_SUBTREES
+from core.object_types import CONSTRAINTS, FOREIGN_KEY_REFERENCES, FUNCTION_PARAMETERS
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Sustituye las referencias "esquema." por NORMALIZED_SCHEMA. igual que
+# SchemaNormalizer._normalize_schema_reference (sin distinguir mayúsculas)
+_NORMALIZE = ("regexp_replace({0}, '(^|[^a-zA-Z0-9_])' || s.pattern || '\\.', "
+              "'\\1NORMALIZED_SCHEMA.', 'gi')")
+
+# Tipos de resultado que la consulta devuelve sin acentos, para no depender
+# de la codificación del cliente
+QUERY_TYPES = {'FUNCION': 'FUNCIÓN', 'INDICE': 'ÍNDICE'}
+
+# Un hash por objeto (subárbol, tipo del resultado idéntico, clave, hash) y
+# el agregado por subárbol y tipo; se ejecuta como parte de la comprobación
+# previa de la conexión (ver core.preflight). El tipo es NULL para los objetos que no
+# generan resultados IDÉNTICO propios (columnas, parámetros, referencias de FK).
+FINGERPRINT_QUERY = f"""
+    WITH s AS (
+        SELECT %(schema)s::text AS name,
+               regexp_replace(%(schema)s::text, '([^a-zA-Z0-9_])', '\\\\\\1', 'g') AS pattern
+    ),
+    objects (subtree, tipo, key, hash) AS (
+        SELECT 'tables', 'TABLA', t.table_name::text, ''
+        FROM information_schema.tables t, s
+        WHERE t.table_schema = s.name AND t.table_type = 'BASE TABLE'
+        UNION ALL
+        SELECT 'tables', NULL, c.table_name || '.' || c.column_name,
+               md5(concat_ws('|', c.data_type, c.character_maximum_length, c.is_nullable))
+        FROM information_schema.columns c, s
+        WHERE c.table_schema = s.name
+        UNION ALL
+        SELECT 'functions', 'FUNCION',
+               {_NORMALIZE.format("p.proname || '(' || oidvectortypes(p.proargtypes) || ')'")},
+               coalesce(md5({_NORMALIZE.format('p.prosrc')}), 'null')
+        FROM pg_catalog.pg_proc p
+        JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace, s
+        WHERE n.nspname = s.name
+        UNION ALL
+        SELECT 'functions', NULL,
+               {_NORMALIZE.format("fp.proname || '(' || fp.identity_arguments || ').' || fp.name")},
+               md5(concat_ws('|', {_NORMALIZE.format('fp.data_type')}, fp.mode))
+        FROM ({FUNCTION_PARAMETERS.query}) fp, s
+        UNION ALL
+        SELECT 'views', 'VISTA', c.relname::text,
+               md5(concat_ws('|', c.relkind, {_NORMALIZE.format('pg_get_viewdef(c.oid, true)')}))
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace, s
+        WHERE n.nspname = s.name AND c.relkind = ANY(%(view_relkinds)s)
+        UNION ALL
+        SELECT 'constraints', co.type, co."table" || '.' || co.name, md5(co.type)
+        FROM ({CONSTRAINTS.query}) co
+        UNION ALL
+        SELECT 'constraints', NULL, fk."table" || '.' || fk.name,
+               md5({_NORMALIZE.format('pg_get_constraintdef(fk.oid)')})
+        FROM ({FOREIGN_KEY_REFERENCES.query}) fk, s
+        UNION ALL
+        SELECT 'indexes', 'INDICE', t.relname || '.' || ci.relname,
+               md5({_NORMALIZE.format('pg_get_indexdef(ci.oid)')})
+        FROM pg_catalog.pg_class ci
+        JOIN pg_catalog.pg_index i ON ci.oid = i.indexrelid
+        JOIN pg_catalog.pg_class t ON t.oid = i.indrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = ci.relnamespace, s
+        WHERE ci.relkind = ANY(%(index_relkinds)s) AND n.nspname = s.name
+    )
+    SELECT subtree, tipo, count(DISTINCT key),
+           md5(string_agg(key || ':' || hash, ',' ORDER BY key, hash))
+    FROM objects
+    GROUP BY subtree, tipo
+"""
+
+# Señal de cambio de un esquema: cantidad de filas y xmin más reciente de cada
+# catálogo. Cualquier DDL que cambia lo que compara la huella inserta, borra o
+# actualiza alguna de estas filas (ALTER COLUMN ... SET NOT NULL sólo toca
+# pg_attribute, CREATE OR REPLACE VIEW actualiza pg_class), así que mientras la
+# señal no cambia tampoco lo hace la huella. ANALYZE y VACUUM actualizan pg_class
+# sin cambiar el xmin de sus filas.
+CHANGE_SIGNAL_QUERY = """
+    WITH n AS (SELECT oid FROM pg_catalog.pg_namespace WHERE nspname = %(schema)s)
+    SELECT 'pg_class', count(*), max(c.xmin::text::bigint)
+    FROM pg_catalog.pg_class c JOIN n ON n.oid = c.relnamespace
+    UNION ALL
+    SELECT 'pg_attribute', count(*), max(a.xmin::text::bigint)
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+    JOIN n ON n.oid = c.relnamespace
+    UNION ALL
+    SELECT 'pg_proc', count(*), max(p.xmin::text::bigint)
+    FROM pg_catalog.pg_proc p JOIN n ON n.oid = p.pronamespace
+    UNION ALL
+    SELECT 'pg_constraint', count(*), max(co.xmin::text::bigint)
+    FROM pg_catalog.pg_constraint co JOIN n ON n.oid = co.connamespace
+"""
+
+def change_signal(conn, schema):
+    """
+    Señal de cambio barata de un esquema (ver CHANGE_SIGNAL_QUERY).
+
+    Returns:
+        Lista de tuplas (catálogo, cantidad, xmin máximo), comparable con la
+        de una consulta anterior
+    """
+    cur = conn.cursor()
+    cur.execute(CHANGE_SIGNAL_QUERY, {'schema': schema})
+    return cur.fetchall()
+
+def _combine(parts):
+    """Hash de una lista de cadenas (nodo interno del árbol)."""
+    return hashlib.blake2b('\n'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+class SchemaFingerprint:
+    """Hash raíz, hash por subárbol y cantidad de objetos idénticos por tipo de un esquema."""
+
+    def __init__(self, schema, rows):
+        """
+        Args:
+            schema: Nombre del esquema
+            rows: Filas (subárbol, tipo, cantidad, hash) de FINGERPRINT_QUERY
+        """
+        self.schema = schema
+        self.subtrees = {}
+        self.counts = {subtree: {} for subtree in CATALOG_SUBTREES}
+        leaves = {subtree: [] for subtree in CATALOG_SUBTREES}
+        for subtree, tipo, count, digest in rows:
+            leaves[subtree].append(f"{tipo or ''}:{count}:{digest}")
+            if tipo:
+                self.counts[subtree][QUERY_TYPES.get(tipo, tipo)] = count
+        for subtree in CATALOG_SUBTREES:
+            self.subtrees[subtree] = _combine(sorted(leaves[subtree]))
+        self.root = _combine([f"{subtree}:{self.subtrees[subtree]}" for subtree in CATALOG_SUBTREES])
+
+    @classmethod
+    def compute(cls, conn, schema, capabilities):
+        """
+        Calcula la huella de un esquema con una sola consulta, cuando no se
+        calculó en la comprobación previa.
+
+        Args:
+            conn: Conexión abierta
+            schema: Nombre del esquema
+            capabilities: ServerCapabilities del servidor
+        """
+        cur = conn.cursor()
+        cur.execute(FINGERPRINT_QUERY, {'schema': schema, 'index_relkinds': capabilities.index_relkinds,
+                                        'view_relkinds': capabilities.view_relkinds})
+        rows = cur.fetchall()
+        logger.info(f"Huella del esquema '{schema}' calculada")
+        return cls(schema, rows)
+
+    def differing_subtrees(self, other):
+        """Devuelve los subárboles cuyo hash difiere del de otra huella, en orden de CATALOG_SUBTREES."""
+        if self.root == other.root:
+            return []
+        return [subtree for subtree in CATALOG_SUBTREES if self.subtrees[subtree] != other.subtrees[subtree]]
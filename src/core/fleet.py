@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Comparación de un esquema de referencia con el mismo esquema en muchos servidores.
+
+Los servidores se leen de un inventario JSON. El catálogo de referencia se
+extrae una sola vez y cada servidor se extrae y compara en un pool de hilos
+acotado (psycopg2 libera el GIL mientras espera al servidor), de modo que el
+tiempo total se acerca al del servidor más lento y no a la suma de todos.
+Cada servidor tiene su propio tiempo de espera para conectar y, si se
+indica, para cada consulta (statement_timeout); un
+servidor que falla o no responde no detiene la comparación de los demás.
+
+Con un BatchJournal cada servidor se compara por grupos de objetos que se
+guardan al terminar, de modo que una flota interrumpida se puede reanudar
+sin volver a consultar los servidores ya comparados; los errores
+transitorios de conexión se reintentan antes de dar un servidor por fallido.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.comparison_engine import ComparisonEngine
+from core.db_connector import DEFAULT_RETRIES, retry_transient, with_timeouts
+from core.preflight import Preflight, versions_compatible
+from core.results import summarize_results
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Valores por defecto de cada servidor del inventario
+INVENTORY_DEFAULTS = {'port': 5432, 'normalize_schemas': True}
+
+def load_inventory(path):
+    """
+    Lee un inventario de servidores.
+
+    El archivo es un objeto JSON con una lista "hosts" y, opcionalmente,
+    "defaults" con los parámetros comunes a todos los servidores:
+
+        {"defaults": {"dbname": "erp", "user": "postgres", "schema": "emp0044pro"},
+         "hosts": [{"name": "sucursal-01", "host": "10.0.0.1"}, ...]}
+
+    La contraseña, si no figura en el inventario, se toma de PGPASSWORD.
+
+    Returns:
+        Lista de diccionarios de parámetros de conexión, cada uno con su 'name'
+    """
+    with open(path, encoding='utf-8') as f:
+        inventory = json.load(f)
+    if isinstance(inventory, list):
+        inventory = {'hosts': inventory}
+
+    defaults = dict(INVENTORY_DEFAULTS, password=os.environ.get('PGPASSWORD', ''))
+    defaults.update(inventory.get('defaults', {}))
+
+    hosts = []
+    names = set()
+    for entry in inventory.get('hosts', []):
+        params = dict(defaults, **entry)
+        missing = [key for key in ('host', 'dbname', 'user', 'schema') if not params.get(key)]
+        if missing:
+            raise ValueError(f"Falta {', '.join(missing)} en el servidor {entry} del inventario {path}")
+        params.setdefault('name', f"{params['host']}:{params['port']}/{params['dbname']}")
+        if params['name'] in names:
+            raise ValueError(f"El servidor '{params['name']}' aparece más de una vez en el inventario {path}")
+        names.add(params['name'])
+        hosts.append(params)
+    return hosts
+
+class FleetComparison:
+    """Compara un esquema de referencia con una lista de servidores en paralelo."""
+
+    def __init__(self, reference, hosts, max_workers=8, timeout=30, statement_timeout=None,
+                 log_callback=None, lazy_definitions=True, differences_only=True, journal=None,
+                 retries=DEFAULT_RETRIES):
+        """
+        Args:
+            reference: Parámetros de conexión del esquema de referencia
+            hosts: Parámetros de conexión de cada servidor (ver load_inventory)
+            max_workers: Cantidad máxima de servidores consultados a la vez
+            timeout: Segundos de espera para conectar con cada servidor
+            statement_timeout: Segundos que puede durar cada consulta en un servidor
+            log_callback: Función opcional que recibe (mensaje, nivel)
+            lazy_definitions: Si es True los resultados sólo incluyen los hashes de las definiciones
+            differences_only: Si es True los objetos idénticos sólo se cuentan
+            journal: BatchJournal opcional donde guardar los grupos comparados
+                de cada servidor y del que reutilizar los ya guardados
+            retries: Reintentos de cada servidor ante errores transitorios
+        """
+        self.reference = with_timeouts(reference, timeout, statement_timeout)
+        self.hosts = [with_timeouts(params, timeout, statement_timeout) for params in hosts]
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.statement_timeout = statement_timeout
+        self.log_callback = log_callback
+        self.lazy_definitions = lazy_definitions
+        self.differences_only = differences_only
+        self.journal = journal
+        self.retries = retries
+        # Catálogo de referencia normalizado por esquema de los servidores
+        self.normalized_references = {}
+        self.normalized_lock = threading.Lock()
+
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def engine(self, params, subtrees=None):
+        """Crea el motor de comparación de la referencia con un servidor."""
+        return ComparisonEngine(self.reference, params, log_callback=self.log_callback,
+                                lazy_definitions=self.lazy_definitions,
+                                differences_only=self.differences_only,
+                                subtrees=subtrees)
+
+    def run(self, on_host_done=None):
+        """
+        Compara todos los servidores con la referencia.
+
+        Args:
+            on_host_done: Función opcional que recibe el informe de cada
+                servidor en cuanto termina
+
+        Returns:
+            Lista de informes en el orden del inventario, cada uno con name,
+            params, results, summary, omitted_identical, error y duration
+        """
+        # El catálogo de referencia se extrae una sola vez para todos los servidores
+        reference_version, reference_catalog = retry_transient(self.extract_reference, self.retries,
+                                                               log=self.log)
+        self.log(f"Catálogo de referencia extraído de {self.reference['host']}; "
+                 f"comparando {len(self.hosts)} servidores con hasta {self.max_workers} en paralelo")
+
+        reports = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.compare_host, params, reference_catalog, reference_version): params
+                       for params in self.hosts}
+            for future in as_completed(futures):
+                report = future.result()
+                reports[report['name']] = report
+                if on_host_done:
+                    on_host_done(report)
+        return [reports[params['name']] for params in self.hosts]
+
+    def extract_reference(self):
+        """Extrae el catálogo de referencia y devuelve (server_version_num, catálogo)."""
+        engine = self.engine(self.reference)
+        conn = engine.connect_db(self.reference)
+        try:
+            reference_version = self.check_schema(conn, self.reference).version_num
+            return reference_version, engine.extract(conn, self.reference['schema'])
+        finally:
+            conn.close()
+
+    def compare_host(self, params, reference_catalog, reference_version):
+        """Extrae y compara un servidor; los errores se devuelven en el informe."""
+        started = time.monotonic()
+        report = {'name': params['name'], 'params': params, 'results': None, 'summary': None,
+                  'omitted_identical': {}, 'error': None, 'duration': None}
+
+        def run_engine(engine):
+            conn = engine.connect_db(params)
+            try:
+                preflight = self.check_schema(conn, params)
+                if not versions_compatible(preflight.version_num, reference_version):
+                    self.log(f"Advertencia: {params['name']} usa PostgreSQL {preflight.version} y la "
+                             f"referencia {reference_version}. Pueden ocurrir errores de compatibilidad.",
+                             logging.WARNING)
+                catalog = engine.extract(conn, params['schema'])
+            finally:
+                conn.close()
+            reference = self.normalized_reference(engine, reference_catalog, params['schema'])
+            return engine.compare_catalogs(reference, catalog, reference_normalized=True)
+
+        def compare():
+            engine = self.engine(params)
+            return run_engine(engine), engine.omitted_identical
+
+        try:
+            if self.journal is not None:
+                results, omitted_identical = self.journal.compare(
+                    params['name'], lambda subtrees: self.engine(params, subtrees), run_engine,
+                    self.retries, log=self.log)
+            else:
+                results, omitted_identical = retry_transient(compare, self.retries, log=self.log)
+            report['results'] = results
+            report['omitted_identical'] = omitted_identical
+            report['summary'] = summarize_results(results, omitted_identical)
+        except Exception as e:
+            report['error'] = str(e)
+            self.log(f"No se pudo comparar {params['name']}: {str(e)}", logging.ERROR)
+        report['duration'] = time.monotonic() - started
+        return report
+
+    def normalized_reference(self, engine, reference_catalog, schema):
+        """
+        Devuelve el catálogo de referencia normalizado para un esquema de los servidores.
+
+        La normalización depende de ambos esquemas, así que se hace una vez por
+        esquema de los servidores y la comparten, sin modificarla, todos los
+        que lo usan; el catálogo extraído queda sin normalizar.
+        """
+        with self.normalized_lock:
+            normalized = self.normalized_references.get(schema)
+            if normalized is None:
+                normalized = engine.normalizer.normalized_copy(reference_catalog)
+                self.normalized_references[schema] = normalized
+            return normalized
+
+    def check_schema(self, conn, params):
+        """Comprueba que el esquema exista y sea accesible en el servidor y devuelve su Preflight."""
+        preflight = Preflight.run(conn, params['schema'])
+        if not preflight.schema_exists:
+            raise Exception(f"El esquema '{params['schema']}' no existe en {params.get('name', params['host'])} "
+                            f"o el usuario no tiene permiso USAGE sobre él")
+        return preflight
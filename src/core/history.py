@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Historial de comparaciones en una base de datos SQLite local.
+
+Cada ejecución guarda sus parámetros (sin contraseñas), tiempos, contadores
+y, por cada objeto, su estado y un hash de su resultado. Dos ejecuciones se
+comparan con delta() usando sólo esos hashes, sin conectarse a ninguno de
+los servidores PostgreSQL.
+"""
+
+import sqlite3
+import hashlib
+import logging
+from core.results import summarize_results
+from utils.paths import HISTORY_FILE, ensure_directory
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Ubicación por defecto del historial, junto al directorio de logs
+DEFAULT_HISTORY_PATH = HISTORY_FILE
+
+# Parámetros de conexión que se guardan de cada esquema
+RUN_PARAMS = ('host', 'port', 'dbname', 'user', 'schema')
+
+# Campos del resultado que determinan el hash de un objeto: de las definiciones
+# sólo su hash normalizado, que está con y sin carga diferida, nunca el texto
+HASHED_FIELDS = ('estado', 'esquema1', 'esquema2', 'esquema1_hash', 'esquema2_hash')
+
+# Tipos de cambio entre dos ejecuciones
+DELTA_NEW = 'NUEVO'
+DELTA_REMOVED = 'ELIMINADO'
+DELTA_CHANGED = 'MODIFICADO'
+# El objeto difería y ya no aparece en una ejecución con differences_only:
+# es idéntico en ambos esquemas (o ya no existe en ninguno)
+DELTA_CONVERGED = 'CONVERGIDO'
+
+def result_hash(result):
+    """Hash del estado de un objeto en una comparación."""
+    content = '\x1f'.join(str(result.get(field) or '') for field in HASHED_FIELDS)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+class ComparisonHistory:
+    """Guarda las ejecuciones de comparación y calcula la deriva entre ellas."""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        """
+        Args:
+            path: Archivo SQLite del historial; se crea si no existe
+        """
+        ensure_directory(path)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        param_columns = ', '.join(f"{param}{side} TEXT" for side in (1, 2) for param in RUN_PARAMS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                started_at TEXT,
+                finished_at TEXT,
+                duration REAL,
+                {param_columns},
+                differences_only INTEGER,
+                total INTEGER,
+                identicos INTEGER,
+                diferentes INTEGER,
+                solo_esquema1 INTEGER,
+                solo_esquema2 INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS run_objects (
+                run_id INTEGER REFERENCES runs (id),
+                tipo TEXT,
+                objeto TEXT,
+                estado TEXT,
+                hash TEXT,
+                PRIMARY KEY (run_id, tipo, objeto)
+            );
+        """)
+        self.conn.commit()
+
+    def record_run(self, conn_params1, conn_params2, results, started_at, finished_at,
+                   omitted_identical=None, differences_only=False):
+        """
+        Guarda una ejecución con el estado y el hash de cada objeto.
+
+        Args:
+            conn_params1, conn_params2: Parámetros de conexión de la comparación
+            results: Lista de resultados o ResultStore
+            started_at, finished_at: datetime de inicio y fin de la comparación
+            omitted_identical: Idénticos por tipo no incluidos en results
+            differences_only: Si la comparación omitió los objetos idénticos
+
+        Returns:
+            Identificador de la ejecución
+        """
+        summary = summarize_results(results, omitted_identical)
+        params = [conn_params[param] for conn_params in (conn_params1, conn_params2) for param in RUN_PARAMS]
+        columns = ', '.join(f"{param}{side}" for side in (1, 2) for param in RUN_PARAMS)
+        placeholders = ', '.join('?' for _ in range(len(params) + 9))
+        cursor = self.conn.execute(f"""
+            INSERT INTO runs (started_at, finished_at, duration, {columns}, differences_only,
+                              total, identicos, diferentes, solo_esquema1, solo_esquema2)
+            VALUES ({placeholders})
+        """, [started_at.isoformat(), finished_at.isoformat(),
+              (finished_at - started_at).total_seconds()] + [str(p) for p in params] +
+             [int(differences_only), summary['total'], summary['identicos'], summary['diferentes'],
+              summary['solo_esquema1'], summary['solo_esquema2']])
+        run_id = cursor.lastrowid
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO run_objects (run_id, tipo, objeto, estado, hash) VALUES (?, ?, ?, ?, ?)",
+            ((run_id, result['tipo'], result['objeto'], result['estado'], result_hash(result))
+             for result in results))
+        self.conn.commit()
+        logger.info(f"Comparación guardada en el historial con el identificador {run_id}")
+        return run_id
+
+    def runs(self, limit=20):
+        """Devuelve las últimas ejecuciones, de la más reciente a la más antigua."""
+        cursor = self.conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,))
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def run(self, run_id):
+        """Devuelve una ejecución, o None si no existe."""
+        cursor = self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([description[0] for description in cursor.description], row))
+
+    def delta(self, run_a, run_b):
+        """
+        Compara dos ejecuciones por el hash de cada objeto.
+
+        Un objeto ausente en una ejecución con differences_only se considera
+        idéntico, no eliminado: si antes difería, el cambio es DELTA_CONVERGED.
+
+        Args:
+            run_a: Identificador de la ejecución anterior
+            run_b: Identificador de la ejecución posterior
+
+        Returns:
+            Lista de diccionarios con tipo, objeto, cambio, estado_anterior
+            y estado_actual, ordenada por tipo y objeto
+        """
+        runs = {}
+        for run_id in (run_a, run_b):
+            run = self.run(run_id)
+            if run is None:
+                raise ValueError(f"No existe la ejecución {run_id} en el historial")
+            runs[run_id] = run
+
+        # FULL OUTER JOIN de los objetos de ambas ejecuciones (compatible con SQLite < 3.39)
+        cursor = self.conn.execute("""
+            SELECT a.tipo, a.objeto, a.estado, a.hash, b.estado, b.hash
+            FROM run_objects a
+            LEFT JOIN run_objects b ON b.run_id = :b AND b.tipo = a.tipo AND b.objeto = a.objeto
+            WHERE a.run_id = :a AND (b.hash IS NULL OR b.hash <> a.hash)
+            UNION ALL
+            SELECT b.tipo, b.objeto, NULL, NULL, b.estado, b.hash
+            FROM run_objects b
+            WHERE b.run_id = :b AND NOT EXISTS (
+                SELECT 1 FROM run_objects a
+                WHERE a.run_id = :a AND a.tipo = b.tipo AND a.objeto = b.objeto)
+            ORDER BY 1, 2
+        """, {'a': run_a, 'b': run_b})
+
+        delta = []
+        for tipo, objeto, estado_a, hash_a, estado_b, hash_b in cursor.fetchall():
+            if hash_a is None:
+                if runs[run_a]['differences_only'] and estado_b == 'IDÉNTICO':
+                    continue
+                cambio = DELTA_NEW
+            elif hash_b is None:
+                if runs[run_b]['differences_only']:
+                    if estado_a == 'IDÉNTICO':
+                        continue
+                    cambio = DELTA_CONVERGED
+                else:
+                    cambio = DELTA_REMOVED
+            else:
+                cambio = DELTA_CHANGED
+            delta.append({'tipo': tipo, 'objeto': objeto, 'cambio': cambio,
+                          'estado_anterior': estado_a, 'estado_actual': estado_b})
+        return delta
+
+    def close(self):
+        """Cierra la base de datos del historial."""
+        self.conn.close()
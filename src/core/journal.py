@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Diario de las comparaciones por lotes (muchos tenants o muchos servidores).
+
+Cada par de esquemas se compara por grupos de CATALOG_SUBTREES, y cada grupo
+terminado se guarda en una base de datos SQLite local con sus resultados y
+los objetos idénticos omitidos. Si el lote se interrumpe (por ejemplo, por
+una VPN que se cae en el tenant 240 de 300), al repetirlo con resume=True se
+reutilizan los grupos ya guardados y sólo se compara lo que falta. Los
+errores transitorios de conexión se reintentan antes de abandonar el par
+(ver db_connector.retry_transient).
+"""
+
+import json
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from core.catalog_extractor import CATALOG_SUBTREES
+from core.db_connector import DEFAULT_RETRIES, RETRY_BACKOFF, retry_transient
+from core.results import ComparisonResult, RESULT_FIELDS
+from utils.paths import JOURNAL_FILE, ensure_directory
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Ubicación por defecto del diario, junto al historial
+DEFAULT_JOURNAL_PATH = JOURNAL_FILE
+
+def batch_key(command, reference, target):
+    """Identificador de un lote: comando, esquema de referencia y destino comparado."""
+    return (f"{command} {reference['host']}:{reference['port']}/{reference['dbname']}/{reference['schema']}"
+            f" -> {target}")
+
+class BatchJournal:
+    """Grupos de objetos ya comparados de cada par de esquemas de un lote."""
+
+    def __init__(self, batch, path=DEFAULT_JOURNAL_PATH, resume=False):
+        """
+        Args:
+            batch: Identificador del lote (ver batch_key)
+            path: Archivo SQLite del diario; se crea si no existe
+            resume: Si es True se reutilizan los grupos ya guardados del lote;
+                si no, se descartan y el lote empieza de cero
+        """
+        ensure_directory(path)
+        self.batch = batch
+        self.path = path
+        # Los servidores de una flota se comparan en varios hilos
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ', '.join(f"{field} TEXT" for field in RESULT_FIELDS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS units (
+                batch TEXT,
+                pair TEXT,
+                subtree TEXT,
+                omitted_identical TEXT,
+                finished_at TEXT,
+                PRIMARY KEY (batch, pair, subtree)
+            );
+            CREATE TABLE IF NOT EXISTS unit_results (
+                id INTEGER PRIMARY KEY,
+                batch TEXT,
+                pair TEXT,
+                subtree TEXT,
+                {columns}
+            );
+            CREATE INDEX IF NOT EXISTS unit_results_pair ON unit_results (batch, pair, subtree);
+        """)
+        if resume:
+            count = self.conn.execute("SELECT COUNT(*) FROM units WHERE batch = ?", (batch,)).fetchone()[0]
+            logger.info(f"Se reutilizan {count} grupos ya comparados del diario {path}")
+        else:
+            self.conn.execute("DELETE FROM unit_results WHERE batch = ?", (batch,))
+            self.conn.execute("DELETE FROM units WHERE batch = ?", (batch,))
+        self.conn.commit()
+
+    def completed(self, pair):
+        """
+        Grupos ya comparados de un par.
+
+        Returns:
+            Diccionario {grupo: (resultados, objetos idénticos omitidos por tipo)}
+        """
+        with self.lock:
+            units = self.conn.execute("""
+                SELECT subtree, omitted_identical FROM units WHERE batch = ? AND pair = ?
+            """, (self.batch, pair)).fetchall()
+            rows = self.conn.execute(f"""
+                SELECT subtree, {', '.join(RESULT_FIELDS)} FROM unit_results
+                WHERE batch = ? AND pair = ? ORDER BY id
+            """, (self.batch, pair)).fetchall()
+        completed = {subtree: ([], json.loads(omitted)) for subtree, omitted in units}
+        for subtree, *fields in rows:
+            if subtree in completed:
+                completed[subtree][0].append(ComparisonResult(*fields))
+        return completed
+
+    def record(self, pair, subtree, results, omitted_identical):
+        """Guarda un grupo comparado de un par, con sus resultados, en una sola transacción."""
+        placeholders = ', '.join('?' for _ in RESULT_FIELDS)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM unit_results WHERE batch = ? AND pair = ? AND subtree = ?",
+                              (self.batch, pair, subtree))
+            self.conn.executemany(f"""
+                INSERT INTO unit_results (batch, pair, subtree, {', '.join(RESULT_FIELDS)})
+                VALUES (?, ?, ?, {placeholders})
+            """, [(self.batch, pair, subtree, *(result.get(field) for field in RESULT_FIELDS))
+                  for result in results])
+            self.conn.execute("INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?)",
+                              (self.batch, pair, subtree, json.dumps(omitted_identical),
+                               datetime.now().isoformat()))
+
+    def compare(self, pair, make_engine, run_engine=None, retries=DEFAULT_RETRIES, backoff=RETRY_BACKOFF,
+                log=None):
+        """
+        Compara los grupos pendientes de un par y guarda cada uno al terminarlo.
+
+        Cada reintento vuelve a mirar el diario, así que sólo repite los
+        grupos que el intento fallido no llegó a guardar. Un grupo con alguna
+        sección que no se pudo extraer no se guarda: se devuelve tal cual y se
+        vuelve a comparar en el siguiente lote.
+
+        Args:
+            pair: Identificador del par dentro del lote (esquema o servidor)
+            make_engine: Función que recibe la lista de grupos pendientes y crea
+                el ComparisonEngine que los compara
+            run_engine: Función que recibe el motor y ejecuta la comparación
+                (por defecto engine.run())
+            retries, backoff, log: Ver retry_transient
+
+        Returns:
+            Tupla (resultados, objetos idénticos omitidos por tipo) del par completo
+        """
+        unfinished = {}
+
+        def attempt():
+            unfinished.clear()
+            completed = self.completed(pair)
+            pending = [subtree for subtree in CATALOG_SUBTREES if subtree not in completed]
+            if not pending:
+                return
+            engine = make_engine(pending)
+
+            def on_subtree(subtree, results):
+                omitted = engine.omitted_by_subtree.get(subtree, {})
+                if subtree in engine.incomplete_subtrees:
+                    unfinished[subtree] = (list(results), omitted)
+                else:
+                    self.record(pair, subtree, results, omitted)
+
+            engine.results_callback = on_subtree
+            if run_engine:
+                run_engine(engine)
+            else:
+                engine.run()
+
+        retry_transient(attempt, retries, backoff, log)
+
+        units = self.completed(pair)
+        units.update(unfinished)
+        results = []
+        omitted_identical = {}
+        for subtree in CATALOG_SUBTREES:
+            if subtree in units:
+                subtree_results, omitted = units[subtree]
+                results.extend(subtree_results)
+                for tipo, count in omitted.items():
+                    omitted_identical[tipo] = omitted_identical.get(tipo, 0) + count
+        return results, omitted_identical
+
+    def close(self):
+        """Cierra la base de datos del diario."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
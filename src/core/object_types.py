@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de los tipos de objeto que se extraen y comparan con el mismo algoritmo.
+
+Cada ObjectType declara la consulta masiva de la que se leen sus objetos, las
+columnas que ordenan sus filas y forman su clave, los campos que se guardan y
+los que deben coincidir, el grupo de CATALOG_SUBTREES al que pertenece, cómo
+se describe cada objeto y los textos de sus resultados. OBJECT_TYPES, en
+orden de extracción, decide qué secciones componen el catálogo (ver
+catalog_sections); CatalogExtractor.read_section extrae cualquiera de ellos
+y SchemaDiffer.diff_subtree los compara con un único recorrido merge_join,
+de modo que una mejora en la extracción o en ese recorrido beneficia a todos.
+
+Las dependencias entre tipos se declaran con children: las columnas deciden
+si una tabla es idéntica y la referencia de una foreign key, si lo es su
+constraint.
+"""
+
+class ObjectType:
+    """Descripción declarativa de un tipo de objeto comparable."""
+
+    def __init__(self, tipo, section, subtree, label, query, order, key_columns, fields, compare_fields,
+                 describe, messages, estado_diferente='DIFERENTE', estado_solo='DIFERENTE',
+                 key_format=None, parent_key=None, definition=None, computed=None, unqualified=(),
+                 definition_field=None, identical_results=True, children=None,
+                 type_field=None, tipo_diferente=None, describe_diferente=None):
+        """
+        Args:
+            tipo: Tipo de los resultados (TABLA, FUNCIÓN, ...); None si lo da type_field
+            section: Sección del catálogo con los objetos, {clave: objeto}
+            subtree: Grupo de CATALOG_SUBTREES en el que se extrae y se compara
+            label: Nombre de los objetos, con su artículo, en los mensajes de
+                log ('las tablas'); el artículo decide el género de los adjetivos
+            query: Consulta masiva de los objetos del esquema, sin ORDER BY, con
+                los parámetros con nombre y los fragmentos que dependen del
+                servidor que indica CatalogExtractor.query_params y query_fragments
+            order: Columnas de query que ordenan sus filas e identifican cada
+                una; las de texto llevan COLLATE "C" en query (ver CatalogExtractor._fetch)
+            key_columns: Columnas de query que forman la clave del objeto
+            fields: Columnas de query que se guardan en el objeto
+            compare_fields: Campos del objeto que deben coincidir en ambos esquemas
+            describe: Función (esquema, padre, clave, objeto) que devuelve el texto
+                esquema1/esquema2 del resultado; padre es None salvo para los
+                objetos anidados (columnas de una tabla, parámetros de una función)
+            messages: Detalle de cada caso: 'solo_esquema1', 'solo_esquema2',
+                'diferente' y, si hay resultados idénticos, 'identico'. Pueden
+                usar {tipo}, y la clave (caso, tipo) reemplaza el mensaje de un
+                tipo concreto. Sin mensajes 'solo_esquema*' sólo se comparan los
+                objetos presentes en ambos esquemas
+            estado_diferente: Estado de los objetos cuyos campos difieren
+            estado_solo: Estado de los objetos que existen en un solo esquema
+            key_format: Formato de la clave con las columnas de key_columns (por
+                defecto, sus valores separados por '.')
+            parent_key: Formato de la clave del padre, si la sección agrupa los
+                objetos por su padre, {padre: {clave: objeto}}
+            definition: Columna con la definición que se compara por el hash de
+                su versión normalizada; se guarda como 'definition', o sólo su
+                hash como 'normalized_hash' si el extractor tiene normalizer
+            computed: Diccionario {columna: (expresión, función)} de columnas
+                que se calculan sólo para las filas ya ordenadas de cada lote,
+                sobre las columnas de query calificadas con page; si se indica
+                función, la columna es NULL en modo de carga diferida o si el
+                servidor no tiene esa función
+            unqualified: Columnas de query de las que se quitan las referencias
+                al propio esquema antes de formar la clave y el objeto
+            definition_field: Campo con la definición completa que se guarda en
+                el resultado (ver SchemaDiffer.definition_fields), o None
+            identical_results: Si los objetos idénticos generan un resultado
+            children: ObjectType de los objetos que dependen de cada objeto de
+                este tipo: un objeto presente en ambos esquemas es idéntico sólo
+                si sus hijos lo son, y si no, las diferencias de los hijos
+                reemplazan su resultado. Los hijos no anidados tienen la misma
+                clave que su padre
+            type_field: Campo del objeto con el tipo de su resultado, si varía
+                entre los objetos de la sección (constraints)
+            tipo_diferente: Tipo de los resultados de objetos cuyos campos difieren
+                (por defecto el del objeto)
+            describe_diferente: describe de los objetos cuyos campos difieren
+                (por defecto describe)
+        """
+        self.tipo = tipo
+        self.section = section
+        self.subtree = subtree
+        self.label = label
+        self.query = query
+        self.order = order
+        self.key_columns = key_columns
+        self.fields = fields
+        self.compare_fields = compare_fields
+        self.describe = describe
+        self.messages = messages
+        self.estado_diferente = estado_diferente
+        self.estado_solo = estado_solo
+        self.key_format = key_format or '.'.join(f"{{{column}}}" for column in key_columns)
+        self.parent_key = parent_key
+        self.nested = parent_key is not None
+        self.definition = definition
+        self.computed = computed or {}
+        self.unqualified = unqualified
+        self.definition_field = definition_field
+        self.identical_results = identical_results
+        self.children = children
+        self.type_field = type_field
+        self.tipo_diferente = tipo_diferente
+        self.describe_diferente = describe_diferente or describe
+
+    @property
+    def noun(self):
+        """Nombre de los objetos sin el artículo ('tablas')."""
+        return self.label.split(' ', 1)[1]
+
+    def agree(self, stem):
+        """Adjetivo en plural concordado con el género de label ('idéntic' -> 'idénticas')."""
+        return stem + ('as' if self.label.startswith('las ') else 'os')
+
+    def key(self, row):
+        """Clave del objeto de una fila de query, {columna: valor}."""
+        return self.key_format.format(**row)
+
+    def parent(self, row):
+        """Clave del padre del objeto anidado de una fila de query."""
+        return self.parent_key.format(**row)
+
+    def differs(self, obj1, obj2):
+        """Indica si dos objetos con la misma clave son diferentes."""
+        return any(obj1[field] != obj2[field] for field in self.compare_fields)
+
+    def result_type(self, obj):
+        """Tipo del resultado de un objeto."""
+        return obj[self.type_field] if self.type_field else self.tipo
+
+    def message(self, case, tipo):
+        """Detalle del resultado de un caso para un tipo de resultado."""
+        return self.messages.get((case, tipo), self.messages.get(case)).format(tipo=tipo)
+
+    def reports_missing(self):
+        """Indica si los objetos presentes en un solo esquema generan un resultado."""
+        return 'solo_esquema1' in self.messages
+
+def _qualified_name(schema, parent, key, obj):
+    return f"{schema}.{key}"
+
+def _index_definition(schema, parent, key, obj):
+    return obj['definition']
+
+def _column_description(schema, parent, key, obj):
+    length = f"({obj['length']})" if obj['length'] else ''
+    return f"{schema}.{parent}.{key} ({obj['data_type']}{length}, {obj['nullable']})"
+
+def _parameter_description(schema, parent, key, obj):
+    return f"{schema}.{parent}: {key} {obj['data_type']}"
+
+def _foreign_key_definition(schema, parent, key, obj):
+    return f"{schema}.{key}: {obj['definition']}"
+
+def _constraint_with_type(schema, parent, key, obj):
+    return f"{schema}.{key} ({obj['type']})"
+
+# Las columnas y los parámetros son objetos anidados: la tabla o la función
+# a la que pertenecen decide si se comparan
+COLUMNS = ObjectType(
+    'COLUMNA', 'columns', 'tables', 'las columnas',
+    query="""
+        SELECT table_name::text COLLATE "C" AS table_name, column_name::text COLLATE "C" AS column_name,
+               data_type, character_maximum_length AS length, is_nullable AS nullable
+        FROM information_schema.columns
+        WHERE table_schema = %(schema)s
+    """,
+    order=('table_name', 'column_name'), key_columns=('column_name',),
+    fields=('data_type', 'length', 'nullable'), compare_fields=('data_type', 'length', 'nullable'),
+    describe=_column_description,
+    messages={'solo_esquema2': 'La columna existe solo en el segundo esquema',
+              'solo_esquema1': 'La columna existe solo en el primer esquema',
+              'diferente': 'La definición de la columna es diferente'},
+    parent_key='{table_name}', identical_results=False)
+
+TABLES = ObjectType(
+    'TABLA', 'tables', 'tables', 'las tablas',
+    query="""
+        SELECT table_name::text COLLATE "C" AS table_name FROM information_schema.tables
+        WHERE table_schema = %(schema)s AND table_type = 'BASE TABLE'
+    """,
+    order=('table_name',), key_columns=('table_name',), fields=(), compare_fields=(),
+    describe=_qualified_name,
+    messages={'solo_esquema2': 'La tabla existe solo en el segundo esquema',
+              'solo_esquema1': 'La tabla existe solo en el primer esquema',
+              'identico': 'La tabla tiene la misma estructura en ambos esquemas'},
+    children=COLUMNS)
+
+# Las filas llegan ordenadas por el nombre seguido de '(' con COLLATE "C", que
+# en bases UTF8 es el orden por punto de código de las claves de Python; sólo
+# las sobrecargas de un mismo nombre se ordenan en memoria (un nombre con '('
+# puede romper ese orden, y merge_join lo informa). pg_get_functiondef no
+# admite agregados, que se reconocen según el servidor (ver query_fragments)
+FUNCTIONS = ObjectType(
+    'FUNCIÓN', 'functions', 'functions', 'las funciones',
+    query="""
+        SELECT (p.proname || '(') COLLATE "C" AS sort_name, p.oid, p.proname,
+               oidvectortypes(p.proargtypes) AS identity_arguments, p.prosrc, {not_aggregate} AS plain
+        FROM pg_catalog.pg_proc p
+        JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+        {aggregates}
+        WHERE n.nspname = %(schema)s
+        AND (%(name)s IS NULL OR p.proname = %(name)s)
+    """,
+    order=('sort_name', 'oid'), key_columns=('proname', 'identity_arguments'),
+    key_format='{proname}({identity_arguments})', fields=('full_definition',),
+    compare_fields=('normalized_hash',), describe=_qualified_name,
+    messages={'solo_esquema2': 'La función existe solo en el segundo esquema',
+              'solo_esquema1': 'La función existe solo en el primer esquema',
+              'diferente': 'El cuerpo de la función es diferente (ignorando referencias a esquemas)',
+              'identico': 'La función es idéntica en ambos esquemas (ignorando referencias a esquemas)'},
+    estado_diferente='DIFERENTE CUERPO', definition='prosrc',
+    computed={'full_definition': ("CASE WHEN page.plain THEN pg_get_functiondef(page.oid) END",
+                                  'pg_get_functiondef')},
+    unqualified=('identity_arguments',), definition_field='full_definition')
+
+# Parámetros con nombre: la función (su identidad, como oid::regprocedure),
+# nombre, tipo y modo del parámetro, con los mismos valores que
+# information_schema.parameters
+FUNCTION_PARAMETERS = ObjectType(
+    'PARÁMETRO', 'function_parameters', 'functions', 'los parámetros de funciones',
+    query="""
+        SELECT p.proname, oidvectortypes(p.proargtypes) AS identity_arguments,
+               a.name, format_type(a.type, NULL) AS data_type,
+               CASE a.mode WHEN 'o' THEN 'OUT' WHEN 'b' THEN 'INOUT' WHEN 't' THEN 'OUT' ELSE 'IN' END AS mode,
+               p.oid, a.ord
+        FROM pg_catalog.pg_proc p
+        JOIN pg_catalog.pg_namespace n ON n.oid = p.pronamespace
+        CROSS JOIN LATERAL unnest(coalesce(p.proallargtypes, p.proargtypes::oid[]), p.proargnames,
+                                  coalesce(p.proargmodes, array_fill('i'::"char", ARRAY[p.pronargs::int])))
+             WITH ORDINALITY AS a (type, name, mode, ord)
+        WHERE n.nspname = %(schema)s AND a.name <> ''
+    """,
+    order=('oid', 'ord'), key_columns=('name',), fields=('data_type', 'mode'),
+    compare_fields=('data_type', 'mode'), describe=_parameter_description,
+    messages={'solo_esquema2': 'El parámetro existe solo en el segundo esquema',
+              'solo_esquema1': 'El parámetro existe solo en el primer esquema',
+              'diferente': 'La definición del parámetro es diferente'},
+    estado_diferente='DIFERENTE SIGNATURE', estado_solo='DIFERENTE SIGNATURE',
+    parent_key='{proname}({identity_arguments})', unqualified=('identity_arguments', 'data_type'),
+    identical_results=False)
+
+# Vistas y vistas materializadas, leídas de pg_class por el OID del esquema
+VIEWS = ObjectType(
+    'VISTA', 'views', 'views', 'las vistas',
+    query="""
+        SELECT c.relname COLLATE "C" AS relname, c.relkind = 'm' AS materialized, c.oid
+        FROM pg_catalog.pg_class c
+        WHERE c.relnamespace = {namespace}
+        AND c.relkind = ANY(%(view_relkinds)s)
+        AND (%(name)s IS NULL OR c.relname = %(name)s)
+    """,
+    order=('relname',), key_columns=('relname',), fields=('materialized',),
+    compare_fields=('normalized_hash', 'materialized'), describe=_qualified_name,
+    messages={'solo_esquema2': 'La vista existe solo en el segundo esquema',
+              'solo_esquema1': 'La vista existe solo en el primer esquema',
+              'diferente': 'La definición de la vista es diferente (ignorando referencias a esquemas)',
+              'identico': 'La vista es idéntica en ambos esquemas (ignorando referencias a esquemas)'},
+    estado_diferente='DIFERENTE DEFINICIÓN', definition='definition',
+    computed={'definition': ('pg_get_viewdef(page.oid, true)', None)}, definition_field='definition')
+
+# Foreign keys, comparadas por el hash de su definición normalizada
+# (pg_get_constraintdef: columnas, tabla y columnas referenciadas y acciones),
+# sin las referencias al propio esquema, que dependen del search_path. Sólo se
+# comparan las definiciones de las FKs que existen en ambos esquemas; su
+# existencia se informa como constraint
+FOREIGN_KEY_REFERENCES = ObjectType(
+    'FOREIGN KEY', 'foreign_keys', 'constraints', 'las foreign keys',
+    query="""
+        SELECT cl.relname AS "table", con.conname AS name, con.oid
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+        JOIN pg_catalog.pg_class cl ON cl.oid = con.conrelid
+        WHERE n.nspname = %(schema)s AND con.contype = 'f'
+    """,
+    order=('oid',), key_columns=('table', 'name'), fields=('table', 'name', 'definition'),
+    compare_fields=('normalized_hash',), describe=_foreign_key_definition,
+    messages={'diferente': 'La definición de la FK es diferente'},
+    estado_diferente='DIFERENTE REFERENCIA', definition='definition',
+    computed={'definition': ('pg_get_constraintdef(page.oid)', None)}, unqualified=('definition',),
+    identical_results=False)
+
+# Constraints PRIMARY KEY, UNIQUE y FOREIGN KEY de las tablas del esquema
+CONSTRAINTS = ObjectType(
+    None, 'constraints', 'constraints', 'los constraints',
+    query="""
+        SELECT cl.relname::text COLLATE "C" AS "table", con.conname::text COLLATE "C" AS name,
+               CASE con.contype WHEN 'p' THEN 'PRIMARY KEY' WHEN 'u' THEN 'UNIQUE'
+                                ELSE 'FOREIGN KEY' END AS type
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+        JOIN pg_catalog.pg_class cl ON cl.oid = con.conrelid
+        WHERE n.nspname = %(schema)s AND con.contype IN ('p', 'u', 'f')
+    """,
+    order=('table', 'name'), key_columns=('table', 'name'), fields=('table', 'name', 'type'),
+    compare_fields=('type',), describe=_qualified_name,
+    messages={'solo_esquema2': 'El constraint {tipo} existe solo en el segundo esquema',
+              'solo_esquema1': 'El constraint {tipo} existe solo en el primer esquema',
+              'diferente': 'El tipo de constraint es diferente',
+              'identico': 'El constraint {tipo} es idéntico en ambos esquemas',
+              ('identico', 'FOREIGN KEY'): 'La foreign key es idéntica en ambos esquemas'},
+    estado_diferente='DIFERENTE TIPO', children=FOREIGN_KEY_REFERENCES,
+    type_field='type', tipo_diferente='CONSTRAINT', describe_diferente=_constraint_with_type)
+
+# Índices, incluidos los de tablas particionadas; el texto del índice se
+# muestra en los resultados, así que se guarda además de su hash
+INDEXES = ObjectType(
+    'ÍNDICE', 'indexes', 'indexes', 'los índices',
+    query="""
+        SELECT (t.relname || '.' || ci.relname) COLLATE "C" AS index_key, ci.oid,
+               t.relname AS "table", ci.relname AS name
+        FROM pg_catalog.pg_class ci
+        JOIN pg_catalog.pg_index i ON ci.oid = i.indexrelid
+        JOIN pg_catalog.pg_class t ON t.oid = i.indrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = ci.relnamespace
+        WHERE ci.relkind = ANY(%(index_relkinds)s) AND n.nspname = %(schema)s
+    """,
+    order=('index_key', 'oid'), key_columns=('table', 'name'), fields=('table', 'name', 'definition'),
+    compare_fields=('normalized_hash',), describe=_index_definition,
+    messages={'solo_esquema2': 'El índice existe solo en el segundo esquema',
+              'solo_esquema1': 'El índice existe solo en el primer esquema',
+              'diferente': 'La definición del índice es diferente',
+              'identico': 'El índice es idéntico en ambos esquemas (ignorando referencias a esquemas)'},
+    estado_diferente='DIFERENTE DEFINICIÓN', definition='definition',
+    computed={'definition': ('pg_get_indexdef(page.oid)', None)}, definition_field='definition')
+
+# Todos los tipos, en el orden en que se extraen sus secciones
+OBJECT_TYPES = (TABLES, COLUMNS, FUNCTIONS, FUNCTION_PARAMETERS, VIEWS, CONSTRAINTS,
+                FOREIGN_KEY_REFERENCES, INDEXES)
+
+# Tipo de cada sección del catálogo
+SECTION_TYPES = {object_type.section: object_type for object_type in OBJECT_TYPES}
+
+# Tipos que se comparan por sí mismos; los hijos se comparan con su padre
+COMPARED_TYPES = tuple(object_type for object_type in OBJECT_TYPES
+                       if all(object_type is not parent.children for parent in OBJECT_TYPES))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Planificación de la comparación según el tamaño de los catálogos.
+
+La comprobación previa (core.preflight) estima los objetos de cada sección
+en ambos esquemas leyendo sólo pg_catalog. Con esas cantidades
+ExecutionPlanner decide, antes de extraer nada:
+
+- si conviene comparar primero las huellas y extraer sólo los tipos de
+  objeto que difieren, o extraer todo directamente;
+- con cuántas conexiones extraer cada esquema;
+- el tamaño de bloque de la lectura, que a la vez decide dónde se normalizan
+  las definiciones: en streaming, a medida que llegan, o al terminar la
+  extracción;
+- las fases del avance (ver ProgressTracker).
+
+Sin plan automático sólo se respetan las opciones indicadas; con él, el
+planificador puede activar estrategias que no se pidieron, pero nunca
+desactiva una que sí se pidió.
+"""
+
+import logging
+from core.catalog_extractor import CATALOG_SUBTREES, catalog_sections
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Objetos a extraer por cada conexión adicional: por debajo no compensa abrirla
+OBJECTS_PER_WORKER = 200
+
+# Conexiones por esquema como máximo con el plan automático
+AUTO_MAX_WORKERS = 4
+
+# Objetos de cada esquema a partir de los cuales se compara primero la huella
+FINGERPRINT_MIN_OBJECTS = 1000
+
+# Objetos de un esquema a partir de los cuales se lee en streaming, y tamaño de bloque
+STREAMING_MIN_OBJECTS = 20000
+STREAMING_ITERSIZE = 2000
+
+# Secciones con definiciones que se normalizan
+DEFINITION_SECTIONS = ('functions', 'views', 'indexes')
+
+class ExecutionPlanner:
+    """Elige la estrategia de extracción y las fases del avance según el tamaño de los catálogos."""
+
+    def __init__(self, extraction_workers=1, fingerprint=False, itersize=None, auto=False,
+                 differences_only=False, log_callback=None):
+        """
+        Args:
+            extraction_workers: Conexiones por esquema pedidas
+            fingerprint: Si se pidió comparar primero las huellas
+            itersize: Tamaño de bloque pedido para la lectura en streaming
+            auto: Si el planificador puede activar estrategias no pedidas
+            differences_only: Si los objetos idénticos sólo se cuentan; la
+                huella sólo se activa automáticamente en ese caso, porque
+                omite los resultados de los tipos de objeto idénticos
+            log_callback: Función opcional que recibe (mensaje, nivel)
+        """
+        self.extraction_workers = extraction_workers
+        self.fingerprint = fingerprint
+        self.itersize = itersize
+        self.auto = auto
+        self.differences_only = differences_only
+        self.log_callback = log_callback
+
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def use_fingerprint(self, preflight1, preflight2):
+        """Indica si se comparan primero las huellas de los esquemas."""
+        if self.fingerprint:
+            return True
+        smallest = min(preflight1.total_objects(), preflight2.total_objects())
+        if self.auto and self.differences_only and smallest >= FINGERPRINT_MIN_OBJECTS:
+            self.log(f"Los esquemas tienen al menos {smallest} objetos: se comparará primero su huella")
+            return True
+        return False
+
+    def workers(self, preflight, subtrees=None):
+        """Conexiones con las que extraer un esquema."""
+        max_workers = max(self.extraction_workers, AUTO_MAX_WORKERS) if self.auto else self.extraction_workers
+        sections = [section for section in catalog_sections(subtrees) if preflight.counts[section]]
+        total = preflight.total_objects(subtrees)
+        workers = max(1, min(max_workers, len(sections), 1 + total // OBJECTS_PER_WORKER))
+        if workers != self.extraction_workers:
+            self.log(f"El esquema '{preflight.schema}' tiene {total} objetos a extraer: "
+                     f"se extraerá con {workers} conexiones")
+        return workers
+
+    def batch_size(self, preflight1, preflight2, subtrees=None):
+        """
+        Tamaño de bloque de la lectura en streaming, o None para leer cada
+        consulta completa y normalizar el catálogo al terminar la extracción.
+        """
+        if self.itersize:
+            return self.itersize
+        largest = max(preflight1.total_objects(subtrees), preflight2.total_objects(subtrees))
+        if self.auto and largest >= STREAMING_MIN_OBJECTS:
+            self.log(f"Un esquema tiene {largest} objetos a extraer: se leerá en bloques de "
+                     f"{STREAMING_ITERSIZE} filas normalizando las definiciones a medida que llegan")
+            return STREAMING_ITERSIZE
+        return None
+
+    def progress_phases(self, preflight1, preflight2, subtrees=None):
+        """
+        Fases del avance con la cantidad de objetos de cada una.
+
+        Returns:
+            Lista de (fase, tipo de PHASE_WEIGHTS, objetos): la extracción de
+            cada esquema, la normalización de las definiciones y la comparación
+            de cada grupo de CATALOG_SUBTREES
+        """
+        phases = [('extract1', 'extract', preflight1.total_objects(subtrees)),
+                  ('extract2', 'extract', preflight2.total_objects(subtrees))]
+        definitions = sum(preflight.counts[section] for preflight in (preflight1, preflight2)
+                          for section in DEFINITION_SECTIONS if section in catalog_sections(subtrees))
+        phases.append(('normalize', 'normalize', definitions))
+        for subtree, sections in CATALOG_SUBTREES.items():
+            if subtrees is None or subtree in subtrees:
+                objects = sum(preflight.counts[section] for preflight in (preflight1, preflight2)
+                              for section in sections)
+                phases.append((f"diff_{subtree}", 'diff', objects))
+        return phases
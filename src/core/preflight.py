@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Comprobación previa de una conexión en una sola consulta.
+
+Antes de extraer un esquema hace falta saber la versión del servidor, si el
+esquema existe y, según las opciones, su huella y las capacidades del
+servidor. Cada dato era una consulta distinta; en enlaces con mucha latencia
+(VPN) cada viaje de ida y vuelta cuesta más que la consulta en sí, así que
+la consulta de preflight_query() los devuelve todos juntos, además de una
+estimación de la cantidad de objetos de cada sección del catálogo, que sirve
+para planificar la extracción y estimar su avance.
+"""
+
+import logging
+from core.capabilities import (CAPABILITIES_COLUMNS, CAPABILITIES_PARAMS, INDEX_RELKINDS, VIEW_RELKINDS,
+                               cached_capabilities, register_capabilities)
+from core.catalog_extractor import CATALOG_SECTIONS, catalog_sections
+from core.fingerprint import FINGERPRINT_QUERY, SchemaFingerprint
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Cantidad estimada de objetos de cada sección de CATALOG_SECTIONS, en ese
+# orden. Se lee con una sola pasada por las filas del esquema en pg_class,
+# pg_proc y pg_constraint, sin contar filas de pg_attribute ni de
+# information_schema: las columnas se estiman con relnatts (incluye las
+# borradas) y los parámetros con proargnames (incluye los que no tienen
+# nombre). Basta para planificar y estimar el avance.
+COUNTS_COLUMNS = """
+        cl.tables, cl.columns, pr.functions, pr.parameters, cl.views,
+        co.constraints, co.foreign_keys, cl.indexes"""
+
+# Pasadas de COUNTS_COLUMNS por los catálogos (n es el esquema, NULL si no existe)
+COUNTS_JOINS = """
+        LEFT JOIN LATERAL (
+            SELECT count(*) FILTER (WHERE c.relkind IN ('r', 'p')) AS tables,
+                   coalesce(sum(c.relnatts) FILTER (WHERE c.relkind IN ('r', 'p')), 0) AS columns,
+                   count(*) FILTER (WHERE c.relkind = ANY(%(view_relkinds)s)) AS views,
+                   count(*) FILTER (WHERE c.relkind = ANY(%(index_relkinds)s)) AS indexes
+            FROM pg_catalog.pg_class c WHERE c.relnamespace = n.oid) cl ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) AS functions,
+                   coalesce(sum(cardinality(p.proargnames)), 0) AS parameters
+            FROM pg_catalog.pg_proc p WHERE p.pronamespace = n.oid) pr ON true
+        LEFT JOIN LATERAL (
+            SELECT count(*) FILTER (WHERE con.contype IN ('p', 'u', 'f')) AS constraints,
+                   count(*) FILTER (WHERE con.contype = 'f') AS foreign_keys
+            FROM pg_catalog.pg_constraint con WHERE con.connamespace = n.oid) co ON true
+"""
+
+def preflight_query(fingerprint=False, capabilities=False):
+    """
+    Consulta de la comprobación previa.
+
+    Devuelve una fila con la versión del servidor, si el esquema existe y el
+    usuario tiene permiso USAGE sobre él (como information_schema.schemata,
+    que sólo muestra los esquemas accesibles), una columna por sección de
+    CATALOG_SECTIONS con su cantidad estimada de objetos y,
+    si se piden, las filas de FINGERPRINT_QUERY (como JSON) y las columnas
+    de CAPABILITIES_COLUMNS.
+    """
+    extra = ''
+    if fingerprint:
+        extra += f""",
+        (SELECT json_agg(json_build_array(f.subtree, f.tipo, f.count, f.hash))
+         FROM ({FINGERPRINT_QUERY}) f (subtree, tipo, count, hash))"""
+    if capabilities:
+        extra += f",{CAPABILITIES_COLUMNS}"
+    return f"""
+        SELECT current_setting('server_version'),
+        n.oid IS NOT NULL AND has_schema_privilege(n.oid, 'USAGE'),
+        {COUNTS_COLUMNS}{extra}
+        FROM (SELECT %(schema)s::text AS name) schema_name
+        LEFT JOIN pg_catalog.pg_namespace n ON n.nspname = schema_name.name{COUNTS_JOINS}
+    """
+
+def versions_compatible(version1, version2):
+    """Indica si dos server_version_num difieren a lo sumo en una versión mayor."""
+    return abs(version1 // 10000 - version2 // 10000) <= 1
+
+class Preflight:
+    """Resultado de la comprobación previa de una conexión."""
+
+    def __init__(self, schema, version, version_num, schema_exists, counts, fingerprint=None,
+                 capabilities=None):
+        """
+        Args:
+            schema: Nombre del esquema comprobado
+            version: Versión del servidor tal como la informa (server_version)
+            version_num: server_version_num del servidor
+            schema_exists: Si el esquema existe y el usuario tiene permiso USAGE sobre él
+            counts: Diccionario {sección de CATALOG_SECTIONS: cantidad estimada de objetos}
+            fingerprint: SchemaFingerprint del esquema, si se pidió
+            capabilities: ServerCapabilities del servidor
+        """
+        self.schema = schema
+        self.version = version
+        self.version_num = version_num
+        self.schema_exists = schema_exists
+        self.counts = counts
+        self.fingerprint = fingerprint
+        self.capabilities = capabilities
+
+    def total_objects(self, subtrees=None):
+        """Cantidad de objetos de las secciones de los grupos indicados (None para todos)."""
+        return sum(self.counts[section] for section in catalog_sections(subtrees))
+
+    @classmethod
+    def run(cls, conn, schema, fingerprint=False):
+        """
+        Ejecuta la comprobación previa de un esquema con una sola consulta.
+
+        Las capacidades del servidor se averiguan en la misma consulta sólo
+        si todavía no se conocen las de su versión.
+
+        Args:
+            conn: Conexión abierta
+            schema: Nombre del esquema
+            fingerprint: Si es True también se calcula la huella del esquema
+        """
+        capabilities = cached_capabilities(conn.server_version)
+        params = dict(CAPABILITIES_PARAMS, schema=schema,
+                      index_relkinds=capabilities.index_relkinds if capabilities else list(INDEX_RELKINDS),
+                      view_relkinds=capabilities.view_relkinds if capabilities else list(VIEW_RELKINDS))
+        cur = conn.cursor()
+        cur.execute(preflight_query(fingerprint, capabilities is None), params)
+        row = cur.fetchone()
+
+        version, schema_exists = row[0], row[1]
+        counts = dict(zip(CATALOG_SECTIONS, (int(count) for count in row[2:2 + len(CATALOG_SECTIONS)])))
+        rest = row[2 + len(CATALOG_SECTIONS):]
+        schema_fingerprint = None
+        if fingerprint:
+            schema_fingerprint = SchemaFingerprint(schema, rest[0] or [])
+            rest = rest[1:]
+        if capabilities is None:
+            capabilities = register_capabilities(conn.server_version, *rest)
+
+        logger.info(f"Comprobación previa de '{schema}' en PostgreSQL {version}: "
+                    + (f"{sum(counts.values())} objetos" if schema_exists
+                       else "el esquema no existe o no es accesible"))
+        return cls(schema, version, conn.server_version, schema_exists, counts, schema_fingerprint,
+                   capabilities)
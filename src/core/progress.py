@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Avance de la comparación por objetos procesados, con tiempo restante estimado.
+
+Las fases (extracción de cada esquema, normalización y comparación) se
+planifican con la cantidad de objetos que la comprobación previa encontró
+en cada catálogo, ponderada por lo que cuesta procesar un objeto en cada
+fase. El porcentaje avanza con cada fila leída o cada objeto comparado, y el
+tiempo restante se estima con el ritmo observado hasta el momento.
+"""
+
+import threading
+import time
+
+# Coste relativo de procesar un objeto en cada fase; la extracción incluye la
+# espera al servidor, la normalización y la comparación son sólo Python
+PHASE_WEIGHTS = {'extract': 1.0, 'normalize': 0.3, 'diff': 0.1}
+
+# Segundos mínimos entre dos notificaciones con el mismo porcentaje
+NOTIFY_INTERVAL = 0.5
+
+class ProgressTracker:
+    """Convierte los objetos procesados en cada fase en porcentaje y tiempo restante."""
+
+    def __init__(self, progress_callback=None, eta_callback=None, start=15, end=100):
+        """
+        Args:
+            progress_callback: Función opcional que recibe el porcentaje de avance
+            eta_callback: Función opcional que recibe los segundos restantes estimados
+            start, end: Porcentajes entre los que se reparten las fases
+        """
+        self.progress_callback = progress_callback
+        self.eta_callback = eta_callback
+        self.start = start
+        self.end = end
+        self.phases = {}
+        self.total = 0
+        self.started = None
+        self.last_percent = None
+        self.last_notified = 0
+        self.lock = threading.Lock()
+
+    def plan(self, phases):
+        """
+        Planifica las fases.
+
+        Args:
+            phases: Lista de (fase, tipo de PHASE_WEIGHTS, cantidad de objetos)
+        """
+        with self.lock:
+            self.phases = {name: [PHASE_WEIGHTS[kind] * max(1, units), 0.0, PHASE_WEIGHTS[kind]]
+                           for name, kind, units in phases}
+            self.total = sum(planned for planned, _, _ in self.phases.values())
+            self.started = time.monotonic()
+        self.notify()
+
+    def advance(self, phase, units=1):
+        """Suma objetos procesados a una fase (sin pasar de lo planificado)."""
+        with self.lock:
+            state = self.phases.get(phase)
+            if state is None:
+                return
+            state[1] = min(state[0], state[1] + units * state[2])
+        self.notify()
+
+    def finish(self, phase):
+        """Da por terminada una fase aunque haya procesado menos objetos de los previstos."""
+        with self.lock:
+            state = self.phases.get(phase)
+            if state is None:
+                return
+            state[1] = state[0]
+        self.notify(force=True)
+
+    def fraction(self):
+        """Fracción del trabajo planificado ya realizada."""
+        if not self.total:
+            return 0.0
+        return sum(done for _, done, _ in self.phases.values()) / self.total
+
+    def eta(self):
+        """Segundos restantes estimados con el ritmo observado, o None si todavía no hay ritmo."""
+        fraction = self.fraction()
+        if self.started is None or fraction < 0.02:
+            return None
+        elapsed = time.monotonic() - self.started
+        return elapsed * (1 - fraction) / fraction
+
+    def notify(self, force=False):
+        """Notifica el porcentaje y el tiempo restante si cambiaron lo suficiente."""
+        with self.lock:
+            percent = int(self.start + (self.end - self.start) * self.fraction())
+            now = time.monotonic()
+            if not force and percent == self.last_percent and now - self.last_notified < NOTIFY_INTERVAL:
+                return
+            self.last_percent = percent
+            self.last_notified = now
+            eta = self.eta()
+        if self.progress_callback:
+            self.progress_callback(percent)
+        if self.eta_callback and eta is not None:
+            self.eta_callback(eta)
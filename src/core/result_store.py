@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de resultados de la comparación respaldado por un archivo SQLite.
+
+Los resultados se insertan por lotes a medida que se generan y se consultan
+desde disco, de modo que la memoria usada no depende del tamaño de la
+comparación. La tabla tiene índices por tipo y estado, que son los criterios
+de los filtros de la interfaz; el detalle de una fila se busca por su id
+(ComparisonResult.store_id), que AUTOINCREMENT no reutiliza aunque
+replace_subtree borre resultados.
+
+El worker inserta los resultados mientras la interfaz ya los muestra y
+filtra: un lock serializa el acceso a la conexión, y las lecturas por rangos
+de id (filter con after_id/upto_id) permiten mostrar sólo lo nuevo. Cada
+resultado guarda además su grupo de CATALOG_SUBTREES, para que el modo de
+vigilancia pueda reemplazar sólo los grupos que cambiaron (replace_subtree).
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import logging
+from core.results import ComparisonResult, RESULT_FIELDS, IDENTICAL, NOT_EXISTS
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Cantidad de resultados por sentencia INSERT
+BATCH_SIZE = 1000
+
+# Condición SQL de cada categoría de resultado (ver result_category)
+CATEGORY_CONDITIONS = {
+    'identicos': "estado = :identical",
+    'solo_esquema1': "estado <> :identical AND esquema2 = :not_exists",
+    'solo_esquema2': "estado <> :identical AND esquema2 <> :not_exists AND esquema1 = :not_exists",
+    'diferentes': "estado <> :identical AND esquema1 <> :not_exists AND esquema2 <> :not_exists"
+}
+
+class ResultStore:
+    """
+    Resultados de una comparación guardados en SQLite.
+
+    Se comporta como una secuencia de solo lectura (len, iteración) para que
+    los exportadores y summarize_results funcionen igual que con una lista.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: Archivo SQLite a usar. Si no se indica se crea un archivo
+                temporal que se elimina al cerrar el almacén.
+        """
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='schema_comparator_', suffix='.sqlite')
+            os.close(fd)
+            self.temporary = True
+        else:
+            self.temporary = False
+        self.path = path
+
+        # El worker escribe en su hilo mientras la interfaz lee en el principal
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        columns = ', '.join(f"{field} TEXT" for field in RESULT_FIELDS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY AUTOINCREMENT, grupo TEXT, {columns})")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_tipo ON results (tipo)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_estado ON results (estado)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_grupo ON results (grupo)")
+        self.conn.commit()
+
+    def add_many(self, results, subtree=None):
+        """Inserta resultados en lotes de BATCH_SIZE, opcionalmente con su grupo de objetos."""
+        placeholders = ', '.join('?' for _ in RESULT_FIELDS)
+        query = f"INSERT INTO results (grupo, {', '.join(RESULT_FIELDS)}) VALUES (?, {placeholders})"
+        batch = []
+        for result in results:
+            batch.append((subtree, *(result.get(field) for field in RESULT_FIELDS)))
+            if len(batch) >= BATCH_SIZE:
+                self._insert(query, batch)
+                batch = []
+        if batch:
+            self._insert(query, batch)
+
+    def _insert(self, query, batch):
+        """Inserta y confirma un lote; cada lote es visible para la interfaz en cuanto termina."""
+        with self.lock:
+            self.conn.executemany(query, batch)
+            self.conn.commit()
+
+    def _select(self, where="", params=None):
+        """
+        Ejecuta una consulta y devuelve un iterador de ComparisonResult.
+
+        Se lee en bloques de BATCH_SIZE paginados por id, cada uno con su
+        propia consulta leída completa bajo el lock: no queda ningún cursor
+        abierto mientras se consume el iterador, así que los commit del worker
+        (que antes de Python 3.11 reinician los cursores abiertos de la
+        conexión) no cortan una lectura en curso ni la retienen el lock.
+        """
+        condition = f"{where} AND id > :block_after" if where else "WHERE id > :block_after"
+        query = f"SELECT id, {', '.join(RESULT_FIELDS)} FROM results {condition} ORDER BY id LIMIT {BATCH_SIZE}"
+        params = dict(params or {}, block_after=0)
+        while True:
+            with self.lock:
+                rows = self.conn.execute(query, params).fetchall()
+            for row in rows:
+                result = ComparisonResult(*row[1:])
+                result.store_id = row[0]
+                yield result
+            if len(rows) < BATCH_SIZE:
+                return
+            params['block_after'] = rows[-1][0]
+
+    def __iter__(self):
+        return self._select()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def replace_subtree(self, subtree, results):
+        """
+        Reemplaza los resultados de un grupo de objetos por los de una nueva comparación.
+
+        Returns:
+            Lista con los resultados anteriores del grupo
+        """
+        with self.lock:
+            previous = list(self._select("WHERE grupo = :grupo", {'grupo': subtree}))
+            self.conn.execute("DELETE FROM results WHERE grupo = ?", (subtree,))
+            self.add_many(results, subtree)
+            self.conn.commit()
+        return previous
+
+    def last_id(self):
+        """Id del último resultado insertado (0 si no hay ninguno)."""
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0]
+
+    def filter(self, hidden_types=(), categories=None, after_id=None, upto_id=None):
+        """
+        Devuelve los resultados que pasan los filtros de la interfaz.
+
+        Args:
+            hidden_types: Tipos de objeto que no deben mostrarse
+            categories: Categorías a mostrar (claves de CATEGORY_CONDITIONS),
+                o None para todas
+            after_id, upto_id: Rango opcional de ids (ver last_id) de los
+                resultados a devolver, para leer sólo los insertados después
+                de la última lectura
+
+        Returns:
+            Iterador de ComparisonResult
+        """
+        conditions = []
+        params = {'identical': IDENTICAL, 'not_exists': NOT_EXISTS, 'after_id': after_id, 'upto_id': upto_id}
+        if after_id is not None:
+            conditions.append("id > :after_id")
+        if upto_id is not None:
+            conditions.append("id <= :upto_id")
+        if hidden_types:
+            names = []
+            for i, tipo in enumerate(hidden_types):
+                params[f"tipo{i}"] = tipo
+                names.append(f":tipo{i}")
+            conditions.append(f"tipo NOT IN ({', '.join(names)})")
+        if categories is not None:
+            if not categories:
+                return iter(())
+            conditions.append("(" + " OR ".join(f"({CATEGORY_CONDITIONS[c]})" for c in categories) + ")")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._select(where, params)
+
+    def get(self, store_id):
+        """Devuelve el resultado con el id indicado (ComparisonResult.store_id), o None si no existe."""
+        return next(self._select("WHERE id = :store_id", {'store_id': store_id}), None)
+
+    def update_definitions(self, result):
+        """Guarda las definiciones cargadas después de la comparación (DefinitionLoader)."""
+        with self.lock:
+            self._update_definitions(result)
+
+    def _update_definitions(self, result):
+        self.conn.execute("""
+            UPDATE results
+            SET esquema1_full = ?, esquema2_full = ?, esquema1_normalized = ?, esquema2_normalized = ?
+            WHERE id = ?
+        """, (result.esquema1_full, result.esquema2_full,
+              result.esquema1_normalized, result.esquema2_normalized,
+              result.store_id))
+        self.conn.commit()
+
+    def summary(self, omitted_identical=None):
+        """Calcula en SQLite los mismos contadores que summarize_results."""
+        with self.lock:
+            counts = self._summary_counts()
+        return self._summary(counts, omitted_identical)
+
+    def _summary_counts(self):
+        return self.conn.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(estado = :identical), 0),
+                   COALESCE(SUM(esquema2 = :not_exists), 0),
+                   COALESCE(SUM(esquema1 = :not_exists), 0)
+            FROM results
+        """, {'identical': IDENTICAL, 'not_exists': NOT_EXISTS}).fetchone()
+
+    def _summary(self, counts, omitted_identical):
+        total, identical, only_schema1, only_schema2 = counts
+        omitted_count = sum(omitted_identical.values()) if omitted_identical else 0
+        total += omitted_count
+        identical += omitted_count
+        return {
+            'total': total,
+            'identicos': identical,
+            'diferentes': total - identical - only_schema1 - only_schema2,
+            'solo_esquema1': only_schema1,
+            'solo_esquema2': only_schema2
+        }
+
+    def close(self):
+        """Cierra la base de datos y elimina el archivo si es temporal."""
+        if self.conn is None:
+            return
+        with self.lock:
+            self.conn.close()
+            self.conn = None
+        if self.temporary:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar el archivo temporal {self.path}: {str(e)}")
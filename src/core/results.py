@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Representación compacta de los resultados de la comparación.
+
+Cada resultado es un objeto con __slots__ en lugar de un diccionario. Los
+textos que se repiten en miles de resultados (tipo, estado, detalle) se
+internan, de modo que todos los resultados comparten la misma cadena.
+
+En modo de carga diferida los resultados de funciones, vistas e índices sólo
+guardan el hash de cada definición (esquema1_hash, esquema2_hash) y
+DefinitionLoader completa el texto cuando se consulta el detalle.
+"""
+
+import sys
+
+# Valores comunes de los resultados
+NOT_EXISTS = 'No existe'
+IDENTICAL = 'IDÉNTICO'
+
+# Campos de un resultado, en el orden en que se exportan
+RESULT_FIELDS = ('tipo', 'objeto', 'detalle', 'esquema1', 'esquema2', 'estado',
+                 'esquema1_full', 'esquema2_full', 'esquema1_normalized', 'esquema2_normalized',
+                 'esquema1_hash', 'esquema2_hash')
+
+# Campos que sólo tienen valor para algunos tipos de objeto
+OPTIONAL_FIELDS = frozenset(RESULT_FIELDS[6:])
+
+class ComparisonResult:
+    """
+    Resultado de la comparación de un objeto.
+
+    Admite el acceso de un diccionario (result['tipo'], 'esquema1_full' in result,
+    dict(result)) para que la interfaz y los exportadores no dependan de la
+    representación interna. Los campos opcionales sin valor se comportan como
+    claves ausentes.
+    """
+
+    __slots__ = RESULT_FIELDS + ('store_id',)
+
+    def __init__(self, tipo, objeto, detalle, esquema1, esquema2, estado,
+                 esquema1_full=None, esquema2_full=None,
+                 esquema1_normalized=None, esquema2_normalized=None,
+                 esquema1_hash=None, esquema2_hash=None):
+        self.tipo = sys.intern(tipo)
+        self.objeto = objeto
+        self.detalle = sys.intern(detalle)
+        self.esquema1 = esquema1
+        self.esquema2 = esquema2
+        self.estado = sys.intern(estado)
+        self.esquema1_full = esquema1_full
+        self.esquema2_full = esquema2_full
+        self.esquema1_normalized = esquema1_normalized
+        self.esquema2_normalized = esquema2_normalized
+        self.esquema1_hash = esquema1_hash
+        self.esquema2_hash = esquema2_hash
+        # Id de la fila en ResultStore (None si el resultado no se ha leído de un almacén)
+        self.store_id = None
+
+    def __getitem__(self, key):
+        if key not in RESULT_FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in OPTIONAL_FIELDS:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in RESULT_FIELDS and (key not in OPTIONAL_FIELDS or getattr(self, key) is not None)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        if not isinstance(other, ComparisonResult):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in RESULT_FIELDS)
+
+    def __repr__(self):
+        return f"ComparisonResult({self.tipo!r}, {self.objeto!r}, {self.estado!r})"
+
+    def has_definitions(self):
+        """Indica si el resultado ya contiene las definiciones completas."""
+        return self.esquema1_full is not None and self.esquema2_full is not None
+
+    def get(self, key, default=None):
+        """Devuelve el valor de un campo o default si no tiene valor."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        """Devuelve los campos con valor, como las claves de un diccionario."""
+        return [field for field in RESULT_FIELDS if field in self]
+
+    def to_dict(self):
+        """Convierte el resultado en un diccionario con los campos que tienen valor."""
+        return {field: self[field] for field in self.keys()}
+
+def result_category(result):
+    """Clasifica un resultado en identicos, solo_esquema1, solo_esquema2 o diferentes."""
+    if result['estado'] == IDENTICAL:
+        return 'identicos'
+    if result['esquema2'] == NOT_EXISTS:
+        return 'solo_esquema1'
+    if result['esquema1'] == NOT_EXISTS:
+        return 'solo_esquema2'
+    return 'diferentes'
+
+def summarize_results(results, omitted_identical=None):
+    """
+    Resume una lista de resultados en los contadores usados por la interfaz.
+    
+    Args:
+        results: Lista de resultados de la comparación
+        omitted_identical: Diccionario opcional {tipo: cantidad} con los objetos
+            idénticos que no están en results (modo sólo diferencias)
+        
+    Returns:
+        Diccionario con los contadores total, identicos, diferentes,
+        solo_esquema1 y solo_esquema2
+    """
+    # Un ResultStore calcula los contadores en SQLite sin recorrer los resultados
+    if hasattr(results, 'summary'):
+        return results.summary(omitted_identical)
+
+    omitted_count = sum(omitted_identical.values()) if omitted_identical else 0
+    total_count = len(results) + omitted_count
+    identical_count = sum(1 for r in results if r['estado'] == IDENTICAL) + omitted_count
+    only_schema1_count = sum(1 for r in results if r['esquema2'] == NOT_EXISTS)
+    only_schema2_count = sum(1 for r in results if r['esquema1'] == NOT_EXISTS)
+    return {
+        'total': total_count,
+        'identicos': identical_count,
+        'diferentes': total_count - identical_count - only_schema1_count - only_schema2_count,
+        'solo_esquema1': only_schema1_count,
+        'solo_esquema2': only_schema2_count
+    }
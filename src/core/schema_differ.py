@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Comparación de dos catálogos de esquema ya extraídos y normalizados.
+
+No consulta la base de datos por sí mismo: trabaja sobre los diccionarios
+producidos por CatalogExtractor y SchemaNormalizer.normalize_catalog y, en
+streaming, sobre las secciones (SectionStream) que el extractor lee mientras
+se recorren. Cada tipo de objeto
+se recorre con merge_join, en una sola pasada y en orden de clave, de modo
+que los resultados salen siempre en el mismo orden. diff_subtree compara
+con diff_objects todos los tipos declarados en core.object_types, también
+las tablas (con sus columnas) y los constraints (con las referencias de sus
+foreign keys).
+"""
+
+import logging
+from operator import itemgetter
+from core.results import ComparisonResult, NOT_EXISTS
+from core.catalog_extractor import CATALOG_SUBTREES
+from core.object_types import COMPARED_TYPES
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Objetos comparados entre dos avisos de avance (ver SchemaDiffer.progress_callback)
+PROGRESS_BATCH = 1000
+
+def _ordered_items(objects, side):
+    """Pares (clave, objeto) de una colección, comprobando que lleguen ordenados por clave."""
+    if isinstance(objects, dict):
+        # Las claves se ordenan por punto de código, como las compara merge_join
+        yield from sorted(objects.items(), key=itemgetter(0))
+        return
+    previous = None
+    for key, obj in objects:
+        if previous is not None and key <= previous:
+            raise ValueError(f"Las claves del {side} lado no están ordenadas: '{previous}' antes de '{key}'")
+        previous = key
+        yield key, obj
+
+def merge_join(objects1, objects2):
+    """
+    Recorre dos colecciones de objetos en una sola pasada ordenada por clave.
+
+    Args:
+        objects1, objects2: Diccionarios {clave: objeto}, o iterables de pares
+            (clave, objeto) ya ordenados por clave, como las secciones que se
+            leen en streaming (SectionStream): se comparan a medida que llegan
+            del servidor, sin guardarlas en memoria
+
+    Yields:
+        Tuplas (clave, objeto1, objeto2) en orden de clave, con None en el lado
+        donde la clave no existe
+    """
+    items1 = _ordered_items(objects1, 'primer')
+    items2 = _ordered_items(objects2, 'segundo')
+    item1 = next(items1, None)
+    item2 = next(items2, None)
+    while item1 is not None or item2 is not None:
+        if item2 is None or (item1 is not None and item1[0] < item2[0]):
+            yield item1[0], item1[1], None
+            item1 = next(items1, None)
+        elif item1 is None or item2[0] < item1[0]:
+            yield item2[0], None, item2[1]
+            item2 = next(items2, None)
+        else:
+            yield item1[0], item1[1], item2[1]
+            item1 = next(items1, None)
+            item2 = next(items2, None)
+
+class SchemaDiffer:
+    """Genera la lista de resultados a partir de dos catálogos normalizados."""
+
+    def __init__(self, normalizer, log_callback=None, lazy_definitions=False,
+                 differences_only=False, progress_callback=None):
+        """
+        Args:
+            normalizer: SchemaNormalizer usado para mostrar las definiciones que difieren
+            log_callback: Función opcional que recibe (mensaje, nivel)
+            lazy_definitions: Si es True los resultados sólo guardan el hash de las
+                definiciones; el texto se obtiene al consultar el detalle
+            differences_only: Si es True los objetos idénticos sólo se cuentan
+                (ver identical_counts) y no generan resultados
+            progress_callback: Función opcional que recibe (grupo, objetos)
+                con los objetos de cada esquema comparados, cada PROGRESS_BATCH
+                y al terminar cada tipo
+        """
+        self.normalizer = normalizer
+        self.log_callback = log_callback
+        self.lazy_definitions = lazy_definitions
+        self.differences_only = differences_only
+        self.progress_callback = progress_callback
+        # Objetos idénticos por tipo, se generen o no sus resultados
+        self.identical_counts = {}
+
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def diff(self, catalog1, catalog2, subtrees=None):
+        """Compara todos los tipos de objeto de dos catálogos"""
+        results = []
+        for _, section_results in self.diff_sections(catalog1, catalog2, subtrees):
+            results.extend(section_results)
+        return results
+
+    def diff_sections(self, catalog1, catalog2, subtrees=None):
+        """
+        Genera los resultados de cada grupo de objetos, uno a la vez.
+
+        Args:
+            subtrees: Grupos de CATALOG_SUBTREES a comparar, o None para todos
+
+        Yields:
+            Tuplas (grupo, lista de resultados del grupo)
+        """
+        for subtree in CATALOG_SUBTREES:
+            if subtrees is None or subtree in subtrees:
+                yield subtree, self.diff_subtree(catalog1, catalog2, subtree)
+
+    def normalize(self, definition, schema):
+        """
+        Normaliza una definición para mostrarla en los detalles.
+
+        Sólo se llama para objetos con diferencias: los idénticos no guardan texto
+        normalizado. Si la normalización no cambia nada se reutiliza el mismo texto.
+        """
+        if definition is None:
+            return None
+        normalized = self.normalizer.normalize_definition(definition, schema)
+        return definition if normalized == definition else normalized
+
+    def keep_identical(self, tipo):
+        """Cuenta un objeto idéntico e indica si debe generarse su resultado"""
+        self.identical_counts[tipo] = self.identical_counts.get(tipo, 0) + 1
+        return not self.differences_only
+
+    def definition_fields(self, obj1, obj2, schema1, schema2, field, identical=False):
+        """
+        Campos de definición de un resultado de función, vista o índice.
+
+        Args:
+            obj1, obj2: Objeto de cada catálogo, o None si no existe en ese esquema
+            schema1, schema2: Nombres de los esquemas
+            field: Clave de la definición completa del objeto
+            identical: Si es True sólo se guarda el hash, como con carga
+                diferida: el texto de un objeto idéntico se obtiene con
+                DefinitionLoader si se consulta su detalle
+
+        Returns:
+            Diccionario con los argumentos para ComparisonResult; el hash de
+            las definiciones normalizadas está siempre, con o sin el texto
+        """
+        fields = {
+            'esquema1_hash': obj1['normalized_hash'] if obj1 else None,
+            'esquema2_hash': obj2['normalized_hash'] if obj2 else None
+        }
+        if self.lazy_definitions or identical:
+            return fields
+
+        fields['esquema1_full'] = obj1[field] if obj1 else NOT_EXISTS
+        fields['esquema2_full'] = obj2[field] if obj2 else NOT_EXISTS
+        fields['esquema1_normalized'] = self.normalize(obj1[field], schema1) if obj1 else NOT_EXISTS
+        fields['esquema2_normalized'] = self.normalize(obj2[field], schema2) if obj2 else NOT_EXISTS
+        return fields
+
+    def diff_objects(self, object_type, objects1, objects2, schema1, schema2, parent=None, children=None):
+        """
+        Compara los objetos de un tipo del registro (ver core.object_types).
+
+        Args:
+            object_type: ObjectType a comparar
+            objects1, objects2: Objetos de cada esquema, {clave: objeto}
+            schema1, schema2: Nombres de los esquemas
+            parent: Tabla o función a la que pertenecen los objetos anidados
+            children: Secciones de ambos esquemas con los objetos de
+                object_type.children, o None si no se pudieron extraer (los
+                objetos presentes en ambos esquemas no se clasifican)
+
+        Returns:
+            Tupla (resultados, cantidad de diferencias, cantidad de objetos idénticos)
+        """
+        results = []
+        diff_count = 0
+        identical_count = 0
+        field = object_type.definition_field
+        compared = 0
+        for key, obj1, obj2 in merge_join(objects1, objects2):
+            compared += (obj1 is not None) + (obj2 is not None)
+            if compared >= PROGRESS_BATCH:
+                self.report_compared(object_type, compared)
+                compared = 0
+            objeto = f"{parent}.{key}" if parent else key
+            if obj1 is None or obj2 is None:
+                if not object_type.reports_missing():
+                    continue
+                only_first = obj2 is None
+                tipo = object_type.result_type(obj1 if only_first else obj2)
+                results.append(ComparisonResult(
+                    tipo=tipo,
+                    objeto=objeto,
+                    detalle=object_type.message('solo_esquema1' if only_first else 'solo_esquema2', tipo),
+                    esquema1=object_type.describe(schema1, parent, key, obj1) if only_first else NOT_EXISTS,
+                    esquema2=NOT_EXISTS if only_first else object_type.describe(schema2, parent, key, obj2),
+                    estado=object_type.estado_solo,
+                    **(self.definition_fields(obj1, obj2, schema1, schema2, field) if field else {})
+                ))
+                diff_count += 1
+                continue
+
+            tipo = object_type.result_type(obj1)
+            if object_type.differs(obj1, obj2):
+                tipo = object_type.tipo_diferente or tipo
+                results.append(ComparisonResult(
+                    tipo=tipo,
+                    objeto=objeto,
+                    detalle=object_type.message('diferente', tipo),
+                    esquema1=object_type.describe_diferente(schema1, parent, key, obj1),
+                    esquema2=object_type.describe_diferente(schema2, parent, key, obj2),
+                    estado=object_type.estado_diferente,
+                    **(self.definition_fields(obj1, obj2, schema1, schema2, field) if field else {})
+                ))
+                diff_count += 1
+                continue
+
+            if object_type.children is not None:
+                # Sin sus hijos no se sabe si el objeto es idéntico
+                if children is None:
+                    continue
+                child_results = self.diff_children(object_type.children, key, children, schema1, schema2)
+                if child_results:
+                    results.extend(child_results)
+                    diff_count += len(child_results)
+                    continue
+
+            if object_type.identical_results:
+                identical_count += 1
+                if self.keep_identical(tipo):
+                    results.append(ComparisonResult(
+                        tipo=tipo,
+                        objeto=objeto,
+                        detalle=object_type.message('identico', tipo),
+                        esquema1=object_type.describe(schema1, parent, key, obj1),
+                        esquema2=object_type.describe(schema2, parent, key, obj2),
+                        estado='IDÉNTICO',
+                        **(self.definition_fields(obj1, obj2, schema1, schema2, field, identical=True)
+                           if field else {})
+                    ))
+        self.report_compared(object_type, compared)
+        return results, diff_count, identical_count
+
+    def report_compared(self, object_type, count):
+        """Informa objetos comparados de un tipo."""
+        if self.progress_callback and count:
+            self.progress_callback(object_type.subtree, count)
+
+    def diff_children(self, object_type, key, children, schema1, schema2):
+        """
+        Compara los hijos de un objeto presente en ambos esquemas.
+
+        Args:
+            object_type: ObjectType de los hijos
+            key: Clave del objeto padre
+            children: Secciones de ambos esquemas con los hijos
+
+        Returns:
+            Lista de resultados de los hijos que difieren
+        """
+        children1, children2 = children
+        if object_type.nested:
+            return self.diff_objects(object_type, children1.get(key, {}), children2.get(key, {}),
+                                     schema1, schema2, parent=key)[0]
+        # Los hijos no anidados tienen la misma clave que su padre
+        return self.diff_objects(object_type, {key: children1[key]} if key in children1 else {},
+                                 {key: children2[key]} if key in children2 else {}, schema1, schema2)[0]
+
+    def _sections(self, catalog1, catalog2, object_type):
+        """Devuelve la sección de un tipo de ambos catálogos, o None si alguno no la pudo extraer"""
+        objects1 = catalog1.get(object_type.section)
+        objects2 = catalog2.get(object_type.section)
+        if objects1 is None or objects2 is None:
+            self.log(f"No se compararán {object_type.label}: no se pudieron obtener de ambos esquemas",
+                     logging.WARNING)
+            return None
+        return objects1, objects2
+
+    def diff_type(self, object_type, catalog1, catalog2):
+        """
+        Compara los objetos de un tipo del registro en ambos catálogos, con sus hijos.
+
+        Los objetos anidados de un tipo que no es hijo de otro (los parámetros
+        de funciones) se comparan sólo en los padres presentes en ambos esquemas.
+
+        Returns:
+            Tupla (resultados, cantidad de diferencias, cantidad de objetos
+            idénticos), o None si la sección no se pudo extraer de ambos esquemas
+        """
+        sections = self._sections(catalog1, catalog2, object_type)
+        if sections is None:
+            return None
+        schema1, schema2 = catalog1['schema'], catalog2['schema']
+        if object_type.nested:
+            results = []
+            diff_count = identical_count = 0
+            for parent, objects1, objects2 in merge_join(*sections):
+                if objects1 is not None and objects2 is not None:
+                    parent_results, parent_diffs, parent_identical = self.diff_objects(
+                        object_type, objects1, objects2, schema1, schema2, parent=parent)
+                    results.extend(parent_results)
+                    diff_count += parent_diffs
+                    identical_count += parent_identical
+            return results, diff_count, identical_count
+        children = None
+        if object_type.children is not None:
+            children = self._sections(catalog1, catalog2, object_type.children)
+        return self.diff_objects(object_type, *sections, schema1, schema2, children=children)
+
+    def diff_subtree(self, catalog1, catalog2, subtree):
+        """
+        Compara los tipos del registro de un grupo de CATALOG_SUBTREES.
+
+        Returns:
+            Lista de resultados, tipo por tipo en el orden del registro
+        """
+        results = []
+        for object_type in COMPARED_TYPES:
+            if object_type.subtree != subtree:
+                continue
+            diffed = self.diff_type(object_type, catalog1, catalog2)
+            if diffed is None:
+                continue
+            type_results, diff_count, identical_count = diffed
+            results.extend(type_results)
+
+            summary = f"Se encontraron {diff_count} diferencias"
+            if object_type.identical_results:
+                summary += f" y {identical_count} {object_type.noun} {object_type.agree('idéntic')}"
+            self.log(f"Comparación de {object_type.noun} completada. {summary}.")
+        return results
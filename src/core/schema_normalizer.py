@@ -4,6 +4,11 @@ Normalizador de definiciones de esquemas PostgreSQL.
 """
 
 import re
+import hashlib
+from core.object_types import OBJECT_TYPES
+
+# Secciones con definiciones que se comparan por su hash normalizado
+DEFINITION_SECTIONS = tuple(object_type.section for object_type in OBJECT_TYPES if object_type.definition)
 
 class SchemaNormalizer:
     """Clase para normalizar definiciones de objetos eliminando referencias a esquemas."""
@@ -57,6 +62,50 @@ class SchemaNormalizer:
         
         return normalized
 
+    def definition_hash(self, definition, source_schema):
+        """Devuelve un hash de la definición normalizada (None si la definición es NULL)"""
+        if definition is None:
+            return None
+        normalized = self.normalize_definition(definition, source_schema)
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+    def normalize_catalog(self, catalog):
+        """
+        Añade a un catálogo extraído por CatalogExtractor los datos normalizados
+        necesarios para comparar.
+
+        Las definiciones se comparan por el hash de su versión normalizada; el
+        texto normalizado sólo se genera después, para los objetos que difieren.
+        Los objetos que ya traen el hash (CatalogExtractor con normalizer) no se
+        vuelven a normalizar, y las secciones en streaming (SectionStream) se
+        omiten: sus objetos llegan con el hash al compararlas.
+        """
+        source_schema = catalog['schema']
+
+        for section in DEFINITION_SECTIONS:
+            objects = catalog.get(section)
+            if not isinstance(objects, dict):
+                continue
+            for obj in objects.values():
+                if 'normalized_hash' not in obj:
+                    obj['normalized_hash'] = self.definition_hash(obj['definition'], source_schema)
+
+        return catalog
+
+    def normalized_copy(self, catalog):
+        """
+        Devuelve una copia normalizada de un catálogo sin modificar el original.
+
+        Sólo se copian los objetos a los que normalize_catalog añade datos; las
+        demás secciones se comparten con el catálogo original.
+        """
+        copied = dict(catalog)
+        for section in DEFINITION_SECTIONS:
+            objects = catalog.get(section)
+            if isinstance(objects, dict):
+                copied[section] = {key: dict(obj) for key, obj in objects.items()}
+        return self.normalize_catalog(copied)
+
     def _find_schema_references(self, text):
         """Encuentra todos los posibles nombres de esquema en el texto SQL"""
         import re
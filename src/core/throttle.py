@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Regulación de la carga de la extracción sobre servidores en producción.
+
+AdaptiveThrottle limita el tamaño de los lotes de las consultas paginadas
+del catálogo y la cantidad de lotes simultáneos contra un servidor, y los
+ajusta según la latencia observada: si un lote tarda más que la latencia
+objetivo se reducen a la mitad el tamaño y en uno la concurrencia, y se cede
+el servidor durante el exceso de tiempo; si tarda menos de la mitad, ambos
+vuelven a crecer poco a poco.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+class AdaptiveThrottle:
+    """Tamaño de lote y concurrencia adaptativos para las consultas contra un servidor."""
+
+    def __init__(self, target_latency=0.25, max_concurrency=1, initial_batch=100,
+                 min_batch=10, max_batch=5000):
+        """
+        Args:
+            target_latency: Segundos que debería tardar como máximo cada lote
+            max_concurrency: Lotes simultáneos permitidos como máximo
+            initial_batch: Filas del primer lote
+            min_batch, max_batch: Límites del tamaño de lote
+        """
+        self.target_latency = target_latency
+        self.max_concurrency = max_concurrency
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_size = initial_batch
+        self.concurrency = max_concurrency
+        self.active = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def batch(self):
+        """
+        Reserva un turno para ejecutar un lote y mide su latencia.
+
+        Yields:
+            Cantidad de filas que debe pedir el lote
+        """
+        with self.condition:
+            while self.active >= self.concurrency:
+                self.condition.wait()
+            self.active += 1
+            batch_size = self.batch_size
+
+        started = time.monotonic()
+        try:
+            yield batch_size
+        finally:
+            elapsed = time.monotonic() - started
+            with self.condition:
+                self.active -= 1
+                self.adapt(elapsed)
+                self.condition.notify_all()
+
+        # Ceder el servidor tanto tiempo como el lote excedió la latencia objetivo
+        excess = elapsed - self.target_latency
+        if excess > 0:
+            time.sleep(min(excess, 4 * self.target_latency))
+
+    def adapt(self, elapsed):
+        """Ajusta el tamaño de lote y la concurrencia según la latencia del último lote."""
+        if elapsed > self.target_latency:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+            self.concurrency = max(1, self.concurrency - 1)
+            logger.debug(f"Lote de {elapsed:.3f} s: tamaño {self.batch_size}, concurrencia {self.concurrency}")
+        elif elapsed < self.target_latency / 2:
+            self.batch_size = min(self.max_batch, self.batch_size + max(1, self.batch_size // 2))
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Vigilancia de dos esquemas con nueva comparación de lo que cambia.
+
+Durante una ventana de despliegue se repite la misma comparación cada pocos
+minutos para ver cuándo convergen los entornos. SchemaWatcher mantiene una
+conexión abierta a cada base de datos y consulta periódicamente una señal de
+cambio barata de ambos esquemas (cantidad de filas y xmin máximo de cada
+catálogo, ver core.fingerprint.change_signal). Sólo cuando la señal se mueve
+se calcula la huella (una consulta por servidor, con un hash por grupo de
+CATALOG_SUBTREES), y sólo los grupos cuyo hash cambió en alguno de los dos
+esquemas se vuelven a extraer y comparar; sus resultados reemplazan a los
+anteriores en el ResultStore.
+"""
+
+import logging
+from core.cancellation import ComparisonCancelled
+from core.capabilities import server_capabilities
+from core.catalog_extractor import CATALOG_SUBTREES
+from core.comparison_engine import ComparisonEngine
+from core.db_connector import is_transient
+from core.fingerprint import SchemaFingerprint, change_signal
+from core.history import DELTA_CHANGED, DELTA_CONVERGED, DELTA_NEW, DELTA_REMOVED, result_hash
+from core.results import IDENTICAL
+
+# Obtener el logger
+logger = logging.getLogger('SchemaComparator')
+
+# Segundos entre dos consultas de la señal de cambio
+DEFAULT_WATCH_INTERVAL = 60
+
+def results_delta(previous, current, differences_only=False):
+    """
+    Cambios entre los resultados anteriores y los nuevos de los mismos grupos.
+
+    Los objetos se identifican por tipo y objeto y se comparan por su hash,
+    como en ComparisonHistory.delta. Con differences_only un objeto que
+    difería y ya no tiene resultado no se eliminó: ahora es idéntico
+    (DELTA_CONVERGED).
+
+    Returns:
+        Lista de diccionarios con tipo, objeto, cambio, estado_anterior y
+        estado_actual, ordenada por tipo y objeto
+    """
+    before = {(result['tipo'], result['objeto']): result for result in previous}
+    after = {(result['tipo'], result['objeto']): result for result in current}
+    delta = []
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key), after.get(key)
+        if old is None:
+            cambio = DELTA_NEW
+        elif new is None:
+            if not differences_only:
+                cambio = DELTA_REMOVED
+            elif old['estado'] == IDENTICAL:
+                continue
+            else:
+                cambio = DELTA_CONVERGED
+        elif result_hash(old) != result_hash(new):
+            cambio = DELTA_CHANGED
+        else:
+            continue
+        delta.append({'tipo': key[0], 'objeto': key[1], 'cambio': cambio,
+                      'estado_anterior': old['estado'] if old else None,
+                      'estado_actual': new['estado'] if new else None})
+    return delta
+
+class SchemaWatcher:
+    """Vuelve a comparar los grupos de objetos cuya huella cambia, hasta que se cancela el motor."""
+
+    def __init__(self, engine, interval=DEFAULT_WATCH_INTERVAL, log_callback=None):
+        """
+        Args:
+            engine: ComparisonEngine de la comparación vigilada; su cancel()
+                detiene la vigilancia
+            interval: Segundos entre dos consultas de la señal de cambio
+            log_callback: Función opcional que recibe (mensaje, nivel)
+        """
+        self.engine = engine
+        self.interval = interval
+        self.log_callback = log_callback
+        self.connections = None
+        self.signals = None
+        self.fingerprints = None
+
+    def log(self, message, level=logging.INFO):
+        """Método para enviar mensajes de log."""
+        logger.log(level, message)
+        if self.log_callback:
+            self.log_callback(message, level)
+
+    def run(self, store, on_results=None, on_change=None):
+        """
+        Compara los esquemas y vigila sus cambios hasta que se llama a engine.cancel().
+
+        La señal y la huella de partida se toman antes de la primera
+        comparación, así que un cambio hecho mientras se compara se detecta en
+        la primera consulta.
+
+        Args:
+            store: ResultStore donde se guardan los resultados y se reemplazan
+                los de los grupos que cambian
+            on_results: Función opcional que recibe store tras la primera comparación
+            on_change: Función opcional que recibe (store, grupos cambiados,
+                cambios de results_delta) tras cada nueva comparación
+
+        Returns:
+            store, actualizado con la última comparación
+
+        Raises:
+            ComparisonCancelled: Si se cancela durante la primera comparación
+        """
+        try:
+            self.connect()
+            self.signals = self.change_signal()
+            self.fingerprints = self.fingerprint()
+            results = self.engine.run(store=store)
+            if on_results:
+                on_results(results)
+
+            self.log(f"Vigilando los esquemas: se consultará su señal de cambio cada {self.interval} s")
+            while not self.engine.cancellation.event.wait(self.interval):
+                try:
+                    changes = self.poll(results)
+                except ComparisonCancelled:
+                    break
+                except Exception as e:
+                    # Una conexión perdida se vuelve a abrir en la siguiente consulta
+                    if not is_transient(e):
+                        raise
+                    self.log(f"Se perdió la conexión mientras se vigilaban los esquemas; se reintentará: "
+                             f"{' '.join(str(e).split())}", logging.WARNING)
+                    self.close()
+                    continue
+                if changes and on_change:
+                    on_change(results, *changes)
+            self.log("Vigilancia de los esquemas detenida")
+            return results
+        finally:
+            self.close()
+
+    def connect(self):
+        """Abre las conexiones que se mantienen durante toda la vigilancia."""
+        connections = []
+        try:
+            for params in (self.engine.conn_params1, self.engine.conn_params2):
+                conn = self.engine.connect_db(params)
+                connections.append(conn)
+                # Cada consulta ve el catálogo actual sin dejar transacciones abiertas
+                conn.autocommit = True
+        except Exception:
+            for conn in connections:
+                conn.close()
+            raise
+        self.connections = connections
+
+    def close(self):
+        """Cierra las conexiones de la vigilancia."""
+        for conn in self.connections or ():
+            if not conn.closed:
+                conn.close()
+        self.connections = None
+
+    def change_signal(self):
+        """Señal de cambio actual de ambos esquemas."""
+        return [change_signal(conn, params['schema'])
+                for conn, params in zip(self.connections,
+                                        (self.engine.conn_params1, self.engine.conn_params2))]
+
+    def fingerprint(self):
+        """Huella actual de ambos esquemas."""
+        return [SchemaFingerprint.compute(conn, params['schema'], server_capabilities(conn))
+                for conn, params in zip(self.connections,
+                                        (self.engine.conn_params1, self.engine.conn_params2))]
+
+    def poll(self, results):
+        """
+        Consulta la señal de cambio y, si se movió, la huella, y vuelve a
+        comparar los grupos que cambiaron.
+
+        Returns:
+            Tupla (grupos cambiados, cambios) o None si no cambió nada
+        """
+        if self.connections is None:
+            self.connect()
+        signals = self.change_signal()
+        if signals == self.signals:
+            return None
+
+        fingerprints = self.fingerprint()
+        changed = [subtree for subtree in CATALOG_SUBTREES
+                   if any(old.subtrees[subtree] != new.subtrees[subtree]
+                          for old, new in zip(self.fingerprints, fingerprints))]
+        if not changed:
+            # Un cambio que la comparación no ve (permisos, comentarios...)
+            self.signals = signals
+            return None
+
+        self.log(f"La huella cambió en: {', '.join(changed)}; comparando de nuevo esos grupos")
+        delta = self.recompare(changed, results)
+        # La nueva señal y la nueva huella son las de partida sólo cuando su comparación terminó
+        self.signals = signals
+        self.fingerprints = fingerprints
+        self.log(f"{len(delta)} cambios en los resultados de {', '.join(changed)}")
+        return changed, delta
+
+    def recompare(self, subtrees, results):
+        """
+        Extrae y compara de nuevo algunos grupos con las conexiones abiertas.
+
+        Los resultados de cada grupo reemplazan a los anteriores en el
+        ResultStore results y sus objetos idénticos omitidos, en
+        engine.omitted_identical.
+
+        Returns:
+            Cambios de results_delta en los grupos comparados
+        """
+        engine = self.engine
+        # Un motor propio para no mezclar su avance ni sus resultados con los de la primera comparación
+        partial = ComparisonEngine(engine.conn_params1, engine.conn_params2,
+                                   log_callback=engine.log_callback,
+                                   lazy_definitions=engine.lazy_definitions,
+                                   differences_only=engine.differences_only,
+                                   subtrees=subtrees)
+        partial.cancellation = engine.cancellation
+        by_subtree = {}
+        partial.results_callback = lambda subtree, section_results: by_subtree.setdefault(subtree, section_results)
+
+        conn1, conn2 = self.connections
+        catalog1 = partial.extract(conn1, engine.conn_params1['schema'])
+        catalog2 = partial.extract(conn2, engine.conn_params2['schema'])
+        partial.compare_catalogs(catalog1, catalog2)
+
+        delta = []
+        for subtree in subtrees:
+            current = by_subtree.get(subtree, [])
+            previous = results.replace_subtree(subtree, current)
+            delta.extend(results_delta(previous, current, engine.differences_only))
+            engine.update_omitted(subtree, partial.omitted_by_subtree.get(subtree, {}))
+        return delta
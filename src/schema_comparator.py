@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Comparador de Esquemas PostgreSQL - Línea de comandos
+-----------------------------------------------------
+Punto de entrada sin interfaz gráfica, pensado para cron y CI:
+
+    python -m schema_comparator compare --dbname1 erp --user1 postgres --schema1 emp0044pro \\
+                                        --dbname2 erp --user2 postgres --schema2 emp0045pro
+"""
+
+import sys
+from cli.commands import main
+
+if __name__ == '__main__':
+    sys.exit(main())
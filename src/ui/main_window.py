@@ -18,22 +18,37 @@ from PyQt5.QtGui import QIcon, QColor, QFont, QPalette, QTextCursor, QKeySequenc
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtWidgets import QApplication
 from core.schema_normalizer import SchemaNormalizer
+from core.results import summarize_results, result_category, RESULT_FIELDS
 from ui.styles import STYLE
 from ui.widgets.diff_viewer import DiffViewer
 from ui.widgets.log_widget import QTextEditLogger
 from core.comparison_worker import ComparisonWorker
+from core.history import ComparisonHistory
+from core.watch import DEFAULT_WATCH_INTERVAL
 from utils.export_utils import (export_to_excel, export_to_csv, 
                                 export_to_html, export_to_json)
 
 # Obtener el logger
 logger = logging.getLogger('SchemaComparator')
 
+# Campos de los resultados que se muestran en la tabla y se exportan
+TABLE_FIELDS = RESULT_FIELDS[:6]
+
 class SchemaComparatorApp(QMainWindow):
     """Ventana principal de la aplicación de comparación de esquemas PostgreSQL."""
     
     def __init__(self):
         super().__init__()
-        self.results = []
+        # Worker de la última comparación (None si todavía no se comparó)
+        self.worker = None
+        # ResultStore de la última comparación (None si todavía no hay resultados)
+        self.results = None
+        # Cargador de definiciones de la última comparación (modo de carga diferida)
+        self.definition_loader = None
+        # Objetos idénticos por tipo que no están en self.results (modo sólo diferencias)
+        self.omitted_identical = {}
+        # Id del último resultado del almacén que ya pasó por los filtros de la tabla
+        self.shown_upto = 0
         
         # Configurar logger para la interfaz
         self.log_handler = QTextEditLogger(self)
@@ -207,8 +222,31 @@ class SchemaComparatorApp(QMainWindow):
         self.export_btn.clicked.connect(self.export_results)
         self.export_btn.setEnabled(False)
         
+        # Sólo habilitado mientras hay una comparación en curso
+        self.cancel_btn = QPushButton("Cancelar")
+        self.cancel_btn.setFont(QFont("Segoe UI", 10))
+        self.cancel_btn.setStyleSheet(f"""
+            QPushButton {{
+                background-color: {STYLE['DANGER_COLOR']};
+                color: white;
+                border: none;
+                padding: 10px 15px;
+                border-radius: 4px;
+                min-width: 120px;
+            }}
+            QPushButton:hover {{
+                background-color: #c0392b;
+            }}
+            QPushButton:pressed {{
+                background-color: #a93226;
+            }}
+        """)
+        self.cancel_btn.clicked.connect(self.cancel_comparison)
+        self.cancel_btn.setEnabled(False)
+        
         buttons_layout.addStretch()
         buttons_layout.addWidget(self.connect_btn)
+        buttons_layout.addWidget(self.cancel_btn)
         buttons_layout.addWidget(self.export_btn)
         buttons_layout.addStretch()
         
@@ -497,6 +535,22 @@ class SchemaComparatorApp(QMainWindow):
         self.normalize_schemas.setChecked(True)
         self.normalize_schemas.setToolTip("Ignora diferencias en nombres de esquemas al comparar objetos")
         
+        self.lazy_definitions = QCheckBox("Cargar Definiciones Bajo Demanda")
+        self.lazy_definitions.setChecked(True)
+        self.lazy_definitions.setToolTip("Obtiene el texto completo de funciones y vistas solo al consultar sus detalles")
+        
+        self.differences_only = QCheckBox("Solo Diferencias")
+        self.differences_only.setToolTip("No lista los objetos idénticos; solo se cuentan en las estadísticas")
+        
+        self.watch_changes = QCheckBox("Vigilar Cambios")
+        self.watch_changes.setToolTip("Tras comparar, consulta periódicamente si cambió el catálogo de ambos esquemas y "
+                                      "vuelve a comparar solo los grupos de objetos que cambian, hasta cancelar")
+        self.watch_interval = QSpinBox()
+        self.watch_interval.setRange(5, 3600)
+        self.watch_interval.setValue(DEFAULT_WATCH_INTERVAL)
+        self.watch_interval.setSuffix(" s")
+        self.watch_interval.setToolTip("Segundos entre dos consultas de los cambios en los esquemas")
+        
         self.show_details_btn = QPushButton("Mostrar Detalles")
         self.show_details_btn.setToolTip("Muestra información detallada del elemento seleccionado")
         self.show_details_btn.clicked.connect(self.show_details)
@@ -505,6 +559,10 @@ class SchemaComparatorApp(QMainWindow):
 
         # Añadir widgets a las opciones avanzadas
         advanced_options_layout.addWidget(self.normalize_schemas)
+        advanced_options_layout.addWidget(self.lazy_definitions)
+        advanced_options_layout.addWidget(self.differences_only)
+        advanced_options_layout.addWidget(self.watch_changes)
+        advanced_options_layout.addWidget(self.watch_interval)
         advanced_options_layout.addStretch()
         advanced_options_layout.addWidget(self.show_details_btn)
         
@@ -777,21 +835,17 @@ class SchemaComparatorApp(QMainWindow):
         text1 = esquema1
         text2 = esquema2
         
-        for result in self.results:
-            if (result['tipo'] == tipo and 
-                result['objeto'] == objeto and 
-                result['detalle'] == detalle):
-                # Si hay definiciones completas disponibles, usarlas
-                if 'esquema1_full' in result and 'esquema2_full' in result:
-                    esquema1_full = result['esquema1_full']
-                    esquema2_full = result['esquema2_full']
-                
-                # Si hay definiciones normalizadas disponibles, usarlas
-                if 'esquema1_normalized' in result and 'esquema2_normalized' in result:
-                    text1 = result['esquema1_normalized']
-                    text2 = result['esquema2_normalized']
-                
-                break
+        result = self.find_result(row)
+        if result is not None:
+            # Si hay definiciones completas disponibles, usarlas
+            if 'esquema1_full' in result and 'esquema2_full' in result:
+                esquema1_full = result['esquema1_full']
+                esquema2_full = result['esquema2_full']
+
+            # Si hay definiciones normalizadas disponibles, usarlas
+            if 'esquema1_normalized' in result and 'esquema2_normalized' in result:
+                text1 = result['esquema1_normalized']
+                text2 = result['esquema2_normalized']
         
         # Importar la clase DetailWindow
         from ui.widgets.detail_window import DetailWindow
@@ -862,12 +916,13 @@ class SchemaComparatorApp(QMainWindow):
     # Método para actualizar los contadores con la información actual
     def update_statistics(self):
         """Actualiza los contadores y barras de progreso con la información actual"""
-        # Contar objetos por categoría
-        total_count = len(self.results)
-        identical_count = sum(1 for r in self.results if r['estado'] == 'IDÉNTICO')
-        only_schema1_count = sum(1 for r in self.results if r['esquema2'] == 'No existe')
-        only_schema2_count = sum(1 for r in self.results if r['esquema1'] == 'No existe')
-        different_count = total_count - identical_count - only_schema1_count - only_schema2_count
+        # Contar objetos por categoría, incluidos los idénticos no listados
+        summary = summarize_results(self.results, self.omitted_identical)
+        total_count = summary['total']
+        identical_count = summary['identicos']
+        only_schema1_count = summary['solo_esquema1']
+        only_schema2_count = summary['solo_esquema2']
+        different_count = summary['diferentes']
         
         # Actualizar contadores
         self.total_counter.setText(str(total_count))
@@ -1033,21 +1088,17 @@ class SchemaComparatorApp(QMainWindow):
         esquema1_normalized = None
         esquema2_normalized = None
         
-        for result in self.results:
-            if (result['tipo'] == tipo and 
-                result['objeto'] == objeto and 
-                result['detalle'] == detalle):
-                # Si hay definiciones completas disponibles, usarlas
-                if 'esquema1_full' in result and 'esquema2_full' in result:
-                    esquema1_full = result['esquema1_full']
-                    esquema2_full = result['esquema2_full']
-                
-                # Si hay definiciones normalizadas disponibles, usarlas
-                if 'esquema1_normalized' in result and 'esquema2_normalized' in result:
-                    esquema1_normalized = result['esquema1_normalized']
-                    esquema2_normalized = result['esquema2_normalized']
-                
-                break
+        result = self.find_result(row)
+        if result is not None:
+            # Si hay definiciones completas disponibles, usarlas
+            if 'esquema1_full' in result and 'esquema2_full' in result:
+                esquema1_full = result['esquema1_full']
+                esquema2_full = result['esquema2_full']
+
+            # Si hay definiciones normalizadas disponibles, usarlas
+            if 'esquema1_normalized' in result and 'esquema2_normalized' in result:
+                esquema1_normalized = result['esquema1_normalized']
+                esquema2_normalized = result['esquema2_normalized']
         
         # Actualizar título de detalles
         self.detail_object.setText(f"{tipo}: {objeto}")
@@ -1261,18 +1312,9 @@ class SchemaComparatorApp(QMainWindow):
             if dialog.exec_() == QMessageBox.AcceptRole:
                 selected_format = format_combo.currentText()
                 
-                # Filtrar resultados según los filtros aplicados
-                filtered_results = []
-                for i in range(self.results_table.rowCount()):
-                    row_data = {
-                        'tipo': self.results_table.item(i, 0).text(),
-                        'objeto': self.results_table.item(i, 1).text(),
-                        'detalle': self.results_table.item(i, 2).text(),
-                        'esquema1': self.results_table.item(i, 3).text(),
-                        'esquema2': self.results_table.item(i, 4).text(),
-                        'estado': self.results_table.item(i, 5).text()
-                    }
-                    filtered_results.append(row_data)
+                # Exportar del almacén las columnas de la tabla de los resultados filtrados
+                filtered_results = [{field: result[field] for field in TABLE_FIELDS}
+                                    for result in self.results.filter(*self.current_filters())]
                 
                 # Obtener la ruta para guardar el archivo
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1282,25 +1324,25 @@ class SchemaComparatorApp(QMainWindow):
                     file_path, _ = QFileDialog.getSaveFileName(
                         self, "Guardar como Excel", default_filename, "Excel Files (*.xlsx)")
                     if file_path:
-                        self.export_to_excel(file_path, filtered_results)
+                        export_to_excel(self, file_path, filtered_results)
                 
                 elif "CSV" in selected_format:
                     file_path, _ = QFileDialog.getSaveFileName(
                         self, "Guardar como CSV", default_filename, "CSV Files (*.csv)")
                     if file_path:
-                        self.export_to_csv(file_path, filtered_results)
+                        export_to_csv(self, file_path, filtered_results)
                 
                 elif "HTML" in selected_format:
                     file_path, _ = QFileDialog.getSaveFileName(
                         self, "Guardar como HTML", default_filename, "HTML Files (*.html)")
                     if file_path:
-                        self.export_to_html(file_path, filtered_results)
+                        export_to_html(self, file_path, filtered_results)
                 
                 elif "JSON" in selected_format:
                     file_path, _ = QFileDialog.getSaveFileName(
                         self, "Guardar como JSON", default_filename, "JSON Files (*.json)")
                     if file_path:
-                        self.export_to_json(file_path, filtered_results)
+                        export_to_json(self, file_path, filtered_results)
         
         except Exception as e:
             logger.error(f"Error en la exportación: {str(e)}")
@@ -1341,28 +1383,42 @@ class SchemaComparatorApp(QMainWindow):
             
             # Limpiar tabla de resultados
             self.results_table.setRowCount(0)
-            self.results = []
+            self.close_results()
+            self.omitted_identical = {}
+            self.shown_upto = 0
+            self.close_definition_loader()
             self.export_btn.setEnabled(False)
             
             logger.info(f"Iniciando comparación entre {conn_params1['schema']} y {conn_params2['schema']}")
             
             # Iniciar el proceso de comparación en un hilo separado
-            self.worker = ComparisonWorker(conn_params1, conn_params2)
+            self.worker = ComparisonWorker(conn_params1, conn_params2,
+                                           lazy_definitions=self.lazy_definitions.isChecked(),
+                                           differences_only=self.differences_only.isChecked(),
+                                           watch_interval=(self.watch_interval.value()
+                                                           if self.watch_changes.isChecked() else None))
             self.worker.progress_signal.connect(self.update_progress)
+            self.worker.eta_signal.connect(self.update_eta)
+            self.worker.results_batch_signal.connect(self.append_results)
             self.worker.result_signal.connect(self.show_results)
             self.worker.error_signal.connect(self.show_error)
+            self.worker.cancelled_signal.connect(self.show_partial_results)
+            self.worker.changes_signal.connect(self.show_changes)
             self.worker.completed_signal.connect(self.comparison_completed)
             self.worker.log_signal.connect(self.handle_worker_log)
             
             # Mostrar la barra de progreso
             self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("%p%")
             self.progress_bar.setVisible(True)
             self.statusBar().showMessage("Comparando esquemas...")
             
             # Deshabilitar botón de conexión durante la comparación
             self.connect_btn.setEnabled(False)
+            self.cancel_btn.setEnabled(True)
             
             # Iniciar hilo de comparación
+            self.comparison_started = datetime.now()
             self.worker.start()
             
         except Exception as e:
@@ -1374,166 +1430,292 @@ class SchemaComparatorApp(QMainWindow):
     
     def update_progress(self, value):
         self.progress_bar.setValue(value)
+    
+    def update_eta(self, seconds):
+        """Muestra en la barra de progreso el tiempo restante estimado"""
+        minutes, seconds = divmod(int(round(seconds)), 60)
+        self.progress_bar.setFormat(f"%p% - quedan {minutes}:{seconds:02d}")
+        
+    def append_results(self, results, last_id):
+        """Muestra los resultados guardados por el worker hasta last_id mientras la comparación sigue"""
+        if self.results is None:
+            self.results = results
+            # Los resultados idénticos (y todos, con carga diferida) no
+            # incluyen las definiciones: se cargan al consultarlas
+            self.definition_loader = self.worker.engine.definition_loader()
+        self.omitted_identical = dict(self.worker.engine.omitted_identical)
+        
+        # Sólo los resultados nuevos que pasan los filtros activos; si apply_filters
+        # ya los leyó, no se repiten
+        if last_id > self.shown_upto:
+            hidden_types, categories = self.current_filters()
+            new_results = list(self.results.filter(hidden_types, categories,
+                                                   after_id=self.shown_upto, upto_id=last_id))
+            self.shown_upto = last_id
+            self.add_result_rows(new_results)
+        
+        # Seleccionar la primera fila en cuanto haya una, sin cambiar la selección del usuario
+        if self.results_table.currentRow() < 0 and self.results_table.rowCount() > 0:
+            self.results_table.selectRow(0)
         
+        self.update_statistics()
+        self.statusBar().showMessage(f"Comparando esquemas... {len(self.results)} resultados, "
+                                     f"se muestran {self.results_table.rowCount()}")
+    
     def show_results(self, results):
-        self.results = results
-        self.apply_filters()
+        # Los resultados ya se fueron mostrando por grupos; sólo falta lo último guardado
+        self.append_results(results, results.last_id())
+        self.omitted_identical = self.worker.engine.omitted_identical
+        self.record_history(results)
+        self.results_table.resizeColumnsToContents()
         self.export_btn.setEnabled(True)
         
         # Actualizar estadísticas
         self.update_statistics()
+        
+        if self.worker.watch_interval:
+            # La comparación sigue viva: el botón Cancelar detiene la vigilancia
+            self.progress_bar.setVisible(False)
+            self.cancel_btn.setText("Detener")
+            self.statusBar().showMessage(f"Vigilando cambios en los esquemas cada {self.worker.watch_interval} s. "
+                                         f"{len(results)} resultados.")
+    
+    def show_changes(self, results, subtrees, changes):
+        """Muestra los resultados de los grupos que se volvieron a comparar durante la vigilancia"""
+        self.omitted_identical = dict(self.worker.engine.omitted_identical)
+        for change in changes:
+            logger.info(f"Cambio en la vigilancia: {change['cambio']} {change['tipo']} {change['objeto']} "
+                        f"({change['estado_anterior'] or '-'} -> {change['estado_actual'] or '-'})")
+        self.apply_filters()
+        self.update_statistics()
+        self.statusBar().showMessage(f"{datetime.now():%H:%M:%S} - {len(changes)} cambios en "
+                                     f"{', '.join(subtrees)}. Vigilando cambios en los esquemas...")
+    
+    def cancel_comparison(self):
+        """Pide al worker que cancele la comparación en curso"""
+        if self.worker is None or not self.worker.isRunning():
+            return
+        self.cancel_btn.setEnabled(False)
+        self.statusBar().showMessage("Cancelando la comparación...")
+        self.worker.cancel()
+    
+    def show_partial_results(self, results):
+        """Muestra los resultados obtenidos hasta la cancelación, sin guardarlos en el historial"""
+        self.append_results(results, results.last_id())
+        self.results_table.resizeColumnsToContents()
+        self.export_btn.setEnabled(len(self.results) > 0)
+        self.progress_bar.setVisible(False)
+        self.connect_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText("Cancelar")
+        self.statusBar().showMessage(f"Comparación cancelada. Resultados parciales: {len(self.results)}.")
+    
+    def record_history(self, results):
+        """Guarda la comparación en el historial local"""
+        engine = self.worker.engine
+        try:
+            history = ComparisonHistory()
+            try:
+                history.record_run(engine.conn_params1, engine.conn_params2, results,
+                                   self.comparison_started, datetime.now(),
+                                   omitted_identical=engine.omitted_identical,
+                                   differences_only=engine.differences_only)
+            finally:
+                history.close()
+        except Exception as e:
+            logger.error(f"Error al guardar la comparación en el historial: {str(e)}")
+    
+    def find_result(self, row):
+        """Busca en el almacén el resultado de una fila de la tabla, con sus definiciones"""
+        if not self.results:
+            return None
+        # add_result_rows guarda el id del resultado en la celda del tipo
+        result = self.results.get(self.results_table.item(row, 0).data(Qt.UserRole))
+        if result is not None:
+            result = self.load_definitions(result)
+        return result
+    
+    def load_definitions(self, result):
+        """Carga bajo demanda las definiciones de un resultado si la comparación no las incluyó"""
+        if self.definition_loader is None or result.has_definitions():
+            return result
+        try:
+            self.definition_loader.load(result)
+            # Guardar el texto cargado para no volver a consultarlo
+            self.results.update_definitions(result)
+            return result
+        except Exception as e:
+            logger.error(f"Error al cargar las definiciones de {result['objeto']}: {str(e)}")
+            return result
+    
+    def close_definition_loader(self):
+        """Cierra las conexiones del cargador de definiciones de la comparación anterior"""
+        if self.definition_loader is not None:
+            self.definition_loader.close()
+            self.definition_loader = None
+    
+    def close_results(self):
+        """Cierra el almacén de resultados de la comparación anterior"""
+        if self.results is not None:
+            self.results.close()
+            self.results = None
+    
+    def closeEvent(self, event):
+        # Cancelar la comparación en curso antes de cerrar su almacén
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+            # El almacén todavía no llegó a la interfaz si no había resultados
+            if self.results is None and self.worker.store is not None:
+                self.worker.store.close()
+        self.close_definition_loader()
+        self.close_results()
+        super().closeEvent(event)
     
     def show_error(self, error_msg):
         self.progress_bar.setVisible(False)
         self.connect_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText("Cancelar")
         QMessageBox.critical(self, "Error", f"Error en la comparación: {error_msg}")
         self.statusBar().showMessage("Error en la comparación")
     
     def comparison_completed(self):
         self.progress_bar.setVisible(False)
         self.connect_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText("Cancelar")
         self.statusBar().showMessage(f"Comparación completada. Se encontraron {len(self.results)} diferencias.")
     
+    def current_filters(self):
+        """Devuelve los tipos ocultos y las categorías visibles según los filtros activos"""
+        # Obtener estados de los checkboxes de tipo
+        show_tables = self.filter_tables.isChecked()
+        show_columns = self.filter_columns.isChecked()
+        show_functions = self.filter_functions.isChecked()
+        show_views = self.filter_views.isChecked()
+        show_constraints = self.filter_constraints.isChecked()
+        show_indexes = self.filter_indexes.isChecked()
+        show_fks = self.filter_fks.isChecked()
+        show_params = self.filter_params.isChecked()
+        
+        # Obtener estados de los checkboxes de estado
+        show_identical = self.filter_identical.isChecked()
+        show_different = self.filter_different.isChecked()
+        show_only_schema1 = self.filter_only_schema1.isChecked()
+        show_only_schema2 = self.filter_only_schema2.isChecked()
+        
+        # Crear un mapa de tipos a mostrar
+        show_types = {
+            'TABLA': show_tables,
+            'COLUMNA': show_columns,
+            'FUNCIÓN': show_functions,
+            'VISTA': show_views,
+            'CONSTRAINT': show_constraints,
+            'ÍNDICE': show_indexes,
+            'FOREIGN KEY': show_fks,
+            'PARÁMETRO': show_params
+        }
+        
+        hidden_types = [tipo for tipo, show in show_types.items() if not show]
+        categories = [category for category, show in [('identicos', show_identical),
+                                                      ('diferentes', show_different),
+                                                      ('solo_esquema1', show_only_schema1),
+                                                      ('solo_esquema2', show_only_schema2)] if show]
+        return hidden_types, categories
+    
+    def add_result_rows(self, results):
+        """Añade al final de la tabla una fila por resultado, coloreada según su estado"""
+        first_row = self.results_table.rowCount()
+        self.results_table.setRowCount(first_row + len(results))
+        
+        # Definir colores para los diferentes estados
+        identical_color = QColor('#e8f5e9')  # Verde claro
+        different_color = QColor('#fff8e1')  # Amarillo claro
+        only_schema1_color = QColor('#e3f2fd')  # Azul claro
+        only_schema2_color = QColor('#ffebee')  # Rojo claro
+        
+        for i, result in enumerate(results, first_row):
+            # Determinar el color según el estado
+            only_in_schema1 = result['esquema2'] == 'No existe'
+            only_in_schema2 = result['esquema1'] == 'No existe'
+            identical = result['estado'] == 'IDÉNTICO'
+            
+            if identical:
+                row_color = identical_color
+            elif only_in_schema1:
+                row_color = only_schema1_color
+            elif only_in_schema2:
+                row_color = only_schema2_color
+            else:  # different
+                row_color = different_color
+            
+            # Tipo
+            item = QTableWidgetItem(result['tipo'])
+            item.setFont(STYLE['NORMAL_FONT'])
+            item.setBackground(row_color)
+            item.setData(Qt.UserRole, result.store_id)
+            self.results_table.setItem(i, 0, item)
+            
+            # Objeto
+            item = QTableWidgetItem(result['objeto'])
+            item.setFont(STYLE['NORMAL_FONT'])
+            item.setBackground(row_color)
+            self.results_table.setItem(i, 1, item)
+            
+            # Detalle
+            item = QTableWidgetItem(result['detalle'])
+            item.setFont(STYLE['NORMAL_FONT'])
+            item.setBackground(row_color)
+            self.results_table.setItem(i, 2, item)
+            
+            # Esquema 1
+            item = QTableWidgetItem(result['esquema1'])
+            item.setFont(STYLE['NORMAL_FONT'])
+            item.setBackground(row_color)
+            self.results_table.setItem(i, 3, item)
+            
+            # Esquema 2
+            item = QTableWidgetItem(result['esquema2'])
+            item.setFont(STYLE['NORMAL_FONT'])
+            item.setBackground(row_color)
+            self.results_table.setItem(i, 4, item)
+            
+            # Estado
+            item = QTableWidgetItem(result['estado'])
+            item.setFont(STYLE['NORMAL_FONT'])
+            item.setBackground(row_color)
+            self.results_table.setItem(i, 5, item)
+
     def apply_filters(self):
         """Aplicar filtros a los resultados y mostrarlos en la tabla"""
         try:
             # Limpiar tabla
             self.results_table.setRowCount(0)
             
-            # Obtener estados de los checkboxes de tipo
-            show_tables = self.filter_tables.isChecked()
-            show_columns = self.filter_columns.isChecked()
-            show_functions = self.filter_functions.isChecked()
-            show_views = self.filter_views.isChecked()
-            show_constraints = self.filter_constraints.isChecked()
-            show_indexes = self.filter_indexes.isChecked()
-            show_fks = self.filter_fks.isChecked()
-            show_params = self.filter_params.isChecked()
-            
-            # Obtener estados de los checkboxes de estado
-            show_identical = self.filter_identical.isChecked()
-            show_different = self.filter_different.isChecked()
-            show_only_schema1 = self.filter_only_schema1.isChecked()
-            show_only_schema2 = self.filter_only_schema2.isChecked()
-            
-            # Crear un mapa de tipos a mostrar
-            show_types = {
-                'TABLA': show_tables,
-                'COLUMNA': show_columns,
-                'FUNCIÓN': show_functions,
-                'VISTA': show_views,
-                'CONSTRAINT': show_constraints,
-                'ÍNDICE': show_indexes,
-                'FOREIGN KEY': show_fks,
-                'PARÁMETRO': show_params
-            }
-            
-            # Filtrar resultados
+            # Filtrar resultados en el almacén (índices por tipo y estado)
+            hidden_types, categories = self.current_filters()
             filtered_results = []
-            identical_count = 0
-            different_count = 0
-            only_schema1_count = 0
-            only_schema2_count = 0
+            category_counts = {'identicos': 0, 'diferentes': 0, 'solo_esquema1': 0, 'solo_esquema2': 0}
             
-            for result in self.results:
-                # Verificar si el tipo debe mostrarse
-                if not show_types.get(result['tipo'], True):
-                    continue
-                
-                # Clasificar el objeto según su estado
-                only_in_schema1 = result['esquema2'] == 'No existe'
-                only_in_schema2 = result['esquema1'] == 'No existe'
-                identical = result['estado'] == 'IDÉNTICO'
-                
-                different = (not only_in_schema1 and 
-                             not only_in_schema2 and 
-                             not identical)
-                
-                # Determinar si el objeto debe mostrarse según los filtros de estado
-                show_this_result = False
-                
-                if identical and show_identical:
-                    show_this_result = True
-                    identical_count += 1
-                elif different and show_different:
-                    show_this_result = True
-                    different_count += 1
-                elif only_in_schema1 and show_only_schema1:
-                    show_this_result = True
-                    only_schema1_count += 1
-                elif only_in_schema2 and show_only_schema2:
-                    show_this_result = True
-                    only_schema2_count += 1
-                
-                if not show_this_result:
-                    continue
-                
-                filtered_results.append(result)
+            if self.results is not None:
+                # Hasta el último resultado guardado; los siguientes llegan con append_results
+                self.shown_upto = self.results.last_id()
+                for result in self.results.filter(hidden_types, categories, upto_id=self.shown_upto):
+                    category_counts[result_category(result)] += 1
+                    filtered_results.append(result)
+            identical_count = category_counts['identicos']
+            different_count = category_counts['diferentes']
+            only_schema1_count = category_counts['solo_esquema1']
+            only_schema2_count = category_counts['solo_esquema2']
 
-            self.results_table.setRowCount(len(filtered_results))
-            
-            # Definir colores para los diferentes estados
-            identical_color = QColor('#e8f5e9')  # Verde claro
-            different_color = QColor('#fff8e1')  # Amarillo claro
-            only_schema1_color = QColor('#e3f2fd')  # Azul claro
-            only_schema2_color = QColor('#ffebee')  # Rojo claro
-            
-            for i, result in enumerate(filtered_results):
-                # Determinar el color según el estado
-                only_in_schema1 = result['esquema2'] == 'No existe'
-                only_in_schema2 = result['esquema1'] == 'No existe'
-                identical = result['estado'] == 'IDÉNTICO'
-                
-                if identical:
-                    row_color = identical_color
-                elif only_in_schema1:
-                    row_color = only_schema1_color
-                elif only_in_schema2:
-                    row_color = only_schema2_color
-                else:  # different
-                    row_color = different_color
-                
-                # Tipo
-                item = QTableWidgetItem(result['tipo'])
-                item.setFont(STYLE['NORMAL_FONT'])
-                item.setBackground(row_color)
-                self.results_table.setItem(i, 0, item)
-                
-                # Objeto
-                item = QTableWidgetItem(result['objeto'])
-                item.setFont(STYLE['NORMAL_FONT'])
-                item.setBackground(row_color)
-                self.results_table.setItem(i, 1, item)
-                
-                # Detalle
-                item = QTableWidgetItem(result['detalle'])
-                item.setFont(STYLE['NORMAL_FONT'])
-                item.setBackground(row_color)
-                self.results_table.setItem(i, 2, item)
-                
-                # Esquema 1
-                item = QTableWidgetItem(result['esquema1'])
-                item.setFont(STYLE['NORMAL_FONT'])
-                item.setBackground(row_color)
-                self.results_table.setItem(i, 3, item)
-                
-                # Esquema 2
-                item = QTableWidgetItem(result['esquema2'])
-                item.setFont(STYLE['NORMAL_FONT'])
-                item.setBackground(row_color)
-                self.results_table.setItem(i, 4, item)
-                
-                # Estado
-                item = QTableWidgetItem(result['estado'])
-                item.setFont(STYLE['NORMAL_FONT'])
-                item.setBackground(row_color)
-                self.results_table.setItem(i, 5, item)
+            self.add_result_rows(filtered_results)
             
             # Habilitar/deshabilitar botón de detalles
             self.show_details_btn.setEnabled(self.results_table.currentRow() >= 0)
             
             # Actualizar barra de estado con conteo
-            total_results = len(self.results)
+            total_results = len(self.results) if self.results is not None else 0
             filtered_count = len(filtered_results)
             
             status_msg = (f"Se muestran {filtered_count} de {total_results} resultados. "
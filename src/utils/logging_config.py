@@ -1,19 +1,19 @@
 import logging
-import os
+from utils.paths import LOG_FILE, ensure_directory
 
 def setup_logging():
     """Configuración centralizada del sistema de logging"""
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     
     # Crear directorio de logs si no existe
-    os.makedirs('logs', exist_ok=True)
+    ensure_directory(LOG_FILE)
     
     # Configuración básica
     logging.basicConfig(
         level=logging.INFO,
         format=log_format,
         handlers=[
-            logging.FileHandler('logs/schema_comparator.log'),
+            logging.FileHandler(LOG_FILE),
             logging.StreamHandler()
         ]
     )
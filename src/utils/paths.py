@@ -0,0 +1,22 @@
+"""Ubicación de los archivos que genera la aplicación."""
+
+import os
+
+# Los archivos se crean en el directorio de trabajo, cada tipo en su directorio
+LOGS_DIR = 'logs'
+HISTORY_DIR = 'history'
+
+# Log de la aplicación (ver setup_logging)
+LOG_FILE = os.path.join(LOGS_DIR, 'schema_comparator.log')
+
+# Historial de comparaciones (ver core.history)
+HISTORY_FILE = os.path.join(HISTORY_DIR, 'comparisons.sqlite')
+
+# Diario de las comparaciones por lotes (ver core.journal)
+JOURNAL_FILE = os.path.join(HISTORY_DIR, 'batch_journal.sqlite')
+
+def ensure_directory(path):
+    """Crea, si no existe, el directorio del archivo indicado."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
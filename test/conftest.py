@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Configuración de las pruebas: los módulos se importan desde src, como en la aplicación."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del recorrido merge_join y de SchemaDiffer sobre catálogos ya extraídos."""
+
+import pytest
+from core.results import IDENTICAL, NOT_EXISTS
+from core.schema_differ import SchemaDiffer, merge_join
+from core.schema_normalizer import SchemaNormalizer
+
+SCHEMA1 = 'emp01'
+SCHEMA2 = 'emp02'
+
+def catalog(schema, **sections):
+    """Catálogo con todas las secciones vacías salvo las indicadas."""
+    result = {'schema': schema, 'tables': {}, 'columns': {}, 'functions': {}, 'function_parameters': {},
+              'views': {}, 'constraints': {}, 'foreign_keys': {}, 'indexes': {}}
+    result.update(sections)
+    return result
+
+def differ(**options):
+    return SchemaDiffer(SchemaNormalizer(SCHEMA1, SCHEMA2), **options)
+
+def by_object(results):
+    return {result['objeto']: result for result in results}
+
+def test_merge_join_orders_keys_by_code_point():
+    objects1 = {'b': 1, 'A': 2, 'ñ': 3}
+    objects2 = {'a': 4, 'b': 5}
+    assert list(merge_join(objects1, objects2)) == [
+        ('A', 2, None), ('a', None, 4), ('b', 1, 5), ('ñ', 3, None)]
+
+def test_merge_join_accepts_ordered_iterables():
+    objects1 = iter([('a', 1), ('c', 3)])
+    objects2 = {'b': 2, 'c': 4}
+    assert list(merge_join(objects1, objects2)) == [('a', 1, None), ('b', None, 2), ('c', 3, 4)]
+
+@pytest.mark.parametrize('items', [[('b', 1), ('a', 2)], [('a', 1), ('a', 2)]])
+def test_merge_join_rejects_unordered_iterables(items):
+    with pytest.raises(ValueError):
+        list(merge_join(iter(items), {}))
+
+def test_merge_join_of_empty_collections():
+    assert list(merge_join({}, iter(()))) == []
+
+def test_tables_are_identical_only_if_their_columns_are():
+    column = {'data_type': 'integer', 'length': None, 'nullable': 'NO'}
+    catalog1 = catalog(SCHEMA1, tables={'a': {}, 'b': {}, 'solo1': {}},
+                       columns={'a': {'id': column}, 'b': {'id': column}})
+    catalog2 = catalog(SCHEMA2, tables={'a': {}, 'b': {}},
+                       columns={'a': {'id': column}, 'b': {'id': dict(column, nullable='YES')}})
+
+    results = by_object(differ().diff_subtree(catalog1, catalog2, 'tables'))
+
+    assert results['a']['estado'] == IDENTICAL
+    assert results['b.id']['tipo'] == 'COLUMNA'
+    assert 'b' not in results
+    assert results['solo1']['esquema2'] == NOT_EXISTS
+
+def test_constraints_compare_foreign_key_definitions():
+    constraints = {'t.pk': {'table': 't', 'name': 'pk', 'type': 'PRIMARY KEY'},
+                   't.fk': {'table': 't', 'name': 'fk', 'type': 'FOREIGN KEY'}}
+    fk = {'table': 't', 'name': 'fk', 'definition': 'FOREIGN KEY (r_id) REFERENCES r(id)', 'normalized_hash': 'h1'}
+    catalog1 = catalog(SCHEMA1, constraints=constraints, foreign_keys={'t.fk': fk})
+    catalog2 = catalog(SCHEMA2, constraints=constraints, foreign_keys={'t.fk': dict(fk, normalized_hash='h2')})
+
+    results = by_object(differ().diff_subtree(catalog1, catalog2, 'constraints'))
+
+    assert results['t.pk']['estado'] == IDENTICAL
+    assert results['t.fk']['estado'] == 'DIFERENTE REFERENCIA'
+
+def test_identical_definitions_keep_only_their_hash():
+    function = {'normalized_hash': 'h1', 'full_definition': 'CREATE FUNCTION f()', 'definition': 'select 1'}
+    catalog1 = catalog(SCHEMA1, functions={'f()': function, 'g()': dict(function, normalized_hash='h2')})
+    catalog2 = catalog(SCHEMA2, functions={'f()': function, 'g()': dict(function, normalized_hash='h3')})
+
+    results = by_object(differ().diff_subtree(catalog1, catalog2, 'functions'))
+
+    assert results['f()']['estado'] == IDENTICAL
+    assert not results['f()'].has_definitions()
+    assert results['f()']['esquema1_hash'] == 'h1'
+    assert results['g()']['estado'] == 'DIFERENTE CUERPO'
+    assert results['g()'].has_definitions()
+
+def test_streamed_sections_are_compared_like_dictionaries():
+    views1 = {'a': {'normalized_hash': 'x', 'materialized': False},
+              'b': {'normalized_hash': 'y', 'materialized': False}}
+    views2 = {'b': {'normalized_hash': 'z', 'materialized': False}}
+    expected = differ(lazy_definitions=True).diff_subtree(catalog(SCHEMA1, views=views1),
+                                                          catalog(SCHEMA2, views=views2), 'views')
+
+    streamed = differ(lazy_definitions=True).diff_subtree(
+        catalog(SCHEMA1, views=iter(sorted(views1.items()))), catalog(SCHEMA2, views=iter(sorted(views2.items()))),
+        'views')
+
+    assert streamed == expected
+
+def test_differences_only_counts_identical_objects():
+    index = {'table': 't', 'name': 'i', 'definition': 'CREATE INDEX i ON t (a)', 'normalized_hash': 'h'}
+    schema_differ = differ(differences_only=True)
+
+    results = schema_differ.diff_subtree(catalog(SCHEMA1, indexes={'t.i': index}),
+                                         catalog(SCHEMA2, indexes={'t.i': index}), 'indexes')
+
+    assert results == []
+    assert schema_differ.identical_counts == {'ÍNDICE': 1}
+
+def test_progress_counts_the_objects_of_each_schema():
+    column = {'data_type': 'integer', 'length': None, 'nullable': 'NO'}
+    catalog1 = catalog(SCHEMA1, tables={'a': {}, 'b': {}}, columns={'a': {'id': column}, 'b': {'id': column}})
+    catalog2 = catalog(SCHEMA2, tables={'a': {}}, columns={'a': {'id': column, 'nombre': column}})
+    progress = []
+
+    differ(progress_callback=lambda subtree, count: progress.append((subtree, count))).diff(catalog1, catalog2)
+
+    assert {subtree for subtree, _ in progress} == {'tables'}
+    # Tablas a, a y b, y columnas id, id y nombre de la tabla a
+    assert sum(count for _, count in progress) == 6
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la agrupación de tenants por desviaciones."""
+
+from core.drift_clustering import MinHasher, cluster_drift, drift_signature
+from core.results import ComparisonResult, IDENTICAL
+from core.schema_normalizer import SchemaNormalizer
+
+def signature(*drifts):
+    return {drift: f"desc {drift}" for drift in drifts}
+
+def members(clusters):
+    return [cluster['miembros'] for cluster in clusters]
+
+BASE = [f"d{i}" for i in range(20)]
+
+def test_identical_signatures_form_one_group():
+    clusters = cluster_drift({'t1': signature('a', 'b'), 't2': signature('a', 'b'), 't3': signature('c')},
+                             threshold=1.0)
+
+    assert members(clusters) == [['t1', 't2'], ['t3']]
+    assert clusters[0]['desviaciones'] == ['desc a', 'desc b']
+    assert clusters[0]['variantes'] == []
+
+def test_near_identical_signatures_are_merged():
+    clusters = cluster_drift({'t1': signature(*BASE), 't2': signature(*BASE, 'extra'),
+                              'otro': signature(*(f"z{i}" for i in range(20)))},
+                             threshold=0.9, bands=64)
+
+    assert members(clusters) == [['t1', 't2'], ['otro']]
+    assert clusters[0]['variantes'] == ['desc extra']
+
+def test_bucket_candidates_are_verified_pairwise(monkeypatch):
+    # Todos los grupos caen en los mismos buckets, y el que no se parece a
+    # los demás es el primer candidato de cada uno
+    monkeypatch.setattr(MinHasher, 'signature', lambda self, tokens: (0,) * self.num_perm)
+    unrelated = signature(*(f"z{i}" for i in range(20)))
+    clusters = cluster_drift({'a': unrelated, 'b': signature(*BASE), 'c': signature(*BASE, 'extra')},
+                             threshold=0.9)
+
+    assert members(clusters) == [['b', 'c'], ['a']]
+
+def test_dissimilar_signatures_stay_apart():
+    clusters = cluster_drift({'t1': signature(*BASE[:10]), 't2': signature(*BASE[10:])}, threshold=0.5)
+
+    assert members(clusters) == [['t1'], ['t2']]
+
+def test_minhash_is_reproducible():
+    assert MinHasher(16).signature({'a', 'b'}) == MinHasher(16).signature({'b', 'a'})
+
+def test_drift_signature_ignores_identical_results_and_schema_names():
+    normalizer = SchemaNormalizer('emp0001pro', 'emp0002pro')
+    results = [ComparisonResult('TABLA', 'a', 'detalle', 'x', 'y', IDENTICAL),
+               ComparisonResult('TABLA', 'b', 'detalle', 'emp0001pro.b', 'No existe', 'DIFERENTE')]
+    other = [ComparisonResult('TABLA', 'b', 'detalle', 'emp0001pro.b', 'No existe', 'DIFERENTE')]
+
+    signature1 = drift_signature(results, normalizer, 'emp0001pro', 'emp0002pro')
+    signature2 = drift_signature(other, SchemaNormalizer('emp0001pro', 'emp0003pro'), 'emp0001pro', 'emp0003pro')
+
+    assert len(signature1) == 1
+    assert signature1.keys() == signature2.keys()
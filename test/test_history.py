@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de ComparisonHistory.delta y del modo de vigilancia (results_delta, SchemaWatcher.poll)."""
+
+from datetime import datetime
+import pytest
+from core.fingerprint import SchemaFingerprint
+from core.history import ComparisonHistory, DELTA_CHANGED, DELTA_CONVERGED, DELTA_NEW, DELTA_REMOVED
+from core.results import ComparisonResult, IDENTICAL
+from core.watch import SchemaWatcher, results_delta
+
+PARAMS1 = {'host': 'db1', 'port': 5432, 'dbname': 'erp', 'user': 'postgres', 'schema': 'emp01'}
+PARAMS2 = {'host': 'db2', 'port': 5432, 'dbname': 'erp', 'user': 'postgres', 'schema': 'emp02'}
+
+def function(objeto, estado=IDENTICAL, hash1='h', hash2='h', lazy=False):
+    """Resultado de una función, con el texto completo salvo con carga diferida."""
+    texts = {} if lazy else {'esquema1_full': f"CREATE FUNCTION emp01.{objeto}",
+                             'esquema2_full': f"CREATE FUNCTION emp02.{objeto}"}
+    return ComparisonResult('FUNCIÓN', objeto, 'detalle', f"emp01.{objeto}", f"emp02.{objeto}", estado,
+                            esquema1_hash=hash1, esquema2_hash=hash2, **texts)
+
+@pytest.fixture
+def history(tmp_path):
+    history = ComparisonHistory(str(tmp_path / 'comparisons.sqlite'))
+    yield history
+    history.close()
+
+def record(history, results, differences_only=False):
+    now = datetime.now()
+    return history.record_run(PARAMS1, PARAMS2, results, now, now, differences_only=differences_only)
+
+def changes(delta):
+    return [(change['objeto'], change['cambio']) for change in delta]
+
+def test_lazy_and_full_runs_have_the_same_hashes(history):
+    full = record(history, [function('f()'), function('g()', 'DIFERENTE CUERPO', 'h1', 'h2')])
+    lazy = record(history, [function('f()', lazy=True),
+                            function('g()', 'DIFERENTE CUERPO', 'h1', 'h2', lazy=True)])
+
+    assert history.delta(full, lazy) == []
+
+def test_delta_reports_new_removed_and_changed_objects(history):
+    run_a = record(history, [function('a()'), function('b()'), function('c()')])
+    run_b = record(history, [function('b()'), function('c()', 'DIFERENTE CUERPO', 'h', 'x'), function('d()')])
+
+    assert changes(history.delta(run_a, run_b)) == [
+        ('a()', DELTA_REMOVED), ('c()', DELTA_CHANGED), ('d()', DELTA_NEW)]
+
+def test_missing_object_in_differences_only_run_converged(history):
+    run_a = record(history, [function('f()', 'DIFERENTE CUERPO', 'h1', 'h2')], differences_only=True)
+    run_b = record(history, [], differences_only=True)
+
+    delta = history.delta(run_a, run_b)
+
+    assert changes(delta) == [('f()', DELTA_CONVERGED)]
+    assert delta[0]['estado_actual'] is None
+
+def test_unknown_run_raises(history):
+    with pytest.raises(ValueError):
+        history.delta(1, 2)
+
+def test_results_delta_of_watched_subtree():
+    previous = [function('a()'), function('b()', 'DIFERENTE CUERPO', 'h1', 'h2')]
+    current = [function('b()', 'DIFERENTE CUERPO', 'h1', 'h3', lazy=True), function('c()')]
+
+    assert changes(results_delta(previous, current)) == [
+        ('a()', DELTA_REMOVED), ('b()', DELTA_CHANGED), ('c()', DELTA_NEW)]
+
+def test_results_delta_reports_convergence_with_differences_only():
+    previous = [function('a()', 'DIFERENTE CUERPO', 'h1', 'h2')]
+
+    assert changes(results_delta(previous, [], differences_only=True)) == [('a()', DELTA_CONVERGED)]
+
+def test_poll_computes_fingerprint_only_when_signal_moves(monkeypatch):
+    watcher = SchemaWatcher(engine=None)
+    watcher.connections = []
+    watcher.signals = [[('pg_class', 3, 100)], [('pg_class', 3, 100)]]
+    watcher.fingerprints = [SchemaFingerprint('emp01', []), SchemaFingerprint('emp02', [])]
+    signals = [list(watcher.signals), [[('pg_class', 3, 100)], [('pg_class', 3, 105)]]]
+    monkeypatch.setattr(watcher, 'change_signal', lambda: signals.pop(0))
+    fingerprints = []
+    monkeypatch.setattr(watcher, 'fingerprint', lambda: fingerprints.append(1) or list(watcher.fingerprints))
+
+    assert watcher.poll(results=None) is None
+    assert fingerprints == []
+
+    # La señal se mueve pero la huella no (p. ej. un GRANT): no se compara y la señal avanza
+    assert watcher.poll(results=None) is None
+    assert fingerprints == [1]
+    assert watcher.signals == [[('pg_class', 3, 100)], [('pg_class', 3, 105)]]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de BatchJournal: los grupos guardados se reutilizan al reanudar un lote."""
+
+import psycopg2
+import pytest
+from core.catalog_extractor import CATALOG_SUBTREES
+from core.journal import BatchJournal
+from core.results import ComparisonResult, IDENTICAL
+
+class FakeEngine:
+    """Motor que notifica un resultado por grupo y puede perder la conexión tras algunos."""
+
+    def __init__(self, subtrees, compared, fail_after=None):
+        self.subtrees = subtrees
+        self.compared = compared
+        self.fail_after = fail_after
+        self.results_callback = None
+        self.omitted_by_subtree = {}
+        self.incomplete_subtrees = set()
+
+    def run(self):
+        for n, subtree in enumerate(self.subtrees):
+            if self.fail_after is not None and n == self.fail_after:
+                raise psycopg2.OperationalError("server closed the connection unexpectedly")
+            self.compared.append(subtree)
+            self.omitted_by_subtree[subtree] = {'TABLA': 1}
+            self.results_callback(subtree, [ComparisonResult('TABLA', subtree, 'detalle', 'a', 'b', IDENTICAL)])
+
+def journal(tmp_path, resume=False):
+    return BatchJournal('lote', str(tmp_path / 'journal.sqlite'), resume=resume)
+
+def test_resume_compares_only_pending_subtrees(tmp_path):
+    compared = []
+    first = journal(tmp_path)
+    with pytest.raises(psycopg2.OperationalError):
+        first.compare('emp01', lambda subtrees: FakeEngine(subtrees, compared, fail_after=2), retries=0)
+    first.close()
+    assert compared == list(CATALOG_SUBTREES)[:2]
+
+    compared.clear()
+    resumed = journal(tmp_path, resume=True)
+    results, omitted = resumed.compare('emp01', lambda subtrees: FakeEngine(subtrees, compared), retries=0)
+    resumed.close()
+
+    assert compared == list(CATALOG_SUBTREES)[2:]
+    assert [result['objeto'] for result in results] == list(CATALOG_SUBTREES)
+    assert omitted == {'TABLA': len(CATALOG_SUBTREES)}
+
+def test_without_resume_the_batch_starts_over(tmp_path):
+    compared = []
+    first = journal(tmp_path)
+    first.compare('emp01', lambda subtrees: FakeEngine(subtrees, compared), retries=0)
+    first.close()
+
+    compared.clear()
+    again = journal(tmp_path)
+    again.compare('emp01', lambda subtrees: FakeEngine(subtrees, compared), retries=0)
+    again.close()
+
+    assert compared == list(CATALOG_SUBTREES)
+
+def test_transient_errors_are_retried_from_the_journal(tmp_path):
+    compared = []
+    attempts = []
+
+    def make_engine(subtrees):
+        attempts.append(list(subtrees))
+        return FakeEngine(subtrees, compared, fail_after=1 if len(attempts) == 1 else None)
+
+    batch = journal(tmp_path)
+    results, _ = batch.compare('emp01', make_engine, retries=1, backoff=0)
+    batch.close()
+
+    assert attempts == [list(CATALOG_SUBTREES), list(CATALOG_SUBTREES)[1:]]
+    assert len(results) == len(CATALOG_SUBTREES)
+
+def test_incomplete_subtrees_are_not_recorded(tmp_path):
+    compared = []
+
+    def make_engine(subtrees):
+        engine = FakeEngine(subtrees, compared)
+        engine.incomplete_subtrees = {'views'}
+        return engine
+
+    batch = journal(tmp_path)
+    results, _ = batch.compare('emp01', make_engine, retries=0)
+
+    assert 'views' in [result['objeto'] for result in results]
+    assert 'views' not in batch.completed('emp01')
+    batch.close()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Pruebas del avance por objetos procesados y del tiempo restante estimado."""
+
+import pytest
+import core.progress
+from core.progress import ProgressTracker
+
+class Clock:
+    """Reloj controlado por la prueba en lugar de time.monotonic."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(core.progress.time, 'monotonic', clock)
+    return clock
+
+def test_progress_is_weighted_by_phase(clock):
+    percents = []
+    tracker = ProgressTracker(percents.append, start=0, end=100)
+    # 100 objetos de extracción (peso 1) y 100 de comparación (peso 0,1)
+    tracker.plan([('extract1', 'extract', 100), ('diff_tables', 'diff', 100)])
+
+    tracker.advance('extract1', 50)
+    assert tracker.fraction() == pytest.approx(50 / 110)
+
+    tracker.finish('extract1')
+    assert percents[-1] == int(100 * 100 / 110)
+
+def test_advance_does_not_exceed_the_planned_objects(clock):
+    tracker = ProgressTracker()
+    tracker.plan([('extract1', 'extract', 10)])
+
+    tracker.advance('extract1', 50)
+    tracker.advance('desconocida', 5)
+
+    assert tracker.fraction() == 1.0
+
+def test_eta_uses_the_observed_rate(clock):
+    etas = []
+    tracker = ProgressTracker(eta_callback=etas.append)
+    tracker.plan([('extract1', 'extract', 100)])
+    assert tracker.eta() is None
+
+    clock.now += 10
+    tracker.advance('extract1', 25)
+
+    assert tracker.eta() == pytest.approx(30)
+    assert etas[-1] == pytest.approx(30)
+
+def test_notifications_of_the_same_percent_are_throttled(clock):
+    percents = []
+    tracker = ProgressTracker(percents.append)
+    tracker.plan([('extract1', 'extract', 10000)])
+    notified = len(percents)
+
+    tracker.advance('extract1', 1)
+    assert len(percents) == notified
+
+    clock.now += core.progress.NOTIFY_INTERVAL
+    tracker.advance('extract1', 1)
+    assert len(percents) == notified + 1
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de ResultStore: filtros de la interfaz, lecturas por rangos, reemplazo de grupos y acceso por id."""
+
+import pytest
+import core.result_store
+from core.result_store import ResultStore
+from core.results import ComparisonResult, IDENTICAL, NOT_EXISTS
+
+def result(objeto, estado=IDENTICAL, tipo='TABLA', esquema1='a', esquema2='b'):
+    return ComparisonResult(tipo, objeto, 'detalle', esquema1, esquema2, estado)
+
+@pytest.fixture
+def store():
+    store = ResultStore()
+    yield store
+    store.close()
+
+def objects(results):
+    return [result['objeto'] for result in results]
+
+def test_filter_by_category_and_type(store):
+    store.add_many([result('igual'), result('distinta', 'DIFERENTE'),
+                    result('solo1', 'DIFERENTE', esquema2=NOT_EXISTS),
+                    result('solo2', 'DIFERENTE', esquema1=NOT_EXISTS),
+                    result('vista', tipo='VISTA')], 'tables')
+
+    assert objects(store.filter(categories=['identicos'])) == ['igual', 'vista']
+    assert objects(store.filter(categories=['solo_esquema1', 'solo_esquema2'])) == ['solo1', 'solo2']
+    assert objects(store.filter(categories=['diferentes'])) == ['distinta']
+    assert objects(store.filter(hidden_types=['TABLA'])) == ['vista']
+    assert objects(store.filter(categories=[])) == []
+
+def test_filter_by_id_range(store):
+    store.add_many([result('a'), result('b')])
+    last_id = store.last_id()
+    store.add_many([result('c'), result('d')])
+
+    assert objects(store.filter(after_id=last_id)) == ['c', 'd']
+    assert objects(store.filter(upto_id=last_id)) == ['a', 'b']
+
+def test_reads_survive_inserts_between_blocks(store, monkeypatch):
+    monkeypatch.setattr(core.result_store, 'BATCH_SIZE', 2)
+    store.add_many([result(f"t{i}") for i in range(5)])
+
+    reader = store.filter(categories=['identicos'])
+    first = next(reader)
+    store.add_many([result('nueva')])
+
+    assert objects([first, *reader]) == ['t0', 't1', 't2', 't3', 't4', 'nueva']
+    assert len(store) == 6
+
+def test_replace_subtree_returns_previous_results(store):
+    store.add_many([result('tabla')], 'tables')
+    store.add_many([result('vista', tipo='VISTA')], 'views')
+
+    previous = store.replace_subtree('views', [result('otra', 'DIFERENTE', tipo='VISTA')])
+
+    assert objects(previous) == ['vista']
+    assert objects(store) == ['tabla', 'otra']
+    assert store.get(previous[0].store_id) is None
+    assert store.summary() == {'total': 2, 'identicos': 1, 'diferentes': 1,
+                               'solo_esquema1': 0, 'solo_esquema2': 0}
+
+def test_get_and_update_definitions_by_id(store):
+    # Dos resultados con el mismo tipo, objeto y detalle (p. ej. tras replace_subtree en otro grupo)
+    store.add_many([result('tabla'), result('tabla', 'DIFERENTE')])
+    first, second = store
+
+    second.esquema1_full, second.esquema2_full = 'def 1', 'def 2'
+    store.update_definitions(second)
+
+    assert store.get(second.store_id).has_definitions()
+    assert not store.get(first.store_id).has_definitions()
+    assert store.get(store.last_id() + 1) is None
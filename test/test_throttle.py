@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de AdaptiveThrottle: el tamaño de lote y la concurrencia siguen a la latencia."""
+
+import pytest
+import core.throttle
+from core.throttle import AdaptiveThrottle
+
+def test_slow_batches_halve_size_and_concurrency():
+    throttle = AdaptiveThrottle(target_latency=1.0, max_concurrency=4, initial_batch=100, min_batch=30)
+
+    throttle.adapt(2.0)
+    assert (throttle.batch_size, throttle.concurrency) == (50, 3)
+
+    throttle.adapt(2.0)
+    throttle.adapt(2.0)
+    throttle.adapt(2.0)
+    assert (throttle.batch_size, throttle.concurrency) == (30, 1)
+
+def test_fast_batches_grow_up_to_the_limits():
+    throttle = AdaptiveThrottle(target_latency=1.0, max_concurrency=2, initial_batch=100, max_batch=200)
+    throttle.concurrency = 1
+
+    throttle.adapt(0.1)
+    assert (throttle.batch_size, throttle.concurrency) == (150, 2)
+
+    throttle.adapt(0.1)
+    assert (throttle.batch_size, throttle.concurrency) == (200, 2)
+
+def test_batches_near_the_target_keep_their_size():
+    throttle = AdaptiveThrottle(target_latency=1.0, initial_batch=100)
+
+    throttle.adapt(0.8)
+
+    assert throttle.batch_size == 100
+
+@pytest.mark.parametrize('elapsed, pause', [(1.5, 0.5), (10.0, 4.0), (0.5, None)])
+def test_slow_batch_yields_the_server(monkeypatch, elapsed, pause):
+    times = iter([0.0, elapsed])
+    sleeps = []
+    monkeypatch.setattr(core.throttle.time, 'monotonic', lambda: next(times))
+    monkeypatch.setattr(core.throttle.time, 'sleep', sleeps.append)
+    throttle = AdaptiveThrottle(target_latency=1.0, initial_batch=100)
+
+    with throttle.batch() as batch_size:
+        assert batch_size == 100
+
+    assert sleeps == ([pause] if pause is not None else [])
+    assert throttle.active == 0